@@ -105,17 +105,28 @@ class Client(BaseClient):
             'quotechar': quotechar,
             'skipinitialspace': skipinitialspace
         }
+        self.feeds_state = FeedsState()
 
-    def _build_request(self, url):
+    def _build_request(self, url, headers=None):
         r = requests.Request(
             'GET',
             url,
-            auth=self._auth
+            auth=self._auth,
+            headers=headers
         )
 
         return r.prepare()
 
-    def build_iterator(self, **kwargs):
+    def build_iterator(self, skip_unchanged: bool = False, **kwargs):
+        """For each URL, fetches the feed and returns a CSV reader of its content.
+
+        Args:
+            skip_unchanged: Whether to skip URLs whose content has not changed since the previous fetch,
+                using conditional requests (ETag/Last-Modified) and a digest of the content.
+
+        Returns:
+            List. A list of {url: csv reader} dicts.
+        """
         results = []
         urls = self._base_url
         if not isinstance(urls, list):
@@ -123,7 +134,7 @@ class Client(BaseClient):
         for url in urls:
             _session = requests.Session()
 
-            prepreq = self._build_request(url)
+            prepreq = self._build_request(url, self.feeds_state.get_conditional_headers(url) if skip_unchanged else None)
 
             # this is to honour the proxy environment variables
             kwargs.update(_session.merge_environment_settings(
@@ -172,6 +183,10 @@ class Client(BaseClient):
                 return_error('Exception in request: {} {}'.format(r.status_code, r.content))
                 raise
 
+            if skip_unchanged and self.feeds_state.is_unchanged(url, r):
+                demisto.debug(f'The content of {url} has not changed since the previous fetch, skipping it.')
+                continue
+
             response = self.get_feed_content_divided_to_lines(url, r)
             if self.feed_url_to_config:
                 fieldnames = self.feed_url_to_config.get(url, {}).get('fieldnames', [])
@@ -287,8 +302,8 @@ def create_fields_mapping(raw_json: Dict[str, Any], mapping: Dict[str, Union[Tup
 
 
 def fetch_indicators_command(client: Client, default_indicator_type: str, auto_detect: bool, limit: int = 0,
-                             create_relationships: bool = False, **kwargs):
-    iterator = client.build_iterator(**kwargs)
+                             create_relationships: bool = False, skip_unchanged: bool = False, **kwargs):
+    iterator = client.build_iterator(skip_unchanged=skip_unchanged, **kwargs)
     relationships_of_indicator = []
     indicators = []
     config = client.feed_url_to_config or {}
@@ -373,16 +388,27 @@ def feed_main(feed_name, params=None, prefix=''):
     }
     try:
         if command == 'fetch-indicators':
+            skip_unchanged = is_skip_unchanged_feed_enabled(params)
             indicators = fetch_indicators_command(
                 client,
                 params.get('indicator_type'),
                 params.get('auto_detect_type'),
                 params.get('limit'),
-                params.get('create_relationships')
+                params.get('create_relationships'),
+                skip_unchanged
             )
+            delta = FeedIndicatorsDelta() if is_delta_mode_enabled(params) else None
+            if delta:
+                indicators = delta.filter(indicators)
             # we submit the indicators in batches
             for b in batch(indicators, batch_size=2000):
                 demisto.createIndicators(b)  # type: ignore
+            if skip_unchanged:
+                client.feeds_state.save()
+            if delta:
+                delta.save(keep_unseen=bool(client.feeds_state.unchanged_urls))
+                demisto.info(f'{feed_name} - indicators delta: {delta.added} added, {delta.changed} changed, '
+                             f'{0 if client.feeds_state.unchanged_urls else delta.removed} removed.')
         else:
             args = demisto.args()
             args['feed_name'] = feed_name
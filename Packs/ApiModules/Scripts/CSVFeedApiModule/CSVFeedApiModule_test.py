@@ -369,3 +369,37 @@ def test_get_indicators_without_relations():
         indicators = fetch_indicators_command(client, default_indicator_type=itype, auto_detect=False,
                                               limit=35, create_relationships=False)
         assert indicators == expected_res
+
+
+def test_build_iterator_skip_unchanged(mocker):
+    """
+    Given
+    - A feed whose state from the previous fetch holds an ETag and the digest of its content.
+
+    When
+    - Building the iterator with skip_unchanged, while the server returns 304 or the same content.
+
+    Then
+    - Ensure the conditional headers are sent and the feed is skipped.
+    - Ensure a changed content is detected and its new state is staged.
+    """
+    content = b'1.1.1.1\n2.2.2.2'
+    integration_context = {
+        'feeds_state': {
+            'https://ipstack.com': {'etag': '"v1"', 'digest': hashlib.sha256(content).hexdigest()}
+        }
+    }
+    mocker.patch.object(demisto, 'getIntegrationContext', return_value=integration_context)
+    client = Client(url='https://ipstack.com')
+    with requests_mock.Mocker() as m:
+        m.get('https://ipstack.com', [{'status_code': 304}, {'content': content}])
+        assert client.build_iterator(skip_unchanged=True) == []
+        assert client.build_iterator(skip_unchanged=True) == []
+        assert m.request_history[0].headers['If-None-Match'] == '"v1"'
+    assert not client.feeds_state._updates
+
+    changed_response = requests.Response()
+    changed_response._content = b'3.3.3.3'
+    changed_response.headers['ETag'] = '"v2"'
+    assert not client.feeds_state.is_unchanged('https://ipstack.com', changed_response)
+    assert client.feeds_state._updates['https://ipstack.com']['etag'] == '"v2"'
@@ -3,6 +3,9 @@ from CommonServerPython import *
 from CommonServerUserPython import *
 
 ''' IMPORTS '''
+import hashlib
+import itertools
+import tempfile
 import urllib3
 import requests
 from typing import Optional, Pattern, List
@@ -137,6 +140,7 @@ class Client(BaseClient):
         if custom_fields_mapping is None:
             custom_fields_mapping = {}
         self.custom_fields_mapping = custom_fields_mapping
+        self.feeds_state = FeedsState()
 
     def get_feed_config(self, fields_json: str = '', indicator_json: str = ''):
         """
@@ -189,9 +193,33 @@ class Client(BaseClient):
 
         return config
 
-    def build_iterator(self, **kwargs):
+    @staticmethod
+    def spool_response(response: requests.Response):
+        """
+        Writes the response content to a temporary file while computing its digest,
+        so the content can be checked for changes before it is parsed, without holding it in memory.
+        :param response: The streamed feed response
+        :return: A generator of the content lines and the content digest
+        """
+        sha256 = hashlib.sha256()
+        spool = tempfile.TemporaryFile()
+        for chunk in response.iter_content(chunk_size=1024 * 1024):
+            sha256.update(chunk)
+            spool.write(chunk)
+        spool.seek(0)
+
+        def iter_spooled_lines():
+            with spool:
+                for line in spool:
+                    yield from line.splitlines()
+
+        return iter_spooled_lines(), sha256.hexdigest()
+
+    def build_iterator(self, skip_unchanged: bool = False, **kwargs):
         """
         For each URL (service), send an HTTP request to get indicators and return them after filtering by Regex
+        :param skip_unchanged: Whether to skip URLs whose content has not changed since the previous fetch,
+            using conditional requests (ETag/Last-Modified) and a digest of the content.
         :param kwargs: Arguments to send to the HTTP API endpoint
         :return: List of indicators
         """
@@ -210,9 +238,13 @@ class Client(BaseClient):
             if not isinstance(urls, list):
                 urls = [urls]
             for url in urls:
+                request_kwargs = kwargs
+                if skip_unchanged:
+                    request_kwargs = dict(kwargs, headers=dict(kwargs.get('headers') or {},
+                                                               **self.feeds_state.get_conditional_headers(url)))
                 r = requests.get(
                     url,
-                    **kwargs
+                    **request_kwargs
                 )
                 try:
                     r.raise_for_status()
@@ -220,6 +252,10 @@ class Client(BaseClient):
                     LOG(f'{self.feed_name!r} - exception in request:'
                         f' {r.status_code!r} {r.content!r}')
                     raise
+                # the content of the other responses is checked once it is spooled
+                if skip_unchanged and r.status_code == 304 and self.feeds_state.is_unchanged(url, r):
+                    demisto.debug(f'{self.feed_name} - {url} was not modified since the previous fetch, skipping it.')
+                    continue
                 url_to_response_list.append({url: r})
         except requests.exceptions.ConnectTimeout as exception:
             err_msg = 'Connection Timeout Error - potential reasons might be that the Server URL parameter' \
@@ -249,7 +285,13 @@ class Client(BaseClient):
         results = []
         for url_to_response in url_to_response_list:
             for url, lines in url_to_response.items():
-                result = lines.iter_lines()
+                if skip_unchanged:
+                    result, digest = self.spool_response(lines)
+                    if self.feeds_state.is_unchanged(url, lines, digest):
+                        demisto.debug(f'{self.feed_name} - the content of {url} has not changed, skipping it.')
+                        continue
+                else:
+                    result = lines.iter_lines()
                 if self.encoding is not None:
                     result = map(
                         lambda x: x.decode(self.encoding).encode('utf_8'),
@@ -361,9 +403,20 @@ def get_indicator_fields(line, url, feed_tags: list, tlp_color: Optional[str], c
     return attributes, value
 
 
-def fetch_indicators_command(client, feed_tags, tlp_color, itype, auto_detect, create_relationships=False, **kwargs):
-    iterators = client.build_iterator(**kwargs)
-    indicators = []
+def iter_indicators(client, feed_tags, tlp_color, itype, auto_detect, create_relationships=False,
+                    skip_unchanged=False, **kwargs):
+    """
+    Yields the feed indicators one by one, as the lines are streamed from the feed URLs.
+    :param client: The client
+    :param feed_tags: The indicator tags.
+    :param tlp_color: Traffic Light Protocol color.
+    :param itype: The default indicator type.
+    :param auto_detect: Whether to auto detect the indicator type.
+    :param create_relationships: Whether to create the indicator relationships.
+    :param skip_unchanged: Whether to skip feed URLs whose content has not changed since the previous fetch.
+    :return: A generator of indicators
+    """
+    iterators = client.build_iterator(skip_unchanged=skip_unchanged, **kwargs)
     for iterator in iterators:
         for url, lines in iterator.items():
             for line in lines:
@@ -398,8 +451,31 @@ def fetch_indicators_command(client, feed_tags, tlp_color, itype, auto_detect, c
                         custom_fields = client.custom_fields_creator(attributes)
                         indicator_data["fields"] = custom_fields
 
-                    indicators.append(indicator_data)
-    return indicators
+                    yield indicator_data
+
+
+def fetch_indicators_command(client, feed_tags, tlp_color, itype, auto_detect, create_relationships=False, **kwargs):
+    return list(iter_indicators(client, feed_tags, tlp_color, itype, auto_detect, create_relationships, **kwargs))
+
+
+def fetch_indicators_in_batches(client, feed_tags, tlp_color, itype, auto_detect, create_relationships=False,
+                                batch_size=2000, skip_unchanged=False, **kwargs):
+    """
+    Yields the feed indicators in batches of up to batch_size indicators, so only a single batch is held in memory
+    regardless of the feed size.
+    :param batch_size: The maximal number of indicators in a batch.
+    :param skip_unchanged: Whether to skip feed URLs whose content has not changed since the previous fetch.
+    :return: A generator of indicator lists
+    """
+    indicators: list = []
+    for indicator in iter_indicators(client, feed_tags, tlp_color, itype, auto_detect, create_relationships,
+                                     skip_unchanged, **kwargs):
+        indicators.append(indicator)
+        if len(indicators) >= batch_size:
+            yield indicators
+            indicators = []
+    if indicators:
+        yield indicators
 
 
 def determine_indicator_type(indicator_type, default_indicator_type, auto_detect, value):
@@ -427,7 +503,8 @@ def get_indicators_command(client: Client, args):
     tlp_color = args.get('tlp_color')
     auto_detect = demisto.params().get('auto_detect_type')
     create_relationships = demisto.params().get('create_relationships')
-    indicators_list = fetch_indicators_command(client, feed_tags, tlp_color, itype, auto_detect, create_relationships)[:limit]
+    indicators_list = list(itertools.islice(
+        iter_indicators(client, feed_tags, tlp_color, itype, auto_detect, create_relationships), limit))
     entry_result = camelize(indicators_list)
     hr = tableToMarkdown('Indicators', entry_result, headers=['Value', 'Type', 'Rawjson'])
     return hr, {}, indicators_list
@@ -468,11 +545,23 @@ def feed_main(feed_name, params=None, prefix=''):
     }
     try:
         if command == 'fetch-indicators':
-            indicators = fetch_indicators_command(client, feed_tags, tlp_color, params.get('indicator_type'),
-                                                  params.get('auto_detect_type'), params.get('create_relationships'))
-            # we submit the indicators in batches
-            for b in batch(indicators, batch_size=2000):
-                demisto.createIndicators(b)
+            batch_size = arg_to_number(params.get('fetch_batch_size'), 'fetch_batch_size') or 2000
+            skip_unchanged = is_skip_unchanged_feed_enabled(params)
+            delta = FeedIndicatorsDelta() if is_delta_mode_enabled(params) else None
+            # we submit the indicators in batches, as the feed lines are streamed
+            for b in fetch_indicators_in_batches(client, feed_tags, tlp_color, params.get('indicator_type'),
+                                                 params.get('auto_detect_type'), params.get('create_relationships'),
+                                                 batch_size=batch_size, skip_unchanged=skip_unchanged):
+                if delta:
+                    b = delta.filter(b)
+                if b:
+                    demisto.createIndicators(b)
+            if skip_unchanged:
+                client.feeds_state.save()
+            if delta:
+                delta.save(keep_unseen=bool(client.feeds_state.unchanged_urls))
+                demisto.info(f'{feed_name} - indicators delta: {delta.added} added, {delta.changed} changed, '
+                             f'{0 if client.feeds_state.unchanged_urls else delta.removed} removed.')
         else:
             args = demisto.args()
             args['feed_name'] = feed_name
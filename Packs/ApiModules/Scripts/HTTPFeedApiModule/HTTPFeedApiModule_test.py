@@ -246,6 +246,135 @@ def test_feed_main_fetch_indicators(mocker, requests_mock):
     } in indicators
 
 
+def test_feed_main_fetch_indicators_in_batches(mocker, requests_mock):
+    """
+    Given
+    - Parameters (url, ignore_regex and fetch_batch_size) to configure a feed.
+
+    When
+    - Fetching indicators.
+
+    Then
+    - Ensure createIndicators is called with batches of up to fetch_batch_size indicators.
+    - Ensure all the 466 indicators are fetched.
+    """
+    feed_url = 'https://www.spamhaus.org/drop/asndrop.txt'
+    mocker.patch.object(
+        demisto, 'params',
+        return_value={
+            'url': feed_url,
+            'ignore_regex': '^;.*',
+            'indicator': '{"regex": "^AS[0-9]+"}',
+            'indicator_type': 'ASN',
+            'fetch_batch_size': '100'
+        }
+    )
+    mocker.patch.object(demisto, 'command', return_value='fetch-indicators')
+    mocker.patch.object(demisto, 'createIndicators')
+
+    with open('test_data/asn_ranges.txt') as asn_ranges_txt:
+        asn_ranges = asn_ranges_txt.read().encode('utf8')
+
+    requests_mock.get(feed_url, content=asn_ranges)
+    feed_main('great_feed_name')
+
+    batch_sizes = [len(call[0][0]) for call in demisto.createIndicators.call_args_list]
+    assert batch_sizes == [100, 100, 100, 100, 66]
+
+
+def test_feed_main_fetch_indicators_skip_unchanged(mocker, requests_mock):
+    """
+    Given
+    - A feed configured to skip unchanged content.
+
+    When
+    - Fetching indicators three times: the content is new, then the same, then the server returns 304.
+
+    Then
+    - Ensure the indicators are created only in the first fetch.
+    - Ensure the ETag from the first fetch is sent in the following requests.
+    """
+    feed_url = 'https://www.spamhaus.org/drop/asndrop.txt'
+    integration_context: dict = {}
+    mocker.patch.object(
+        demisto, 'params',
+        return_value={
+            'url': feed_url,
+            'ignore_regex': '^;.*',
+            'indicator': '{"regex": "^AS[0-9]+"}',
+            'indicator_type': 'ASN',
+            'skip_unchanged_feed': True,
+            'feedExpirationPolicy': 'never'
+        }
+    )
+    mocker.patch.object(demisto, 'command', return_value='fetch-indicators')
+    mocker.patch.object(demisto, 'createIndicators')
+    mocker.patch.object(demisto, 'getIntegrationContext', side_effect=lambda: integration_context)
+    mocker.patch.object(demisto, 'setIntegrationContext', side_effect=integration_context.update)
+
+    with open('test_data/asn_ranges.txt') as asn_ranges_txt:
+        asn_ranges = asn_ranges_txt.read().encode('utf8')
+
+    requests_mock.get(feed_url, [
+        {'content': asn_ranges, 'headers': {'ETag': '"v1"'}},
+        {'content': asn_ranges, 'headers': {'ETag': '"v1"'}},
+        {'status_code': 304}
+    ])
+    for _ in range(3):
+        feed_main('great_feed_name')
+
+    assert demisto.createIndicators.call_count == 1
+    assert len(demisto.createIndicators.call_args[0][0]) == 466
+    assert integration_context['feeds_state'][feed_url]['etag'] == '"v1"'
+    assert requests_mock.request_history[1].headers['If-None-Match'] == '"v1"'
+    assert requests_mock.request_history[2].headers['If-None-Match'] == '"v1"'
+
+
+def test_feed_main_fetch_indicators_delta_mode(mocker, requests_mock):
+    """
+    Given
+    - A feed configured with the delta mode.
+
+    When
+    - Fetching indicators twice, where in the second fetch one line was removed and one was added.
+
+    Then
+    - Ensure all the indicators are created in the first fetch, and only the added one in the second fetch.
+    """
+    feed_url = 'https://www.spamhaus.org/drop/asndrop.txt'
+    integration_context: dict = {}
+    mocker.patch.object(
+        demisto, 'params',
+        return_value={
+            'url': feed_url,
+            'ignore_regex': '^;.*',
+            'indicator': '{"regex": "^AS[0-9]+"}',
+            'indicator_type': 'ASN',
+            'delta_mode': True,
+            'feedExpirationPolicy': 'never'
+        }
+    )
+    mocker.patch.object(demisto, 'command', return_value='fetch-indicators')
+    mocker.patch.object(demisto, 'createIndicators')
+    mocker.patch.object(demisto, 'info')
+    mocker.patch.object(demisto, 'getIntegrationContext', side_effect=lambda: integration_context)
+    mocker.patch.object(demisto, 'setIntegrationContext', side_effect=integration_context.update)
+
+    with open('test_data/asn_ranges.txt') as asn_ranges_txt:
+        asn_ranges = asn_ranges_txt.read()
+    lines = asn_ranges.splitlines()
+    changed_asn_ranges = '\n'.join(lines[:-1] + ['AS0000001 ; US | NEW ORG'])
+
+    requests_mock.get(feed_url, [{'content': asn_ranges.encode('utf8')}, {'content': changed_asn_ranges.encode('utf8')}])
+    feed_main('great_feed_name')
+    feed_main('great_feed_name')
+
+    assert demisto.createIndicators.call_count == 2
+    assert len(demisto.createIndicators.call_args_list[0][0][0]) == 466
+    assert [indicator['value'] for indicator in demisto.createIndicators.call_args_list[1][0][0]] == ['AS0000001']
+    assert '1 added, 0 changed, 1 removed' in demisto.info.call_args[0][0]
+
+
 def test_feed_main_test_module(mocker, requests_mock):
     """
     Given
@@ -83,6 +83,8 @@ class Client:
             if content_type_header.lower() not in [k.lower() for k in self.headers.keys()]:
                 self.headers[content_type_header] = 'application/x-www-form-urlencoded'
 
+        self.feeds_state = FeedsState()
+
     @staticmethod
     def parse_headers(headers: Optional[Union[dict, str]]) -> dict:
         """Parse headers if passed as a string. Support a multiline string where each line contains a header
@@ -106,15 +108,18 @@ class Client:
         else:
             return headers
 
-    def build_iterator(self, feed: dict, **kwargs) -> List:
+    def build_iterator(self, feed: dict, skip_unchanged: bool = False, **kwargs) -> List:
         url = feed.get('url', self.url)
+        headers = self.headers
+        if skip_unchanged:
+            headers = dict(self.headers, **self.feeds_state.get_conditional_headers(url))
         if not self.post_data:
             r = requests.get(
                 url=url,
                 verify=self.verify,
                 auth=self.auth,
                 cert=self.cert,
-                headers=self.headers,
+                headers=headers,
                 **kwargs
             )
         else:
@@ -124,12 +129,15 @@ class Client:
                 verify=self.verify,
                 auth=self.auth,
                 cert=self.cert,
-                headers=self.headers,
+                headers=headers,
                 **kwargs
             )
 
         try:
             r.raise_for_status()
+            if skip_unchanged and self.feeds_state.is_unchanged(url, r):
+                demisto.debug(f'The content of {url} has not changed since the previous fetch, skipping it.')
+                return []
             data = r.json()
             result = jmespath.search(expression=feed.get('extractor'), data=data)
 
@@ -150,7 +158,8 @@ def test_module(client: Client, limit) -> str:
 
 
 def fetch_indicators_command(client: Client, indicator_type: str, feedTags: list, auto_detect: bool,
-                             create_relationships: bool = False, limit: int = 0, **kwargs) -> Union[Dict, List[Dict]]:
+                             create_relationships: bool = False, limit: int = 0, skip_unchanged: bool = False,
+                             **kwargs) -> Union[Dict, List[Dict]]:
     """
     Fetches the indicators from client.
     :param client: Client of a JSON Feed
@@ -159,6 +168,8 @@ def fetch_indicators_command(client: Client, indicator_type: str, feedTags: list
     :param auto_detect: a boolean indicates if we should automatically detect the indicator_type
     :param limit: given only when get-indicators command is running. function will return number indicators as the limit
     :param create_relationships: whether to add connected indicators
+    :param skip_unchanged: whether to skip feeds whose content has not changed since the previous fetch.
+        Not applied to feeds with a custom_build_iterator.
     """
     indicators: List[dict] = []
     feeds_results = {}
@@ -170,7 +181,7 @@ def fetch_indicators_command(client: Client, indicator_type: str, feedTags: list
                 raise Exception("Custom function to handle with pagination must return a list type")
             feeds_results[feed_name] = indicators_from_feed
         else:
-            feeds_results[feed_name] = client.build_iterator(feed, **kwargs)
+            feeds_results[feed_name] = client.build_iterator(feed, skip_unchanged=skip_unchanged, **kwargs)
 
     for service_name, items in feeds_results.items():
         feed_config = client.feed_name_to_config.get(service_name, {})
@@ -336,12 +347,24 @@ def feed_main(params, feed_name, prefix):
 
         elif command == 'fetch-indicators':
             create_relationships = params.get('create_relationships')
-            indicators = fetch_indicators_command(client, indicator_type, feedTags, auto_detect, create_relationships)
+            skip_unchanged = is_skip_unchanged_feed_enabled(params)
+            delta = FeedIndicatorsDelta() if is_delta_mode_enabled(params) else None
+            indicators = fetch_indicators_command(client, indicator_type, feedTags, auto_detect, create_relationships,
+                                                  skip_unchanged=skip_unchanged)
+            if delta:
+                indicators = delta.filter(indicators)
             if not len(indicators):
-                demisto.createIndicators(indicators)
+                if not skip_unchanged and not delta:
+                    demisto.createIndicators(indicators)
             else:
                 for b in batch(indicators, batch_size=2000):
                     demisto.createIndicators(b)
+            if skip_unchanged:
+                client.feeds_state.save()
+            if delta:
+                delta.save(keep_unseen=bool(client.feeds_state.unchanged_urls))
+                demisto.info(f'{feed_name} - indicators delta: {delta.added} added, {delta.changed} changed, '
+                             f'{0 if client.feeds_state.unchanged_urls else delta.removed} removed.')
 
         elif command == f'{prefix}get-indicators':
             # dummy command for testing
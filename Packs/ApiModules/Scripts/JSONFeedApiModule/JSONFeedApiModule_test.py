@@ -161,3 +161,45 @@ Stam : Ba
     assert res['User-Agent'] == 'test'
     assert res['Stam'] == 'Ba'
     assert len(res) == 3
+
+
+def test_fetch_indicators_skip_unchanged(mocker):
+    """
+    Given
+    - A JSON feed fetched with skip_unchanged.
+
+    When
+    - Fetching the feed three times: new content, the same content, and a 304 response.
+
+    Then
+    - Ensure the indicators are returned only in the first fetch.
+    - Ensure the ETag of the first fetch is sent in the following requests.
+    """
+    with open('test_data/amazon_ip_ranges.json') as ip_ranges_json:
+        ip_ranges = json.load(ip_ranges_json)
+
+    integration_context: dict = {}
+    mocker.patch.object(demisto, 'getIntegrationContext', side_effect=lambda: integration_context)
+    mocker.patch.object(demisto, 'setIntegrationContext', side_effect=integration_context.update)
+
+    with requests_mock.Mocker() as m:
+        m.get('https://ip-ranges.amazonaws.com/ip-ranges.json', [
+            {'json': ip_ranges, 'headers': {'ETag': '"v1"'}},
+            {'json': ip_ranges, 'headers': {'ETag': '"v1"'}},
+            {'status_code': 304}
+        ])
+        client = Client(
+            url='https://ip-ranges.amazonaws.com/ip-ranges.json',
+            extractor="prefixes[?service=='AMAZON']",
+            indicator='ip_prefix'
+        )
+
+        indicators_per_fetch = []
+        for _ in range(3):
+            indicators_per_fetch.append(fetch_indicators_command(client=client, indicator_type='CIDR', feedTags=[],
+                                                                 auto_detect=False, skip_unchanged=True))
+            client.feeds_state.save()
+
+        assert [len(indicators) for indicators in indicators_per_fetch] == [1117, 0, 0]
+        assert m.request_history[1].headers['If-None-Match'] == '"v1"'
+        assert m.request_history[2].headers['If-None-Match'] == '"v1"'
@@ -6,6 +6,7 @@ from CommonServerUserPython import *
 import requests
 import re
 import base64
+from threading import Lock
 from cryptography.hazmat.primitives.ciphers.aead import AESGCM
 from typing import Dict, Tuple, List, Optional
 
@@ -27,6 +28,13 @@ DEVICE_CODE = 'urn:ietf:params:oauth:grant-type:device_code'
 REGEX_SEARCH_URL = r'(?P<url>https?://[^\s]+)'
 SESSION_STATE = 'session_state'
 
+# access tokens obtained or read by this process, so the integration context is not read on every request.
+# the integration context is only the durable copy, written when a token is obtained.
+TOKEN_CACHE: Dict[tuple, dict] = {}
+TOKEN_CACHE_LOCK = Lock()
+# seconds before the expiration of a cached token in which it is refreshed ahead of time
+TOKEN_REFRESH_WINDOW = 300
+
 
 class MicrosoftClient(BaseClient):
     def __init__(self, tenant_id: str = '',
@@ -158,14 +166,54 @@ class MicrosoftClient(BaseClient):
     def get_access_token(self, resource: str = '', scope: Optional[str] = None) -> str:
         """
         Obtains access and refresh token from oproxy server or just a token from a self deployed app.
-        Access token is used and stored in the integration context
-        until expiration time. After expiration, new refresh token and access token are obtained and stored in the
-        integration context.
+        Access token is cached in the process and stored in the integration context
+        until expiration time. Shortly before expiration, new refresh token and access token are obtained and stored in
+        the integration context. Meanwhile, other threads keep using the current access token.
 
         Args:
             resource (str): The resource identifier for which the generated token will have access to.
             scope (str): A scope to get instead of the default on the API.
 
+        Returns:
+            str: Access token that will be added to authorization header.
+        """
+        cache_key = self._get_token_cache_key(resource, scope)
+        now = self.epoch_seconds()
+        cached_token = TOKEN_CACHE.get(cache_key)
+        if cached_token and now < cached_token['refresh_at']:
+            return cached_token['access_token']
+
+        if cached_token and now < cached_token['valid_until']:
+            # another thread is already refreshing the token, which is still valid
+            if not TOKEN_CACHE_LOCK.acquire(blocking=False):
+                return cached_token['access_token']
+        else:
+            TOKEN_CACHE_LOCK.acquire()
+        try:
+            refreshed_token = TOKEN_CACHE.get(cache_key)
+            if refreshed_token and refreshed_token is not cached_token and now < refreshed_token['valid_until']:
+                # refreshed by another thread while waiting for the lock
+                return refreshed_token['access_token']
+            return self._refresh_access_token(cache_key, now, resource, scope)
+        finally:
+            TOKEN_CACHE_LOCK.release()
+
+    def _get_token_cache_key(self, resource: str = '', scope: Optional[str] = None) -> tuple:
+        client_id = self.auth_id if self.auth_type == OPROXY_AUTH_TYPE else self.client_id
+        token_id = resource if self.multi_resource else scope
+        return self.token_retrieval_url, self.tenant_id, client_id, token_id
+
+    def _refresh_access_token(self, cache_key: tuple, now: int, resource: str = '', scope: Optional[str] = None) -> str:
+        """
+        Takes the access token from the integration context if it was obtained by another process, otherwise obtains
+        a new one and stores it in the integration context. Either way, the token is cached in the process.
+
+        Args:
+            cache_key (tuple): The key of the token in the process cache.
+            now (int): The current time in epoch seconds.
+            resource (str): The resource identifier for which the generated token will have access to.
+            scope (str): A scope to get instead of the default on the API.
+
         Returns:
             str: Access token that will be added to authorization header.
         """
@@ -177,51 +225,68 @@ class MicrosoftClient(BaseClient):
 
         if self.multi_resource:
             access_token = integration_context.get(resource)
+            # every resource has its own expiration, the shared one is kept for tokens stored by older versions
+            valid_until = integration_context.get(f'{resource}_valid_until', integration_context.get('valid_until'))
         else:
             access_token = integration_context.get(access_token_keyword)
+            valid_until = integration_context.get(valid_until_keyword)
 
-        valid_until = integration_context.get(valid_until_keyword)
-
-        if access_token and valid_until:
-            if self.epoch_seconds() < valid_until:
+        cached_token = TOKEN_CACHE.get(cache_key)
+        if access_token and valid_until and now < valid_until:
+            # use the stored token unless it is the one which is about to be refreshed
+            if not cached_token or valid_until > cached_token['valid_until']:
+                self._cache_token(cache_key, access_token, valid_until, now)
                 return access_token
 
         auth_type = self.auth_type
         if auth_type == OPROXY_AUTH_TYPE:
             if self.multi_resource:
-                for resource_str in self.resources:
-                    access_token, expires_in, refresh_token = self._oproxy_authorize(resource_str)
-                    self.resource_to_access_token[resource_str] = access_token
-                    self.refresh_token = refresh_token
+                access_token, expires_in, refresh_token = self._oproxy_authorize(resource)
+                self.resource_to_access_token[resource] = access_token
+                self.refresh_token = refresh_token
             else:
                 access_token, expires_in, refresh_token = self._oproxy_authorize(scope=scope)
 
         else:
             access_token, expires_in, refresh_token = self._get_self_deployed_token(
-                refresh_token, scope, integration_context)
+                refresh_token, scope, integration_context, resource)
         time_now = self.epoch_seconds()
         time_buffer = 5  # seconds by which to shorten the validity period
         if expires_in - time_buffer > 0:
             # err on the side of caution with a slightly shorter access token validity period
             expires_in = expires_in - time_buffer
         valid_until = time_now + expires_in
-        integration_context.update({
-            access_token_keyword: access_token,
-            valid_until_keyword: valid_until,
-            'current_refresh_token': refresh_token
-        })
 
-        # Add resource access token mapping
         if self.multi_resource:
-            integration_context.update(self.resource_to_access_token)
+            # Add resource access token mapping
+            access_token = self.resource_to_access_token[resource]
+            integration_context.update({
+                resource: access_token,
+                f'{resource}_valid_until': valid_until,
+                'current_refresh_token': refresh_token
+            })
+        else:
+            integration_context.update({
+                access_token_keyword: access_token,
+                valid_until_keyword: valid_until,
+                'current_refresh_token': refresh_token
+            })
 
         set_integration_context(integration_context)
-
-        if self.multi_resource:
-            return self.resource_to_access_token[resource]
+        self._cache_token(cache_key, access_token, valid_until, time_now)
 
         return access_token
 
+    @staticmethod
+    def _cache_token(cache_key: tuple, access_token: str, valid_until: int, now: int):
+        # tokens which are valid for less than twice the refresh window are refreshed in the middle of their validity
+        refresh_window = min(TOKEN_REFRESH_WINDOW, (valid_until - now) // 2)
+        TOKEN_CACHE[cache_key] = {
+            'access_token': access_token,
+            'valid_until': valid_until,
+            'refresh_at': valid_until - refresh_window
+        }
+
     def _oproxy_authorize(self, resource: str = '', scope: Optional[str] = None) -> Tuple[str, int, str]:
         """
         Gets a token by authorizing with oproxy.
@@ -281,14 +346,16 @@ class MicrosoftClient(BaseClient):
     def _get_self_deployed_token(self,
                                  refresh_token: str = '',
                                  scope: Optional[str] = None,
-                                 integration_context: Optional[dict] = None
+                                 integration_context: Optional[dict] = None,
+                                 resource: str = ''
                                  ) -> Tuple[str, int, str]:
         if self.grant_type == AUTHORIZATION_CODE:
             if not self.multi_resource:
                 return self._get_self_deployed_token_auth_code(refresh_token, scope=scope)
             else:
                 expires_in = -1  # init variable as an int
-                for resource in self.resources:
+                # only the requested resource, the others are obtained when they are requested
+                for resource in [resource] if resource else self.resources:
                     access_token, expires_in, refresh_token = self._get_self_deployed_token_auth_code(refresh_token,
                                                                                                       resource)
                     self.resource_to_access_token[resource] = access_token
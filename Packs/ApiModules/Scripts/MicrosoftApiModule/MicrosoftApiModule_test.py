@@ -22,6 +22,11 @@ SCOPE = 'https://graph.microsoft.com/.default'
 RESOURCE = 'https://defender.windows.com/shtak'
 
 
+@pytest.fixture(autouse=True)
+def clear_token_cache():
+    TOKEN_CACHE.clear()
+
+
 def oproxy_client_tenant():
     tenant_id = TENANT
     auth_id = f'{AUTH_ID}@{TOKEN_URL}'
@@ -296,3 +301,73 @@ def test_oproxy_use_resource(mocker):
 
     client._oproxy_authorize(resource)
     assert resource == mocked_post.call_args_list[0][1]['json']['resource']
+
+
+def test_get_access_token_cached(mocker):
+    """
+    Given:
+        A token which was obtained by the client
+    When:
+        Getting the access token again before the refresh window
+    Then:
+        Verify the token is taken from the process cache, without reading the integration context
+    """
+    client = oproxy_client_refresh()
+    get_context = mocker.patch.object(demisto, 'getIntegrationContext', return_value={})
+    mocker.patch.object(demisto, 'setIntegrationContext')
+    authorize = mocker.patch.object(client, '_oproxy_authorize', return_value=(TOKEN, 3600, REFRESH_TOKEN))
+    mocker.patch.object(client, 'epoch_seconds', side_effect=[10, 10, 1000, 3000])
+
+    assert client.get_access_token() == TOKEN
+    assert client.get_access_token() == TOKEN
+    assert client.get_access_token() == TOKEN
+
+    assert get_context.call_count == 1
+    assert authorize.call_count == 1
+
+
+def test_get_access_token_refresh_in_progress(mocker):
+    """
+    Given:
+        A cached token which is about to expire, and another thread which is refreshing it
+    When:
+        Getting the access token
+    Then:
+        Verify the current token is returned without waiting for the refresh
+    """
+    client = oproxy_client_refresh()
+    mocker.patch.object(demisto, 'getIntegrationContext', return_value={})
+    mocker.patch.object(demisto, 'setIntegrationContext')
+    authorize = mocker.patch.object(client, '_oproxy_authorize', return_value=(TOKEN, 3600, REFRESH_TOKEN))
+    mocker.patch.object(client, 'epoch_seconds', side_effect=[10, 10, 3500])
+    client.get_access_token()
+
+    with TOKEN_CACHE_LOCK:
+        assert client.get_access_token() == TOKEN
+
+    assert authorize.call_count == 1
+
+
+def test_get_access_token_multi_resource(mocker):
+    """
+    Given:
+        multi_resource client
+    When:
+        Getting the access token of a single resource
+    Then:
+        Verify only this resource is authorized and its expiration is stored in the integration context
+    """
+    client = oproxy_client_multi_resource()
+    mocker.patch.object(demisto, 'getIntegrationContext', return_value={})
+    set_context = mocker.patch.object(demisto, 'setIntegrationContext')
+    authorize = mocker.patch.object(client, '_oproxy_authorize', return_value=(TOKEN, 3600, REFRESH_TOKEN))
+    mocker.patch.object(client, 'epoch_seconds', return_value=10)
+
+    assert client.get_access_token(resource='https://resource2.com') == TOKEN
+
+    authorize.assert_called_once_with('https://resource2.com')
+    assert set_context.call_args[0][0] == {
+        'https://resource2.com': TOKEN,
+        'https://resource2.com_valid_until': 3605,
+        'current_refresh_token': REFRESH_TOKEN
+    }
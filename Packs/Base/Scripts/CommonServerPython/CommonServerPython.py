@@ -6,11 +6,14 @@ Note that adding code to CommonServerUserPython can override functions in Common
 from __future__ import print_function
 
 import base64
+import bisect
+import hashlib
 import json
 import logging
 import os
 import re
 import socket
+import struct
 import sys
 import time
 import traceback
@@ -20,11 +23,17 @@ from collections import OrderedDict
 from datetime import datetime, timedelta
 from abc import abstractmethod
 from distutils.version import LooseVersion
-from threading import Lock
+from multiprocessing.pool import ThreadPool
+from threading import Event, Lock, Thread
 
 import demistomock as demisto
 import warnings
 
+try:
+    import queue
+except ImportError:  # Python 2
+    import Queue as queue  # type: ignore
+
 
 class WarningsHandler(object):
     #    Wrapper to handle warnings. We use a class to cleanup after execution
@@ -496,6 +505,15 @@ def is_debug_mode():
     return hasattr(demisto, 'is_debug') and demisto.is_debug
 
 
+def is_batch_mode():
+    """Return if the messages to the server which don't expect a response (logs and results) are batched
+
+    :return: true if the messages are batched
+    :rtype: ``bool``
+    """
+    return hasattr(demisto, 'isBatchMode') and demisto.isBatchMode()
+
+
 def get_schedule_metadata(context):
     """
         Get the entry schedule metadata if available
@@ -520,72 +538,144 @@ def get_schedule_metadata(context):
     return schedule_metadata
 
 
-def auto_detect_indicator_type(indicator_value):
+class IndicatorTypeClassifier(object):
     """
-      Infer the type of the indicator.
+    Infers the type of indicator values, with the same results as running the indicator regexes one by one.
+    The regexes are compiled once, and each regex is tried only if the value passes cheap checks
+    (first character, length and separator characters) which are required for it to match.
+    A single TLD extractor is kept for detecting domains.
 
-      :type indicator_value: ``str``
-      :param indicator_value: The indicator whose type we want to check. (required)
-
-      :return: The type of the indicator.
-      :rtype: ``str``
+    :return: No data returned
+    :rtype: ``None``
     """
-    try:
-        import tldextract
-    except Exception:
-        raise Exception("Missing tldextract module, In order to use the auto detect function please use a docker"
-                        " image with it installed such as: demisto/jmespath")
+    HEX_CHARS = frozenset('0123456789abcdefABCDEF')
+    URL_PREFIXES = ('http', 'hxxp', 'ftp', 'www')
 
-    if re.match(ipv4cidrRegex, indicator_value):
-        return FeedIndicatorType.CIDR
+    def __init__(self):
+        self._ipv4cidr = re.compile(ipv4cidrRegex)
+        self._ipv6cidr = re.compile(ipv6cidrRegex)
+        self._ipv4 = re.compile(ipv4Regex)
+        self._ipv6 = re.compile(ipv6Regex)
+        self._url = re.compile(urlRegex)
+        self._email = re.compile(emailRegex)
+        self._cve = re.compile(cveRegex)
+        self._tld_extractor = None
+
+    def _get_tld_extractor(self):
+        if self._tld_extractor is None:
+            import tldextract
+            tldextract_version = tldextract.__version__
+            if LooseVersion(tldextract_version) < '3.0.0':
+                self._tld_extractor = tldextract.TLDExtract(cache_file=False, suffix_list_urls=None)
+            else:
+                self._tld_extractor = tldextract.TLDExtract(cache_dir=False, suffix_list_urls=None)
+        return self._tld_extractor
 
-    if re.match(ipv6cidrRegex, indicator_value):
-        return FeedIndicatorType.IPv6CIDR
+    def _match_regexes(self, indicator_value):
+        length = len(indicator_value)
+        if not length:
+            return None
+        first_char = indicator_value[0]
+        starts_with_digit = first_char.isdigit()
+        starts_with_hex = first_char in self.HEX_CHARS
+        has_slash = '/' in indicator_value
+        has_colon = ':' in indicator_value
 
-    if re.match(ipv4Regex, indicator_value):
-        return FeedIndicatorType.IP
+        if starts_with_digit and has_slash and self._ipv4cidr.match(indicator_value):
+            return FeedIndicatorType.CIDR
 
-    if re.match(ipv6Regex, indicator_value):
-        return FeedIndicatorType.IPv6
+        if has_colon and has_slash and self._ipv6cidr.match(indicator_value):
+            return FeedIndicatorType.IPv6CIDR
 
-    if re.match(sha256Regex, indicator_value):
-        return FeedIndicatorType.File
+        if starts_with_digit and '.' in indicator_value and self._ipv4.match(indicator_value):
+            return FeedIndicatorType.IP
 
-    if re.match(urlRegex, indicator_value):
-        return FeedIndicatorType.URL
+        if has_colon and self._ipv6.match(indicator_value):
+            return FeedIndicatorType.IPv6
 
-    if re.match(md5Regex, indicator_value):
-        return FeedIndicatorType.File
+        if length >= 64 and starts_with_hex and sha256Regex.match(indicator_value):
+            return FeedIndicatorType.File
 
-    if re.match(sha1Regex, indicator_value):
-        return FeedIndicatorType.File
+        if indicator_value.startswith(self.URL_PREFIXES) and self._url.match(indicator_value):
+            return FeedIndicatorType.URL
 
-    if re.match(emailRegex, indicator_value):
-        return FeedIndicatorType.Email
+        if length >= 32 and starts_with_hex:
+            if md5Regex.match(indicator_value) or (length >= 40 and sha1Regex.match(indicator_value)):
+                return FeedIndicatorType.File
 
-    if re.match(cveRegex, indicator_value):
-        return FeedIndicatorType.CVE
+        if '@' in indicator_value and self._email.match(indicator_value):
+            return FeedIndicatorType.Email
 
-    if re.match(sha512Regex, indicator_value):
-        return FeedIndicatorType.File
+        if indicator_value[:4].lower() == 'cve-' and self._cve.match(indicator_value):
+            return FeedIndicatorType.CVE
 
-    try:
-        tldextract_version = tldextract.__version__
-        if LooseVersion(tldextract_version) < '3.0.0':
-            no_cache_extract = tldextract.TLDExtract(cache_file=False, suffix_list_urls=None)
-        else:
-            no_cache_extract = tldextract.TLDExtract(cache_dir=False, suffix_list_urls=None)
+        if length >= 128 and starts_with_hex and sha512Regex.match(indicator_value):
+            return FeedIndicatorType.File
 
-        if no_cache_extract(indicator_value).suffix:
-            if '*' in indicator_value:
-                return FeedIndicatorType.DomainGlob
-            return FeedIndicatorType.Domain
+        return None
+
+    def classify_one(self, indicator_value):
+        """
+        Infer the type of the indicator.
+
+        :type indicator_value: ``str``
+        :param indicator_value: The indicator whose type we want to check. (required)
+
+        :return: The type of the indicator.
+        :rtype: ``str``
+        """
+        indicator_type = self._match_regexes(indicator_value)
+        if indicator_type:
+            return indicator_type
+
+        try:
+            if self._get_tld_extractor()(indicator_value).suffix:
+                if '*' in indicator_value:
+                    return FeedIndicatorType.DomainGlob
+                return FeedIndicatorType.Domain
 
+        except Exception:
+            demisto.debug('tldextract failed to detect indicator type. indicator value: {}'.format(indicator_value))
+
+        demisto.debug('Failed to detect indicator type. Indicator value: {}'.format(indicator_value))
+        return None
+
+    def classify(self, indicator_values):
+        """
+        Infer the types of a batch of indicators.
+
+        :type indicator_values: ``list``
+        :param indicator_values: The indicators whose types we want to check.
+
+        :return: The types of the indicators, in the same order.
+        :rtype: ``list``
+        """
+        return [self.classify_one(indicator_value) for indicator_value in indicator_values]
+
+
+_indicator_type_classifier = None
+
+
+def auto_detect_indicator_type(indicator_value):
+    """
+      Infer the type of the indicator.
+
+      :type indicator_value: ``str``
+      :param indicator_value: The indicator whose type we want to check. (required)
+
+      :return: The type of the indicator.
+      :rtype: ``str``
+    """
+    global _indicator_type_classifier
+    try:
+        import tldextract  # noqa: F401
     except Exception:
-        demisto.debug('tldextract failed to detect indicator type. indicator value: {}'.format(indicator_value))
+        raise Exception("Missing tldextract module, In order to use the auto detect function please use a docker"
+                        " image with it installed such as: demisto/jmespath")
 
-    demisto.debug('Failed to detect indicator type. Indicator value: {}'.format(indicator_value))
-    return None
+    if _indicator_type_classifier is None:
+        _indicator_type_classifier = IndicatorTypeClassifier()
+    return _indicator_type_classifier.classify_one(indicator_value)
 
 
 def handle_proxy(proxy_param_name='proxy', checkbox_default_value=False, handle_insecure=True,
@@ -2232,6 +2322,129 @@ def xml2json(xmlstring, options={}, strip_ns=1, strip=1):
     return elem2json(elem, options, strip_ns=strip_ns, strip=strip)
 
 
+def elem_to_value(elem, strip_ns=1, strip=1, tags=None):
+    """Convert an Element into the value elem_to_internal maps its tag to, using plain dicts.
+    tags caches the tag names with the namespace stripped."""
+
+    d = {}  # type: dict
+    for key, value in elem.attrib.items():
+        d['@' + key] = value
+
+    for subelem in elem:
+        tag = subelem.tag
+        if strip_ns:
+            if tags is None:
+                tags = {}
+            try:
+                tag = tags[subelem.tag]
+            except KeyError:
+                tag = tags[subelem.tag] = strip_tag(subelem.tag)
+
+        value = elem_to_value(subelem, strip_ns=strip_ns, strip=strip, tags=tags)
+        existing = d.get(tag)
+        if existing is None and tag not in d:
+            d[tag] = value
+        elif isinstance(existing, list):
+            existing.append(value)
+        else:
+            d[tag] = [existing, value]
+
+    text = elem.text
+    tail = elem.tail
+    if strip:
+        # ignore leading and trailing whitespace
+        if text:
+            text = text.strip()
+        if tail:
+            tail = tail.strip()
+
+    if tail:
+        d['#tail'] = tail
+
+    if d:
+        # use #text element if other attributes exist
+        if text:
+            d["#text"] = text
+        return d
+    # text is the value if no attributes
+    return text or None
+
+
+def xml2dict(xmlstring, strip_ns=1, strip=1):
+    """
+       Convert an XML string into a dict in a single pass, without the JSON serialization of xml2json.
+       The result equals json.loads(xml2json(xmlstring)).
+
+       :type xmlstring: ``str``
+       :param xmlstring: The string to be converted (required)
+
+       :type strip_ns: ``int``
+       :param strip_ns: Whether to remove the namespaces from the tag names
+
+       :type strip: ``int``
+       :param strip: Whether to remove the leading and trailing whitespace of the texts
+
+       :return: The converted XML
+       :rtype: ``dict``
+    """
+    elem = ET.fromstring(xmlstring)
+    tag = strip_tag(elem.tag) if strip_ns else elem.tag
+    return {tag: elem_to_value(elem, strip_ns=strip_ns, strip=strip)}
+
+
+def iter_xml2dict(source, tag, strip_ns=1, strip=1):
+    """
+       Parse an XML file incrementally and yield each element with the given tag as converted by xml2dict.
+       Yielded elements are released, so memory stays bounded for very large documents (config exports,
+       logs, scan reports). Elements nested inside a yielded element are not yielded on their own, and the
+       text following a yielded element (its tail) is not included, as it is not parsed yet when it is yielded.
+
+       :type source: ``str`` or ``file``
+       :param source: The path of the XML file or a file object opened in binary mode (required)
+
+       :type tag: ``str``
+       :param tag: The tag of the elements to yield (required)
+
+       :type strip_ns: ``int``
+       :param strip_ns: Whether to remove the namespaces from the tag names
+
+       :type strip: ``int``
+       :param strip: Whether to remove the leading and trailing whitespace of the texts
+
+       :return: A generator of the converted elements, e.g. ``{'entry': {...}}``
+       :rtype: ``generator``
+    """
+    tags = {}  # type: dict
+    open_elements = []  # type: list
+    matched_depth = 0
+    for event, elem in ET.iterparse(source, events=('start', 'end')):
+        elem_tag = elem.tag
+        if strip_ns:
+            try:
+                elem_tag = tags[elem.tag]
+            except KeyError:
+                elem_tag = tags[elem.tag] = strip_tag(elem.tag)
+
+        if event == 'start':
+            open_elements.append(elem)
+            if elem_tag == tag:
+                matched_depth += 1
+            continue
+
+        open_elements.pop()
+        if elem_tag != tag:
+            continue
+        matched_depth -= 1
+        if matched_depth:
+            continue
+
+        elem.tail = None
+        yield {elem_tag: elem_to_value(elem, strip_ns=strip_ns, strip=strip, tags=tags)}
+        elem.clear()
+        if open_elements:
+            open_elements[-1].remove(elem)
+
+
 def json2xml(json_data, factory=ET.Element):
     """Convert a JSON string into an XML string.
     Whatever Element implementation we could import will be used by
@@ -5793,6 +6006,14 @@ def return_results(results):
         return
 
     elif results and isinstance(results, list):
+        if is_batch_mode() and all(isinstance(result, (dict, str, CommandResults)) or hasattr(result, 'to_entry')
+                                   for result in results):
+            # all the entries in a single message, in their original order
+            demisto.results([result.to_context() if isinstance(result, CommandResults)
+                             else result if isinstance(result, (dict, str))
+                             else result.to_entry() for result in results])
+            return
+
         result_list = []
         for result in results:
             if isinstance(result, (dict, str)):
@@ -6588,6 +6809,30 @@ except Exception as ex:
     demisto.info('Failed initializing DebugLogger: {}'.format(ex))
 
 
+def reset_module_state():
+    """Re-initializes the module globals which depend on the executed script/command: the params, the debug
+    mode loggers and the cached server version.
+    The python execution loop may run this module once per container and reuse its namespace for every script,
+    in which case it calls this function before each script instead of executing the whole module again.
+
+    :return: No data returned
+    :rtype: ``None``
+    """
+    global LOG, _requests_logger, get_demisto_version
+    if (not os.getenv('COMMON_SERVER_NO_AUTO_PARAMS_REMOVE_NULLS')) and hasattr(demisto, 'params') and demisto.params():
+        demisto.callingContext['params'] = SmartGetDict(demisto.params())
+    LOG = IntegrationLogger(debug_logging=is_debug_mode())
+    get_demisto_version = GetDemistoVersion()
+    # drop the previous logger first, so it restores the http_client patches before a new one is created
+    _requests_logger = None
+    try:
+        if is_debug_mode():
+            _requests_logger = DebugLogger()
+            _requests_logger.log_start_debug()
+    except Exception as ex:
+        demisto.info('Failed initializing DebugLogger: {}'.format(ex))
+
+
 def parse_date_string(date_string, date_format='%Y-%m-%dT%H:%M:%S'):
     """
         Parses the date_string function to the corresponding datetime object.
@@ -6803,17 +7048,28 @@ if 'requests' in sys.modules:
             The request authorization, for example: (username, password).
             Can be None.
 
+        :type pool_maxsize: ``int``
+        :param pool_maxsize:
+            The maximal number of connections kept open to a single host by the session.
+            Raised automatically by ``_http_request_many`` to match its number of workers.
+
         :return: No data returned
         :rtype: ``None``
         """
 
-        def __init__(self, base_url, verify=True, proxy=False, ok_codes=tuple(), headers=None, auth=None):
+        def __init__(self, base_url, verify=True, proxy=False, ok_codes=tuple(), headers=None, auth=None,
+                     pool_maxsize=requests.adapters.DEFAULT_POOLSIZE):
             self._base_url = base_url
             self._verify = verify
             self._ok_codes = ok_codes
             self._headers = headers
             self._auth = auth
             self._session = requests.Session()
+            self._pool_maxsize = pool_maxsize
+            self._adapters = {}  # type: Dict[Any, HTTPAdapter]
+            self._adapters_lock = Lock()
+            self._mounted_retry_key = None  # type: Any
+            self._mount_adapter()
             if not proxy:
                 skip_proxy()
 
@@ -6826,6 +7082,46 @@ if 'requests' in sys.modules:
             except Exception:  # noqa
                 demisto.debug('failed to close BaseClient session with the following error:\n{}'.format(traceback.format_exc()))
 
+        def _mount_adapter(self, retry_key=None, retry=None):
+            """
+            Mounts a pooled HTTP adapter on the session.
+            Adapters are kept per retry configuration, so switching between configurations
+            reuses the already open connections instead of building a new adapter on every request.
+
+            :type retry_key: ``tuple``
+            :param retry_key: A hashable representation of the retry configuration. None for no retries.
+
+            :type retry: ``Retry``
+            :param retry: The retry object to build the adapter with, if it was not built before.
+            """
+            with self._adapters_lock:
+                adapter = self._adapters.get(retry_key)
+                if adapter is None:
+                    adapter = HTTPAdapter(pool_connections=self._pool_maxsize,
+                                          pool_maxsize=self._pool_maxsize,
+                                          max_retries=retry if retry is not None else 0)
+                    self._adapters[retry_key] = adapter
+                self._session.mount('http://', adapter)
+                self._session.mount('https://', adapter)
+                self._mounted_retry_key = retry_key
+
+        def _resize_pool(self, pool_maxsize):
+            """
+            Rebuilds the session adapters so that up to ``pool_maxsize`` connections are kept open to a single host.
+
+            :type pool_maxsize: ``int``
+            :param pool_maxsize: The new maximal number of connections per host.
+            """
+            with self._adapters_lock:
+                retry_key = self._mounted_retry_key
+                mounted_adapter = self._adapters.get(retry_key)
+                retry = mounted_adapter.max_retries if mounted_adapter else None
+                for adapter in self._adapters.values():
+                    adapter.close()
+                self._adapters = {}
+                self._pool_maxsize = pool_maxsize
+            self._mount_adapter(retry_key, retry)
+
         def _implement_retry(self, retries=0,
                              status_list_to_retry=None,
                              backoff_factor=5,
@@ -6868,6 +7164,9 @@ if 'requests' in sys.modules:
                 if status falls in ``status_forcelist`` range and retries have
                 been exhausted.
             """
+            retry_key = (retries, frozenset(status_list_to_retry or ()), backoff_factor, raise_on_redirect, raise_on_status)
+            if retry_key == self._mounted_retry_key:
+                return
             try:
                 method_whitelist = "allowed_methods" if hasattr(Retry.DEFAULT, "allowed_methods") else "method_whitelist"
                 whitelist_kawargs = {
@@ -6884,9 +7183,7 @@ if 'requests' in sys.modules:
                     raise_on_redirect=raise_on_redirect,
                     **whitelist_kawargs
                 )
-                adapter = HTTPAdapter(max_retries=retry)
-                self._session.mount('http://', adapter)
-                self._session.mount('https://', adapter)
+                self._mount_adapter(retry_key, retry)
             except NameError:
                 pass
 
@@ -7080,6 +7377,57 @@ if 'requests' in sys.modules:
                 err_msg = 'Max Retries Error- Request attempts with {} retries failed. \n{}'.format(retries, reason)
                 raise DemistoException(err_msg, exception)
 
+        def _http_request_many(self, requests_kwargs, max_workers=requests.adapters.DEFAULT_POOLSIZE,
+                               raise_on_error=True):
+            """Sends a batch of requests concurrently, using a bounded thread pool over the client's pooled session.
+            Useful for commands which make the same API call for many indicators.
+
+            Each request runs in a worker thread. An ``error_handler`` which calls the server (for example
+            ``demisto.debug``) requires calling ``support_multithreading()`` first.
+            The retry mechanism is mounted on the shared session, so all the requests of a batch
+            should use the same retry arguments.
+
+            :type requests_kwargs: ``list``
+            :param requests_kwargs:
+                A list of dictionaries, each holding the keyword arguments of a single ``_http_request`` call,
+                for example: [{'method': 'GET', 'url_suffix': 'ip/8.8.8.8'}, {'method': 'GET', 'url_suffix': 'ip/1.1.1.1'}]
+
+            :type max_workers: ``int``
+            :param max_workers:
+                The maximal number of requests sent in parallel, which is also the maximal number of
+                connections opened to a single host.
+
+            :type raise_on_error: ``bool``
+            :param raise_on_error:
+                Whether to raise an exception if any of the requests failed.
+                If False, the exception is returned in place of the failed request's response.
+
+            :return: The responses (or exceptions), in the same order as ``requests_kwargs``.
+            :rtype: ``list``
+            """
+            requests_kwargs = list(requests_kwargs)
+            if not requests_kwargs:
+                return []
+
+            max_workers = max(1, min(max_workers, len(requests_kwargs)))
+            if max_workers > self._pool_maxsize:
+                self._resize_pool(max_workers)
+
+            def send_request(request_kwargs):
+                try:
+                    return self._http_request(**request_kwargs)
+                except Exception as exception:
+                    if raise_on_error:
+                        raise
+                    return exception
+
+            pool = ThreadPool(max_workers)
+            try:
+                return pool.map(send_request, requests_kwargs)
+            finally:
+                pool.close()
+                pool.join()
+
         def _is_status_code_valid(self, response, ok_codes=None):
             """If the status code is OK, return 'True'.
 
@@ -7806,9 +8154,17 @@ class IndicatorsSearcher:
     :type limit ``Optional[int]``
     :param limit the upper limit of the search (will be updated via iter)
 
+    :type prefetch: ``int``
+    :param prefetch: when iterating, the number of pages to fetch ahead in a background thread while the
+        current page is processed. 0 (default) fetches each page only when it is requested.
+        When used, the calls to the server are locked (see ``support_multithreading``), and ``page``/``total``
+        reflect the fetched pages rather than the processed ones. Call ``close()`` when stopping the iteration early.
+
     :return: No data returned
     :rtype: ``None``
     """
+    PREFETCH_PUT_TIMEOUT = 300
+
     def __init__(self,
                  page=0,
                  filter_fields=None,
@@ -7817,7 +8173,8 @@ class IndicatorsSearcher:
                  size=100,
                  to_date=None,
                  value='',
-                 limit=None):
+                 limit=None,
+                 prefetch=0):
         # searchAfter is available in searchIndicators from version 6.1.0
         self._can_use_search_after = is_demisto_version_ge('6.1.0')
         # populateFields merged in https://github.com/demisto/server/pull/18398
@@ -7836,13 +8193,21 @@ class IndicatorsSearcher:
         self._original_limit = limit
         self._next_limit = limit
         self._search_is_done = False
+        self._prefetch = prefetch
+        self._prefetch_queue = None
+        self._prefetch_stop = None  # type: Optional[Event]
+        self._prefetch_thread = None  # type: Optional[Thread]
+        self._prefetch_pending = None
 
     def __iter__(self):
+        self.close()
         self._total = None
         self._search_after_param = None
         self._page = self._original_page
         self.limit = self._original_limit
         self._search_is_done = False
+        if self._prefetch:
+            self._start_prefetch()
         return self
 
     # python2
@@ -7850,6 +8215,88 @@ class IndicatorsSearcher:
         return self.__next__()
 
     def __next__(self):
+        if self._prefetch_queue is not None:
+            res, error = self._get_prefetched_page()
+            if error is not None:
+                self.close()
+                raise error
+            return res
+        return self._fetch_next_page()
+
+    def close(self):
+        """Stops fetching pages in the background, if an iteration with prefetch is in progress.
+
+        :return: No data returned
+        :rtype: ``None``
+        """
+        if self._prefetch_stop is not None:
+            self._prefetch_stop.set()
+        if self._prefetch_thread is not None:
+            self._prefetch_thread.join()
+        self._prefetch_queue = None
+        self._prefetch_stop = None
+        self._prefetch_thread = None
+        self._prefetch_pending = None
+
+    def _start_prefetch(self):
+        if getattr(demisto, 'lock', None) is None and hasattr(demisto, '_Demisto__do'):
+            # the calls to the server from the prefetch thread must not interleave with the ones of the caller
+            support_multithreading()
+        self._prefetch_queue = queue.Queue(maxsize=self._prefetch)
+        self._prefetch_stop = Event()
+        self._prefetch_thread = Thread(target=self._prefetch_pages,
+                                       args=(self._prefetch_queue, self._prefetch_stop))
+        self._prefetch_thread.daemon = True
+        self._prefetch_thread.start()
+
+    def _get_prefetched_page(self):
+        """Returns the next (page, error) pair of the prefetch thread.
+        If the thread gave up on a full queue, continues the iteration synchronously from where it stopped.
+        """
+        while True:
+            try:
+                return self._prefetch_queue.get(timeout=1)
+            except queue.Empty:
+                if self._prefetch_thread.is_alive():
+                    continue
+            try:
+                # the thread may have put a last page right before exiting
+                return self._prefetch_queue.get_nowait()
+            except queue.Empty:
+                break
+        pending = self._prefetch_pending
+        self.close()
+        if pending is not None:
+            return pending
+        try:
+            return self._fetch_next_page(), None
+        except Exception as e:  # StopIteration included
+            return None, e
+
+    def _prefetch_pages(self, pages_queue, stop_event):
+        """Fetches the pages into the queue until the search is done, an error occurs or the iteration is closed.
+        Gives up if the queue stays full for PREFETCH_PUT_TIMEOUT seconds, as the iteration may have been abandoned,
+        leaving the fetched page for the caller in case it resumes.
+        """
+        while not stop_event.is_set():
+            error = None
+            try:
+                res = self._fetch_next_page()
+            except Exception as e:  # StopIteration included
+                res, error = None, e
+            put_deadline = time.time() + self.PREFETCH_PUT_TIMEOUT
+            while not stop_event.is_set():
+                try:
+                    pages_queue.put((res, error), timeout=1)
+                    break
+                except queue.Full:
+                    if time.time() > put_deadline:
+                        self._prefetch_pending = (res, error)
+                        return
+            if error is not None:
+                return
+
+    def _fetch_next_page(self):
         if self._search_is_done:
             raise StopIteration
         size = min(self._size, self.limit or self._size)
@@ -8009,6 +8456,377 @@ def set_feed_last_run(last_run_indicators):
         demisto.setIntegrationContext(last_run_indicators)
 
 
+class FeedsState(object):
+    """
+    Keeps the state of the URLs fetched by a feed integration in the integration context: their ETag and
+    Last-Modified headers and a digest of their content, so the feeds whose content has not changed since the
+    previous fetch can be skipped. The state of the changed feeds is staged, to be saved once their indicators
+    were created.
+
+    :type context_key: ``str``
+    :param context_key: The integration context key to store the feeds state in.
+
+    :return: No data returned
+    :rtype: ``None``
+    """
+
+    def __init__(self, context_key='feeds_state'):
+        self._context_key = context_key
+        self._previous = None  # type: Optional[Dict[str, Dict[str, Any]]]
+        self._updates = {}  # type: Dict[str, Dict[str, Any]]
+        self.unchanged_urls = []  # type: List[str]
+
+    def _get_feed_state(self, url):
+        # loaded on first use, so commands which don't skip unchanged feeds don't read the integration context
+        if self._previous is None:
+            self._previous = get_integration_context().get(self._context_key, {})
+        return self._previous.get(url, {})
+
+    def get_conditional_headers(self, url):
+        """
+        Builds the conditional request headers of a feed URL, according to its state from the previous fetch.
+
+        :type url: ``str``
+        :param url: The feed URL.
+
+        :return: The If-None-Match and If-Modified-Since headers.
+        :rtype: ``dict``
+        """
+        feed_state = self._get_feed_state(url)
+        headers = {}
+        if feed_state.get('etag'):
+            headers['If-None-Match'] = feed_state['etag']
+        if feed_state.get('last_modified'):
+            headers['If-Modified-Since'] = feed_state['last_modified']
+        return headers
+
+    def is_unchanged(self, url, response, digest=None):
+        """
+        Checks whether the content of a feed URL has not changed since the previous fetch, either since the server
+        answered the conditional request with 304 or since the content digest is the same. Unchanged URLs are added
+        to ``unchanged_urls``, and the new state of the changed ones is staged.
+
+        :type url: ``str``
+        :param url: The feed URL.
+
+        :type response: ``requests.Response``
+        :param response: The feed response.
+
+        :type digest: ``str``
+        :param digest: The SHA256 hex digest of the content, if it was computed while it was streamed.
+            By default it is computed from the response content.
+
+        :return: True if the feed content is the same as in the previous fetch.
+        :rtype: ``bool``
+        """
+        if response.status_code == 304:
+            unchanged = True
+        else:
+            if digest is None:
+                digest = hashlib.sha256(response.content).hexdigest()
+            unchanged = self._get_feed_state(url).get('digest') == digest
+            if not unchanged:
+                self._updates[url] = {
+                    'etag': response.headers.get('ETag'),
+                    'last_modified': response.headers.get('Last-Modified'),
+                    'digest': digest
+                }
+        if unchanged:
+            self.unchanged_urls.append(url)
+        return unchanged
+
+    def save(self):
+        """
+        Saves the staged state of the changed feeds to the integration context.
+        Should be called only after the indicators of the changed feeds were created.
+
+        :return: No data returned
+        :rtype: ``None``
+        """
+        if not self._updates:
+            return
+        integration_context = get_integration_context()
+        feeds_state = integration_context.get(self._context_key, {})
+        feeds_state.update(self._updates)
+        integration_context[self._context_key] = feeds_state
+        set_integration_context(integration_context)
+        self._previous = feeds_state
+        self._updates = {}
+
+
+def is_skip_unchanged_feed_enabled(params):
+    """
+    Checks whether a feed integration should skip the feeds whose content has not changed since the previous fetch,
+    according to its ``skip_unchanged_feed`` parameter. The indicators of a skipped feed are not submitted, so their
+    last seen time is not refreshed, and skipping is applied only when the indicators never expire.
+
+    :type params: ``dict``
+    :param params: The integration parameters.
+
+    :return: True if unchanged feeds should be skipped.
+    :rtype: ``bool``
+    """
+    if not argToBoolean(params.get('skip_unchanged_feed', False)):
+        return False
+    if params.get('feedExpirationPolicy') != 'never':
+        demisto.debug('Unchanged feeds are not skipped, as the indicators expiration method is not "never".')
+        return False
+    return True
+
+
+def is_delta_mode_enabled(params):
+    """
+    Checks whether a feed integration should submit only the indicators which were added or changed since the
+    previous fetch, according to its ``delta_mode`` parameter. The unchanged indicators are not submitted, so their
+    last seen time is not refreshed, and the delta mode is applied only when the indicators never expire.
+
+    :type params: ``dict``
+    :param params: The integration parameters.
+
+    :return: True if the delta mode is enabled.
+    :rtype: ``bool``
+    """
+    if not argToBoolean(params.get('delta_mode', False)):
+        return False
+    if params.get('feedExpirationPolicy') != 'never':
+        demisto.debug('The delta mode is not applied, as the indicators expiration method is not "never".')
+        return False
+    return True
+
+
+class FeedIndicatorsDelta(object):
+    """
+    Keeps a compact fingerprint of the indicators created by a feed in its previous fetch, so only the indicators
+    which were added or changed since are submitted to the server.
+
+    A fingerprint is a hash of the indicator value and a digest of the whole indicator object (type, fields,
+    raw JSON and relationships), packed in 12 bytes and stored in the integration context.
+
+    :type context_key: ``str``
+    :param context_key: The integration context key to store the fingerprints in.
+
+    :return: No data returned
+    :rtype: ``None``
+    """
+    _RECORD = struct.Struct('>QI')
+
+    def __init__(self, context_key='indicators_fingerprints'):
+        self._context_key = context_key
+        self._previous = self._unpack(get_integration_context().get(context_key))
+        self._current = {}  # type: Dict[int, int]
+        self.added = 0
+        self.changed = 0
+
+    @classmethod
+    def _pack(cls, fingerprints):
+        data = b''.join(cls._RECORD.pack(value_hash, digest) for value_hash, digest in fingerprints.items())
+        return base64.b64encode(data).decode('ascii')
+
+    @classmethod
+    def _unpack(cls, packed_fingerprints):
+        fingerprints = {}
+        if packed_fingerprints:
+            data = base64.b64decode(packed_fingerprints)
+            for offset in range(0, len(data), cls._RECORD.size):
+                value_hash, digest = cls._RECORD.unpack_from(data, offset)
+                fingerprints[value_hash] = digest
+        return fingerprints
+
+    @staticmethod
+    def _fingerprint(indicator):
+        value = indicator.get('value')
+        if not isinstance(value, bytes):
+            value = u'{}'.format(value).encode('utf-8')
+        value_hash = hashlib.sha1(value).digest()
+        indicator_digest = hashlib.sha1(json.dumps(indicator, sort_keys=True, default=str).encode('utf-8')).digest()
+        return struct.unpack('>Q', value_hash[:8])[0], struct.unpack('>I', indicator_digest[:4])[0]
+
+    def is_changed(self, indicator):
+        """
+        Checks whether an indicator was added or changed since the previous fetch, and records its fingerprint.
+
+        :type indicator: ``dict``
+        :param indicator: The indicator object, as submitted to ``demisto.createIndicators``.
+
+        :return: True if the indicator is new or changed.
+        :rtype: ``bool``
+        """
+        value_hash, digest = self._fingerprint(indicator)
+        self._current[value_hash] = digest
+        previous_digest = self._previous.get(value_hash)
+        if previous_digest is None:
+            self.added += 1
+            return True
+        if previous_digest != digest:
+            self.changed += 1
+            return True
+        return False
+
+    def filter(self, indicators):
+        """
+        Filters a batch of indicators to the ones which were added or changed since the previous fetch.
+
+        :type indicators: ``list``
+        :param indicators: The indicator objects.
+
+        :return: The added and changed indicators.
+        :rtype: ``list``
+        """
+        return [indicator for indicator in indicators if self.is_changed(indicator)]
+
+    @property
+    def removed(self):
+        """
+        The number of indicators from the previous fetch which were not seen in the current fetch.
+
+        :rtype: ``int``
+        """
+        return sum(1 for value_hash in self._previous if value_hash not in self._current)
+
+    def save(self, keep_unseen=False):
+        """
+        Saves the fingerprints of the current fetch to the integration context.
+        Should be called only after the indicators were created.
+
+        :type keep_unseen: ``bool``
+        :param keep_unseen: Whether to keep the fingerprints of indicators which were not seen in the current fetch,
+            for example when some of the feed sources were not fetched.
+
+        :return: No data returned
+        :rtype: ``None``
+        """
+        fingerprints = self._current
+        if keep_unseen:
+            fingerprints = dict(self._previous)
+            fingerprints.update(self._current)
+        integration_context = get_integration_context()
+        integration_context[self._context_key] = self._pack(fingerprints)
+        set_integration_context(integration_context)
+
+
+class CidrIndex(object):
+    """
+    An index of CIDR ranges, for checking whether IP addresses are in any of the ranges in logarithmic time
+    instead of testing each range. The ranges are kept as sorted and merged integer intervals, per IP version.
+    Use ``get_cidr_index`` to reuse the index of a ranges list which was already indexed.
+
+    :type cidr_ranges: ``list``
+    :param cidr_ranges: The CIDR ranges (e.g. ``10.0.0.0/8``, ``10.0.0.0/255.0.0.0`` or ``2001:db8::/32``)
+        to index. An IP address without a prefix length is indexed as a single address.
+
+    :return: No data returned
+    :rtype: ``None``
+    """
+    _BITS = {4: 32, 6: 128}
+
+    def __init__(self, cidr_ranges):
+        intervals = {4: [], 6: []}  # type: Dict[int, list]
+        for cidr in cidr_ranges:
+            version, first, last = self._parse_cidr(cidr)
+            intervals[version].append((first, last))
+        self._starts = {}  # type: Dict[int, List[int]]
+        self._ends = {}  # type: Dict[int, List[int]]
+        for version, version_intervals in intervals.items():
+            starts = []  # type: List[int]
+            ends = []  # type: List[int]
+            for first, last in sorted(version_intervals):
+                if ends and first <= ends[-1] + 1:
+                    ends[-1] = max(ends[-1], last)
+                else:
+                    starts.append(first)
+                    ends.append(last)
+            self._starts[version] = starts
+            self._ends[version] = ends
+
+    @staticmethod
+    def _parse_ip(ip_address):
+        ip_address = ip_address.strip()
+        try:
+            if ':' in ip_address:
+                high, low = struct.unpack('!QQ', socket.inet_pton(socket.AF_INET6, ip_address))
+                return 6, (high << 64) | low
+            return 4, struct.unpack('!I', socket.inet_pton(socket.AF_INET, ip_address))[0]
+        except (socket.error, ValueError):
+            raise ValueError('Invalid IP address: {}'.format(ip_address))
+
+    @classmethod
+    def _parse_cidr(cls, cidr):
+        address, _, prefix = cidr.strip().partition('/')
+        version, value = cls._parse_ip(address)
+        bits = cls._BITS[version]
+        if not prefix:
+            prefix_length = bits
+        elif version == 4 and '.' in prefix:
+            netmask = cls._parse_ip(prefix)[1]
+            prefix_length = bin(netmask).count('1')
+            if netmask != (((1 << prefix_length) - 1) << (bits - prefix_length)):
+                raise ValueError('Invalid netmask in CIDR range: {}'.format(cidr))
+        elif prefix.isdigit() and int(prefix) <= bits:
+            prefix_length = int(prefix)
+        else:
+            raise ValueError('Invalid prefix length in CIDR range: {}'.format(cidr))
+        host_mask = (1 << (bits - prefix_length)) - 1
+        first = value & ~host_mask
+        return version, first, first | host_mask
+
+    def contains(self, ip_address):
+        """
+        Checks whether an IP address is in any of the indexed ranges.
+
+        :type ip_address: ``str``
+        :param ip_address: The IPv4 or IPv6 address.
+
+        :return: True if the address is in any of the ranges.
+        :rtype: ``bool``
+        """
+        version, value = self._parse_ip(ip_address)
+        index = bisect.bisect_right(self._starts[version], value) - 1
+        return index >= 0 and value <= self._ends[version][index]
+
+    __contains__ = contains
+
+    def filter(self, ip_addresses, in_ranges=True):
+        """
+        Filters a batch of IP addresses by whether they are in any of the indexed ranges.
+
+        :type ip_addresses: ``list``
+        :param ip_addresses: The IPv4 or IPv6 addresses.
+
+        :type in_ranges: ``bool``
+        :param in_ranges: Whether to return the addresses which are in the ranges, or the ones which are not.
+
+        :return: The matching addresses, in their original order.
+        :rtype: ``list``
+        """
+        return [ip_address for ip_address in ip_addresses if self.contains(ip_address) == in_ranges]
+
+
+CIDR_INDEX_CACHE_SIZE = 16
+_cidr_indexes = OrderedDict()  # type: OrderedDict
+
+
+def get_cidr_index(cidr_ranges):
+    """
+    Gets the ``CidrIndex`` of a CIDR ranges list. The indexes of recently used lists are cached, so scripts which
+    check many values against the same list, in the same execution or in later executions in the same container,
+    build its index only once.
+
+    :type cidr_ranges: ``list``
+    :param cidr_ranges: The CIDR ranges.
+
+    :return: The index of the ranges.
+    :rtype: ``CidrIndex``
+    """
+    key = hashlib.sha256(u'\n'.join(cidr_ranges).encode('utf-8')).hexdigest()
+    cidr_index = _cidr_indexes.pop(key, None)
+    if cidr_index is None:
+        cidr_index = CidrIndex(cidr_ranges)
+        while len(_cidr_indexes) >= CIDR_INDEX_CACHE_SIZE:
+            _cidr_indexes.popitem(last=False)
+    _cidr_indexes[key] = cidr_index
+    return cidr_index
+
+
 def support_multithreading():
     """Adds lock on the calls to the Cortex XSOAR server from the Demisto object to support integration which use multithreading.
 
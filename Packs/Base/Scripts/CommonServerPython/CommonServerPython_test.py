@@ -73,6 +73,50 @@ def test_xml():
     assert xmlActual == xml, "expected:\n{}\nto equal:\n{}".format(xml, xmlActual)
 
 
+XML_CONVERSION_SAMPLE = b"""<?xml version="1.0"?>
+<response xmlns:x="http://example.com/ns" status="success" code="19">
+  <result total="3">
+    <entry name="a"><x:member>1</x:member><member>2</member></entry>
+    <entry name="b">text<empty/>tail of empty<member/><member/><member>3</member></entry>
+    <entry>  only text  </entry>
+    <entry><entry name="nested"/></entry>
+  </result>
+</response>"""
+
+
+@pytest.mark.parametrize('strip_ns, strip', [(1, 1), (0, 1), (1, 0)])
+def test_xml2dict(strip_ns, strip):
+    """
+    Given:
+        - An XML document with namespaces, attributes, repeated and empty elements and mixed texts
+    When:
+        - Converting it with xml2dict
+    Then:
+        - The result equals the result of converting it with xml2json and loading the JSON
+    """
+    from CommonServerPython import xml2dict
+    expected = json.loads(xml2json(XML_CONVERSION_SAMPLE, strip_ns=strip_ns, strip=strip))
+    assert xml2dict(XML_CONVERSION_SAMPLE, strip_ns=strip_ns, strip=strip) == expected
+
+
+def test_iter_xml2dict():
+    """
+    Given:
+        - An XML document with repeated, nested entry elements
+    When:
+        - Iterating its entry elements with iter_xml2dict
+    Then:
+        - Each top-level entry is yielded once, converted as by xml2dict
+    """
+    from io import BytesIO
+    from CommonServerPython import xml2dict, iter_xml2dict
+    expected_entries = xml2dict(XML_CONVERSION_SAMPLE)['response']['result']['entry']
+
+    entries = list(iter_xml2dict(BytesIO(XML_CONVERSION_SAMPLE), 'entry'))
+
+    assert entries == [{'entry': entry} for entry in expected_entries]
+
+
 def toEntry(table):
     return {
 
@@ -2268,6 +2312,83 @@ class TestBaseClient:
             assert e.res.status_code == 400
             assert resp_json.get('error') == 'additional text'
 
+    def test_http_request_many(self, requests_mock):
+        """
+            Given
+            - A base client and a list of request specs
+
+            When
+            - Sending the requests concurrently with _http_request_many
+
+            Then
+            - Ensure the responses are returned in the order of the request specs
+        """
+        for i in range(20):
+            requests_mock.get('http://example.com/api/v2/event/{}'.format(i), json={'id': i})
+        res = self.client._http_request_many(
+            [{'method': 'GET', 'url_suffix': 'event/{}'.format(i)} for i in range(20)], max_workers=5
+        )
+        assert res == [{'id': i} for i in range(20)]
+
+    def test_http_request_many_errors(self, requests_mock):
+        """
+            Given
+            - A base client and a list of request specs, one of them fails
+
+            When
+            - Sending the requests concurrently with and without raise_on_error
+
+            Then
+            - Ensure a DemistoException is raised, or returned in place of the failed response
+        """
+        from CommonServerPython import DemistoException
+        requests_mock.get('http://example.com/api/v2/event/ok', json=self.text)
+        requests_mock.get('http://example.com/api/v2/event/bad', status_code=400, text='bad request')
+        specs = [{'method': 'GET', 'url_suffix': 'event/ok'}, {'method': 'GET', 'url_suffix': 'event/bad'}]
+        with raises(DemistoException, match='400'):
+            self.client._http_request_many(specs)
+        res = self.client._http_request_many(specs, raise_on_error=False)
+        assert res[0] == self.text
+        assert isinstance(res[1], DemistoException)
+
+    def test_http_request_many_resizes_pool(self):
+        """
+            Given
+            - A base client with the default connections pool size
+
+            When
+            - Sending a batch with more workers than the pool size
+
+            Then
+            - Ensure the mounted adapter is rebuilt with a pool matching the number of workers
+        """
+        from CommonServerPython import BaseClient
+        client = BaseClient('http://example.com/api/v2/', pool_maxsize=2)
+        assert client._session.get_adapter('https://example.com')._pool_maxsize == 2
+        client._http_request_many([{'method': 'GET', 'full_url': 'http://127.0.0.1:1'}] * 5,
+                                  max_workers=5, raise_on_error=False)
+        assert client._session.get_adapter('https://example.com')._pool_maxsize == 5
+
+    def test_implement_retry_reuses_adapter(self):
+        """
+            Given
+            - A base client
+
+            When
+            - Implementing the same retry configuration several times
+
+            Then
+            - Ensure a single adapter is built and mounted for that configuration
+        """
+        from CommonServerPython import BaseClient
+        client = BaseClient('http://example.com/api/v2/')
+        client._implement_retry(retries=3, status_list_to_retry=[429])
+        adapter = client._session.get_adapter('https://example.com')
+        client._implement_retry(retries=3, status_list_to_retry=[429])
+        assert client._session.get_adapter('https://example.com') is adapter
+        assert adapter.max_retries.total == 3
+        assert len(client._adapters) == 2
+
     def test_is_valid_ok_codes_empty(self):
         from requests import Response
         from CommonServerPython import BaseClient
@@ -2852,9 +2973,10 @@ def test_auto_detect_indicator_type_tldextract(mocker):
     """
     if sys.version_info.major == 3 and sys.version_info.minor >= 8:
         import tldextract as tlde
-        tlde.__version__ = '2.2.7'
+        mocker.patch.object(tlde, '__version__', '2.2.7')
 
         mocker.patch.object(tlde, 'TLDExtract')
+        mocker.patch.object(CommonServerPython, '_indicator_type_classifier', None)
 
         auto_detect_indicator_type('8')
 
@@ -2862,6 +2984,65 @@ def test_auto_detect_indicator_type_tldextract(mocker):
         assert 'cache_file' in res[1].keys()
 
 
+def _legacy_auto_detect_indicator_type(indicator_value):
+    """The auto_detect_indicator_type implementation before IndicatorTypeClassifier, without the domain detection"""
+    from CommonServerPython import ipv4cidrRegex, ipv6cidrRegex, ipv4Regex, ipv6Regex, sha256Regex, urlRegex, \
+        md5Regex, sha1Regex, emailRegex, cveRegex, sha512Regex
+    for regex, indicator_type in ((ipv4cidrRegex, 'CIDR'), (ipv6cidrRegex, 'IPv6CIDR'), (ipv4Regex, 'IP'),
+                                  (ipv6Regex, 'IPv6'), (sha256Regex, 'File'), (urlRegex, 'URL'), (md5Regex, 'File'),
+                                  (sha1Regex, 'File'), (emailRegex, 'Email'), (cveRegex, 'CVE'),
+                                  (sha512Regex, 'File')):
+        if re.match(regex, indicator_value):
+            return indicator_type
+    return None
+
+
+CLASSIFIER_VALUES = [value for value, _ in INDICATOR_VALUE_AND_TYPE] + [
+    '', '1.1.1.1', '1.1.1.1/33', '1[.]1[.]1[.]1/24', '256.1.1.1', '1.1.1.1 some text', '::1', '::ffff:1.2.3.4',
+    '2001:db8::/32', 'fe80::1%eth0', 'hxxps://evil[.]com/path', 'www.example.com', 'ftp.example.com/file',
+    'HTTP://UPPER.COM', 'cve-2021-44228', 'Cve-2021-1', 'c8092abd8d581750c0530fa1fc8d8318g', 'a' * 40,
+    'A' * 64 + ' trailing', 'f' * 128, 'g' * 128, 'user@localhost', '@@@', 'AS1234', 'example.com:8080/path',
+    '1:2', u'\u0661.1.1.1', 'c:\\windows\\system32', '0x41414141', '*.example.com'
+]
+
+
+@pytest.mark.parametrize('indicator_value', CLASSIFIER_VALUES)
+def test_indicator_type_classifier_matches_regexes(indicator_value):
+    """
+        Given
+            An indicator value
+
+        When
+            Classifying it with IndicatorTypeClassifier without the domain detection
+
+        Then
+            Ensure the result is the same as running the indicator regexes one by one
+    """
+    from CommonServerPython import IndicatorTypeClassifier
+    classifier = IndicatorTypeClassifier()
+    assert classifier._match_regexes(indicator_value) == _legacy_auto_detect_indicator_type(indicator_value)
+
+
+def test_indicator_type_classifier_batch(mocker):
+    """
+        Given
+            A batch of indicator values
+
+        When
+            Classifying them with IndicatorTypeClassifier.classify
+
+        Then
+            Ensure the types are returned in order, and a single TLD extractor is created
+    """
+    import tldextract
+    from CommonServerPython import IndicatorTypeClassifier
+    mocker.spy(tldextract, 'TLDExtract')
+    classifier = IndicatorTypeClassifier()
+    assert classifier.classify(['1.1.1.1', 'example.com', '*.example.com', 'a', 'example.org']) == \
+        ['IP', 'Domain', 'DomainGlob', None, 'Domain']
+    assert tldextract.TLDExtract.call_count == 1
+
+
 def test_handle_proxy(mocker):
     os.environ['REQUESTS_CA_BUNDLE'] = '/test1.pem'
     mocker.patch.object(demisto, 'params', return_value={'insecure': True})
@@ -3333,6 +3514,27 @@ def test_return_results_mixed_results(mocker):
     assert demisto_results_mock.call_args_list[1][0][0] == mock_demisto_results_entry
 
 
+def test_return_results_batch_mode(mocker):
+    """
+    Given:
+      - List containing a CommandResult object and two dictionaries, and a demisto object which batches messages
+    When:
+      - Calling return_results()
+    Then:
+      - Assert that demisto.results() is called once with all the entries in their original order.
+    """
+    from CommonServerPython import CommandResults, return_results
+    mocker.patch.object(demisto, 'isBatchMode', return_value=True, create=True)
+    demisto_results_mock = mocker.patch.object(demisto, 'results')
+    mock_command_results_object = CommandResults(outputs_prefix='Mock', outputs={'MockContext': 0})
+    mock_demisto_results_entry = [{'MockContext': 1}, {'MockContext': 2}]
+    return_results(mock_demisto_results_entry[:1] + [mock_command_results_object] + mock_demisto_results_entry[1:])
+
+    assert demisto_results_mock.call_count == 1
+    assert demisto_results_mock.call_args[0][0] == [{'MockContext': 1}, mock_command_results_object.to_context(),
+                                                     {'MockContext': 2}]
+
+
 class TestExecuteCommand:
     @staticmethod
     def test_sanity(mocker):
@@ -4668,6 +4870,111 @@ class TestIndicatorsSearcher:
         assert search_indicators.page == 15
 
 
+    @pytest.mark.parametrize('can_use_search_after', [True, False])
+    def test_iterator__prefetch(self, mocker, can_use_search_after):
+        """
+        Given:
+          - Searching indicators from page 10
+          - Total available indicators == 7
+        When:
+          - Searching indicators using iterator with prefetch (whether search_after is supported or not)
+        Then:
+          - Get the 7 indicators in order
+          - Advance page to 17
+        """
+        from CommonServerPython import IndicatorsSearcher
+        mocker.patch.object(demisto, 'searchIndicators', side_effect=self.mock_search_after_output)
+
+        search_indicators = IndicatorsSearcher(page=10, prefetch=2)
+        search_indicators._can_use_search_after = can_use_search_after
+        results = [res['iocs'][0]['value'] for res in search_indicators]
+        assert len(results) == 7
+        if can_use_search_after:
+            assert results == ['mock{}'.format(i) for i in range(7)]
+        assert search_indicators.page == 17
+
+    def test_iterator__prefetch_limit(self, mocker):
+        """
+        Given:
+          - Searching indicators from page 10
+          - Total available indicators == 7
+          - Limit is set to 5
+        When:
+          - Searching indicators using iterator with prefetch
+        Then:
+          - Get 5 indicators, and no more pages are fetched
+        """
+        from CommonServerPython import IndicatorsSearcher
+        search_mock = mocker.patch.object(demisto, 'searchIndicators', side_effect=self.mock_search_after_output)
+
+        search_indicators = IndicatorsSearcher(page=10, limit=5, prefetch=3)
+        search_indicators._can_use_search_after = True
+        results = [res for res in search_indicators]
+        assert len(results) == 5
+        assert search_mock.call_count == 5
+        assert search_indicators.page == 15
+
+    def test_iterator__prefetch_close(self, mocker):
+        """
+        Given:
+          - Searching indicators using iterator with prefetch of 1 page
+        When:
+          - Stopping the iteration after the first page and closing the searcher
+        Then:
+          - The background fetching stops while the queue is full
+        """
+        from CommonServerPython import IndicatorsSearcher
+        search_mock = mocker.patch.object(demisto, 'searchIndicators', side_effect=self.mock_search_after_output)
+
+        search_indicators = IndicatorsSearcher(page=10, prefetch=1)
+        search_indicators._can_use_search_after = True
+        next(iter(search_indicators))
+        search_indicators.close()
+        # the consumed page, the one in the queue and the one waiting to be put
+        assert search_mock.call_count <= 3
+        assert search_indicators._prefetch_thread is None
+
+    def test_iterator__prefetch_resumed_after_timeout(self, mocker):
+        """
+        Given:
+          - Searching indicators from page 10 using iterator with prefetch of 1 page
+          - Total available indicators == 7
+        When:
+          - The caller stops consuming until the prefetch thread gives up on the full queue, then resumes
+        Then:
+          - Get the 7 indicators in order, the remaining ones are fetched synchronously
+        """
+        from CommonServerPython import IndicatorsSearcher
+        mocker.patch.object(demisto, 'searchIndicators', side_effect=self.mock_search_after_output)
+        mocker.patch.object(IndicatorsSearcher, 'PREFETCH_PUT_TIMEOUT', 0)
+
+        search_indicators = IndicatorsSearcher(page=10, prefetch=1)
+        search_indicators._can_use_search_after = True
+        iterator = iter(search_indicators)
+        search_indicators._prefetch_thread.join(10)
+        assert not search_indicators._prefetch_thread.is_alive()
+
+        results = [res['iocs'][0]['value'] for res in iterator]
+        assert results == ['mock{}'.format(i) for i in range(7)]
+        assert search_indicators._prefetch_thread is None
+        assert search_indicators.page == 17
+
+    def test_iterator__prefetch_error(self, mocker):
+        """
+        Given:
+          - Searching indicators using iterator with prefetch
+        When:
+          - The search fails
+        Then:
+          - The error is raised to the caller
+        """
+        from CommonServerPython import IndicatorsSearcher
+        mocker.patch.object(demisto, 'searchIndicators', side_effect=ValueError('search failed'))
+
+        search_indicators = IndicatorsSearcher(prefetch=2)
+        with pytest.raises(ValueError, match='search failed'):
+            list(search_indicators)
+
 class TestAutoFocusKeyRetriever:
     def test_instantiate_class_with_param_key(self, mocker, clear_version_cache):
         """
@@ -5080,6 +5387,232 @@ class TestSetAndGetLastRun:
         assert set_last_run.called is False
 
 
+class TestFeedsState:
+    URL = 'https://example.com/feed.txt'
+
+    @staticmethod
+    def build_response(content=b'', status_code=200, headers=None):
+        response = requests.Response()
+        response.status_code = status_code
+        response._content = content
+        response.headers.update(headers or {})
+        return response
+
+    def test_unchanged_between_fetches(self, mocker):
+        """
+        Given
+        - A feed fetched for the first time, with an ETag.
+
+        When
+        - Fetching it again with the same content, then with a 304 response, then with a new content.
+
+        Then
+        - Ensure the conditional headers of the saved state are built.
+        - Ensure the same content and the 304 response are unchanged, and the new content is staged.
+        """
+        from CommonServerPython import FeedsState
+        integration_context = {'other_key': 'other_value'}
+        mocker.patch.object(demisto, 'getIntegrationContext', side_effect=lambda: integration_context)
+        mocker.patch.object(demisto, 'setIntegrationContext', side_effect=integration_context.update)
+
+        feeds_state = FeedsState()
+        assert feeds_state.get_conditional_headers(self.URL) == {}
+        assert not feeds_state.is_unchanged(self.URL, self.build_response(b'1.1.1.1', headers={'ETag': '"v1"'}))
+        feeds_state.save()
+
+        feeds_state = FeedsState()
+        assert feeds_state.get_conditional_headers(self.URL) == {'If-None-Match': '"v1"'}
+        assert feeds_state.is_unchanged(self.URL, self.build_response(b'1.1.1.1', headers={'ETag': '"v1"'}))
+        assert feeds_state.is_unchanged(self.URL, self.build_response(status_code=304))
+        assert feeds_state.unchanged_urls == [self.URL, self.URL]
+        assert not feeds_state.is_unchanged(self.URL, self.build_response(b'2.2.2.2', headers={'ETag': '"v2"'}))
+        assert feeds_state.unchanged_urls == [self.URL, self.URL]
+        feeds_state.save()
+
+        assert integration_context['other_key'] == 'other_value'
+        assert integration_context['feeds_state'][self.URL]['etag'] == '"v2"'
+
+    @pytest.mark.parametrize('params, expected', [
+        ({}, False),
+        ({'skip_unchanged_feed': True, 'feedExpirationPolicy': 'never'}, True),
+        ({'skip_unchanged_feed': True, 'feedExpirationPolicy': 'indicatorType'}, False),
+        ({'skip_unchanged_feed': True, 'feedExpirationPolicy': 'interval'}, False),
+        ({'skip_unchanged_feed': True, 'feedExpirationPolicy': 'suddenDeath'}, False),
+    ])
+    def test_is_skip_unchanged_feed_enabled(self, params, expected):
+        """
+        Given
+        - Feed parameters with and without skip_unchanged_feed, and with different expiration policies.
+
+        When
+        - Checking whether unchanged feeds should be skipped.
+
+        Then
+        - Ensure skipping is enabled only when configured and the indicators never expire.
+        """
+        from CommonServerPython import is_skip_unchanged_feed_enabled
+        assert is_skip_unchanged_feed_enabled(params) is expected
+
+
+class TestFeedIndicatorsDelta:
+    INDICATORS = [
+        {'value': '1.1.1.1', 'type': 'IP', 'fields': {'tags': ['a']}},
+        {'value': '2.2.2.2', 'type': 'IP', 'fields': {'tags': ['a']}},
+        {'value': '3.3.3.3', 'type': 'IP', 'fields': {'tags': ['a']}},
+    ]
+
+    def test_delta_between_fetches(self, mocker):
+        """
+        Given
+        - The fingerprints of a previous fetch with three indicators.
+
+        When
+        - Fetching again, where one indicator changed, one was removed and one was added.
+
+        Then
+        - Ensure only the changed and added indicators are returned, and the removed one is counted.
+        """
+        from CommonServerPython import FeedIndicatorsDelta
+        integration_context = {'other_key': 'other_value'}
+        mocker.patch.object(demisto, 'getIntegrationContext', side_effect=lambda: integration_context)
+        mocker.patch.object(demisto, 'setIntegrationContext', side_effect=integration_context.update)
+
+        delta = FeedIndicatorsDelta()
+        assert delta.filter(self.INDICATORS) == self.INDICATORS
+        assert delta.added == 3
+        delta.save()
+
+        changed_indicator = {'value': '2.2.2.2', 'type': 'IP', 'fields': {'tags': ['b']}}
+        added_indicator = {'value': '4.4.4.4', 'type': 'IP', 'fields': {'tags': ['a']}}
+        delta = FeedIndicatorsDelta()
+        assert delta.filter([self.INDICATORS[0], changed_indicator, added_indicator]) == [changed_indicator,
+                                                                                          added_indicator]
+        assert (delta.added, delta.changed, delta.removed) == (1, 1, 1)
+        delta.save()
+        assert integration_context['other_key'] == 'other_value'
+        assert len(FeedIndicatorsDelta._unpack(integration_context['indicators_fingerprints'])) == 3
+
+    def test_save_keep_unseen(self, mocker):
+        """
+        Given
+        - The fingerprints of a previous fetch with three indicators.
+
+        When
+        - Fetching again without seeing any of them, and saving with keep_unseen.
+
+        Then
+        - Ensure the previous fingerprints are kept, so the indicators are not submitted again.
+        """
+        from CommonServerPython import FeedIndicatorsDelta
+        integration_context = {}  # type: dict
+        mocker.patch.object(demisto, 'getIntegrationContext', side_effect=lambda: integration_context)
+        mocker.patch.object(demisto, 'setIntegrationContext', side_effect=integration_context.update)
+
+        delta = FeedIndicatorsDelta()
+        delta.filter(self.INDICATORS)
+        delta.save()
+
+        FeedIndicatorsDelta().save(keep_unseen=True)
+        assert FeedIndicatorsDelta().filter(self.INDICATORS) == []
+
+    @pytest.mark.parametrize('params, expected', [
+        ({}, False),
+        ({'delta_mode': True, 'feedExpirationPolicy': 'never'}, True),
+        ({'delta_mode': True, 'feedExpirationPolicy': 'indicatorType'}, False),
+        ({'delta_mode': True, 'feedExpirationPolicy': 'interval'}, False),
+        ({'delta_mode': True, 'feedExpirationPolicy': 'suddenDeath'}, False),
+    ])
+    def test_is_delta_mode_enabled(self, params, expected):
+        """
+        Given
+        - Feed parameters with and without delta_mode, and with different expiration policies.
+
+        When
+        - Checking whether only the added and changed indicators should be submitted.
+
+        Then
+        - Ensure the delta mode is enabled only when configured and the indicators never expire.
+        """
+        from CommonServerPython import is_delta_mode_enabled
+        assert is_delta_mode_enabled(params) is expected
+
+
+class TestCidrIndex:
+    RANGES = ['10.0.0.0/8', '10.1.0.0/16', '192.168.1.7/24', '172.16.0.0/255.240.0.0', '8.8.8.8', '2001:db8::/32']
+
+    @pytest.mark.parametrize('ip_address, expected', [
+        ('10.200.1.1', True),
+        ('11.0.0.0', False),
+        ('192.168.1.255', True),
+        ('192.168.2.0', False),
+        ('172.31.255.255', True),
+        ('172.32.0.0', False),
+        ('8.8.8.8', True),
+        ('8.8.8.9', False),
+        ('0.0.0.0', False),
+        ('2001:db8:1::1', True),
+        ('2001:db9::1', False),
+    ])
+    def test_contains(self, ip_address, expected):
+        """
+        Given
+        - An index of overlapping ranges, a range with host bits, a netmask range, a single address and an IPv6 range.
+
+        When
+        - Checking whether an IP address is in the ranges.
+
+        Then
+        - Ensure the result is the same as testing each of the ranges.
+        """
+        from CommonServerPython import CidrIndex
+        assert (ip_address in CidrIndex(self.RANGES)) is expected
+
+    def test_filter(self):
+        """
+        Given
+        - An index of ranges.
+
+        When
+        - Filtering a batch of IP addresses.
+
+        Then
+        - Ensure each address is returned once, in its original order.
+        """
+        from CommonServerPython import CidrIndex
+        cidr_index = CidrIndex(self.RANGES)
+        ip_addresses = ['4.4.4.4', '10.1.0.1', '8.8.8.8', '2001:db8::1']
+        assert cidr_index.filter(ip_addresses) == ['10.1.0.1', '8.8.8.8', '2001:db8::1']
+        assert cidr_index.filter(ip_addresses, in_ranges=False) == ['4.4.4.4']
+
+    @pytest.mark.parametrize('cidr', ['10.0.0.0/33', '10.0.0/8', 'x', '10.0.0.0/255.0.255.0', '::/129'])
+    def test_invalid_range(self, cidr):
+        from CommonServerPython import CidrIndex
+        with pytest.raises(ValueError):
+            CidrIndex([cidr])
+
+    def test_get_cidr_index_cache(self, mocker):
+        """
+        Given
+        - A ranges list which was already indexed.
+
+        When
+        - Getting the index of the list again.
+
+        Then
+        - Ensure the cached index is returned, and the least recently used indexes are evicted.
+        """
+        import CommonServerPython
+        mocker.patch.object(CommonServerPython, '_cidr_indexes', CommonServerPython.OrderedDict())
+        mocker.patch.object(CommonServerPython, 'CIDR_INDEX_CACHE_SIZE', 2)
+        cidr_index = CommonServerPython.get_cidr_index(['10.0.0.0/8'])
+        assert CommonServerPython.get_cidr_index(['10.0.0.0/8']) is cidr_index
+        CommonServerPython.get_cidr_index(['11.0.0.0/8'])
+        CommonServerPython.get_cidr_index(['10.0.0.0/8'])
+        CommonServerPython.get_cidr_index(['12.0.0.0/8'])
+        assert CommonServerPython.get_cidr_index(['10.0.0.0/8']) is cidr_index
+        assert len(CommonServerPython._cidr_indexes) == 2
+
+
 class TestIsDemistoServerGE:
     @classmethod
     @pytest.fixture(scope='function', autouse=True)
@@ -5173,3 +5706,31 @@ def test_smart_get_dict():
     assert s.get('t1', 2) == 2
     assert s.get('t2') == 1
     assert s.get('t3') is None
+
+
+def test_reset_module_state(mocker):
+    """
+    Given:
+        - A logger with messages, a cached server version and params of a previous execution.
+    When:
+        - Resetting the module state before a new execution in the same namespace.
+    Then:
+        - Ensure the logger and the version cache are recreated and the new params are wrapped.
+    """
+    import CommonServerPython
+    prev_logger = IntegrationLogger()
+    prev_logger('message of the previous execution')
+    prev_version = CommonServerPython.GetDemistoVersion()
+    prev_version._version = {'version': '6.0.0'}
+    mocker.patch.object(CommonServerPython, 'LOG', prev_logger)
+    mocker.patch.object(CommonServerPython, 'get_demisto_version', prev_version)
+    mocker.patch.object(CommonServerPython, '_requests_logger', None)
+    mocker.patch.dict(demisto.callingContext, {'params': {'t1': None}})
+
+    CommonServerPython.reset_module_state()
+
+    assert CommonServerPython.LOG is not prev_logger
+    assert CommonServerPython.LOG.messages == []
+    assert CommonServerPython.get_demisto_version._version is None
+    assert demisto.params().get('t1', 2) == 2
+    assert CommonServerPython._requests_logger is None
@@ -210,6 +210,7 @@ class Tokenizer:
 DBOT_TEXT_FIELD = 'dbot_text'
 DBOT_PROCESSED_TEXT_FIELD = 'dbot_processed_text'
 CONTEXT_KEY = 'DBotPreProcessTextData'
+DEDUP_MAX_CHUNK_CELLS = 10 ** 7
 HTML_PATTERNS = [
     re.compile(r"(?is)<(script|style).*?>.*?(</\1>)"),
     re.compile(r"(?s)<!--(.*?)-->[\n]?"),
@@ -334,20 +335,31 @@ def remove_short_text(data, text_field, target_text_field, remove_short_threshol
     return data, description
 
 
-def get_tf_idf_similarity_arr(documents):
-    tfidf = TfidfVectorizer(stop_words="english", min_df=1).fit_transform(documents)
-    pairwise_similarity = tfidf * tfidf.T
-    return pairwise_similarity.toarray()
-
-
-def find_duplicate_indices(texts, dedup_threshold):
-    similarity_arr = get_tf_idf_similarity_arr(texts)
-    indices_to_remove = []
-    for i in range(similarity_arr.shape[0]):
-        for j in range(similarity_arr.shape[1]):
-            if j > i and similarity_arr[i][j] > dedup_threshold:
-                indices_to_remove.append(j)
-    return set(indices_to_remove)
+def get_tf_idf_matrix(documents):
+    return TfidfVectorizer(stop_words="english", min_df=1).fit_transform(documents)
+
+
+def find_duplicate_indices(texts, dedup_threshold, max_chunk_cells=DEDUP_MAX_CHUNK_CELLS):
+    """
+    Finds the indices of texts whose tf-idf cosine similarity to a preceding text is above the threshold.
+    The similarities are computed as sparse products of a chunk of rows with the rows that follow it,
+    so neither the dense similarity matrix nor more than about max_chunk_cells similarities are held in memory.
+    """
+    tfidf = get_tf_idf_matrix(texts).tocsr()
+    n_texts = tfidf.shape[0]
+    indices_to_remove = set()
+    start = 0
+    while start < n_texts:
+        end = min(n_texts, start + max(1, max_chunk_cells // (n_texts - start)))
+        # tf-idf rows are l2 normalized, so their dot product is the cosine similarity
+        similarity = (tfidf[start:end] * tfidf[start:].T).tocoo()
+        above_threshold = similarity.data > dedup_threshold
+        rows = similarity.row[above_threshold]
+        cols = similarity.col[above_threshold]
+        # both row and col are relative to start, keep the pairs i < j
+        indices_to_remove.update((cols[cols > rows] + start).tolist())
+        start = end
+    return indices_to_remove
 
 
 def remove_duplicate_by_indices(data, duplicate_indices):
@@ -1,4 +1,5 @@
 import unittest
+import pytest
 
 from CommonServerPython import *
 from DBotPreprocessTextData import clean_html_from_text, remove_line_breaks, hash_word, \
@@ -124,6 +125,51 @@ def test_remove_dups():
     assert len(data) == 2
 
 
+def _legacy_find_duplicate_indices(texts, dedup_threshold):
+    from DBotPreprocessTextData import get_tf_idf_matrix
+    tfidf = get_tf_idf_matrix(texts)
+    similarity_arr = (tfidf * tfidf.T).toarray()
+    indices_to_remove = []
+    for i in range(similarity_arr.shape[0]):
+        for j in range(similarity_arr.shape[1]):
+            if j > i and similarity_arr[i][j] > dedup_threshold:
+                indices_to_remove.append(j)
+    return set(indices_to_remove)
+
+
+def _random_texts(n_texts, seed=0, vocabulary_size=5000, words_per_text=40, duplicates_ratio=0.1):
+    import random
+    rand = random.Random(seed)
+    vocabulary = ['word{}'.format(i) for i in range(vocabulary_size)]
+    texts = []
+    for _ in range(n_texts):
+        if texts and rand.random() < duplicates_ratio:
+            # a near duplicate of a previous text
+            words = rand.choice(texts).split()
+            words[rand.randrange(len(words))] = rand.choice(vocabulary)
+            texts.append(' '.join(words))
+        else:
+            texts.append(' '.join(rand.choice(vocabulary) for _ in range(words_per_text)))
+    return texts
+
+
+@pytest.mark.parametrize('max_chunk_cells', [1, 1000, 10 ** 7])
+def test_find_duplicate_indices(max_chunk_cells):
+    """
+    Given
+        - Texts with near duplicates
+    When
+        - Finding the duplicate indices in chunks of different sizes
+    Then
+        - Ensure the same indices are found as with the dense similarity matrix
+    """
+    from DBotPreprocessTextData import find_duplicate_indices
+    texts = _random_texts(300, vocabulary_size=300, words_per_text=10, duplicates_ratio=0.3)
+    expected = _legacy_find_duplicate_indices(texts, 0.75)
+    assert expected
+    assert find_duplicate_indices(texts, 0.75, max_chunk_cells=max_chunk_cells) == expected
+
+
 def test_pre_process():
     data = [
         {
@@ -402,7 +448,7 @@ I have 3 dogs
         assert res1['originalWordsToTokens'] == expected
 
 
-def test_read_file(mocker):
+def test_read_file(mocker, tmp_path):
     mocker.patch.object(demisto, 'getFilePath', return_value={'path': './TestData/input_json_file_test'})
     obj = read_file('231342@343', 'json')
     assert len(obj) >= 1
@@ -410,18 +456,20 @@ def test_read_file(mocker):
         obj = read_file(f.read(), 'json_string')
         assert len(obj) >= 1
 
-    with open('./TestData/input_pickle_file_test', 'wb') as f:
+    pickle_path = str(tmp_path / 'input_pickle_file_test')
+    with open(pickle_path, 'wb') as f:
         f.write(pickle.dumps(obj))
-    mocker.patch.object(demisto, 'getFilePath', return_value={'path': './TestData/input_pickle_file_test'})
-    obj_from_pickle = read_file('./TestData/input_pickle_file_test', 'pickle')
+    mocker.patch.object(demisto, 'getFilePath', return_value={'path': pickle_path})
+    obj_from_pickle = read_file(pickle_path, 'pickle')
     assert len(obj_from_pickle) >= 1
 
     mocker.patch.object(demisto, 'getFilePath', return_value={'path': './TestData/input_json_file_test'})
     with open('./TestData/input_json_file_test', 'r') as f:
         obj = read_file(f.read(), 'json_string')
         df = pd.DataFrame.from_dict(obj)
-        df.to_csv("./TestData/test.csv", index=False)
-        mocker.patch.object(demisto, 'getFilePath', return_value={'path': './TestData/test.csv'})
+        csv_path = str(tmp_path / 'test.csv')
+        df.to_csv(csv_path, index=False)
+        mocker.patch.object(demisto, 'getFilePath', return_value={'path': csv_path})
         obj2 = read_file('231342@343', 'csv')
         assert len(obj2) == len(obj)
 
@@ -1,25 +1,12 @@
 import demistomock as demisto
 from CommonServerPython import *
 
-from netaddr import IPAddress, IPNetwork
-
 
 def main():
     ip_addresses = argToList(demisto.args()['value'])
     cidr_range_list = argToList(demisto.args()['cidr_ranges'])
 
-    excluded_addresses = []
-
-    for ip_address in ip_addresses:
-        found = False
-        ip = IPAddress(ip_address)
-
-        for cidr_range in cidr_range_list:
-            if ip in IPNetwork(cidr_range):
-                found = True
-
-        if not found:
-            excluded_addresses.append(ip_address)
+    excluded_addresses = get_cidr_index(cidr_range_list).filter(ip_addresses, in_ranges=False)
 
     if not excluded_addresses:
         demisto.results(None)
@@ -1,19 +1,12 @@
 import demistomock as demisto
 from CommonServerPython import *
 
-from netaddr import IPAddress, IPNetwork
-
 
 def main():
     ip_address = demisto.args()['left']
     cidr_range_list = argToList(demisto.args()['right'])
 
-    for cidr in cidr_range_list:
-        if IPAddress(ip_address) in IPNetwork(cidr):
-            demisto.results(False)
-            return
-
-    demisto.results(True)
+    demisto.results(ip_address not in get_cidr_index(cidr_range_list))
 
 
 if __name__ == "__builtin__" or __name__ == "builtins":
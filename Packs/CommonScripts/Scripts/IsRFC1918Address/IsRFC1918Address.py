@@ -1,8 +1,6 @@
 import demistomock as demisto
 from CommonServerPython import *
 
-from netaddr import IPAddress, IPNetwork
-
 
 def main():
     try:
@@ -15,12 +13,7 @@ def main():
 
         cidr_range_list = ['10.0.0.0/8', '172.16.0.0/12', '192.168.0.0/16']
 
-        for cidr in cidr_range_list:
-            if IPAddress(ip_address) in IPNetwork(cidr):
-                demisto.results(True)
-                return
-
-        demisto.results(False)
+        demisto.results(ip_address in get_cidr_index(cidr_range_list))
     except Exception as err:
         return_error(str(err))
 
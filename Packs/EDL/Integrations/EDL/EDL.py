@@ -3,11 +3,16 @@ from CommonServerPython import *
 from CommonServerUserPython import *
 
 import re
+import gzip
+import tempfile
 
 from base64 import b64decode
+from collections import OrderedDict
+from contextlib import contextmanager
+from threading import Lock, Thread
 from flask import Flask, Response, request
 from netaddr import IPSet
-from typing import Any, Dict, cast, Iterable
+from typing import Any, Dict, cast, Iterable, Iterator, Tuple
 from math import ceil
 import urllib3
 import dateparser
@@ -19,6 +24,7 @@ urllib3.disable_warnings()
 ''' GLOBAL VARIABLES '''
 INTEGRATION_NAME: str = 'EDL'
 PAGE_SIZE: int = 2000
+PREFETCH_PAGES: int = 2
 PAN_OS_MAX_URL_LEN = 255
 APP: Flask = Flask('demisto-edl')
 EDL_LIMIT_ERR_MSG: str = 'Please provide a valid integer for EDL Size'
@@ -31,6 +37,12 @@ EDL_MISSING_REFRESH_ERR_MSG: str = 'Refresh Rate must be "number date_range_unit
 EDL_FILTER_FIELDS: Optional[str] = "name,type"
 EDL_ON_DEMAND_KEY: str = 'UpdateEDL'
 EDL_ON_DEMAND_CACHE_PATH: str = ''
+EDL_CACHE_MAX_ENTRIES: int = 20
+EDL_CACHE_CHECK_INTERVAL: int = 10
+EDL_CACHE_MAX_MISSED_REFRESHES: int = 3
+EDL_CACHE_MIN_IDLE_TIME: int = 24 * 60 * 60
+EDL_CACHE_READ_ATTEMPTS: int = 3
+EDL_CACHE: Optional['EDLCache'] = None
 
 ''' REFORMATTING REGEXES '''
 _PROTOCOL_REMOVAL = re.compile('^(?:[a-z]+:)*//')
@@ -129,38 +141,43 @@ def create_new_edl(request_args: RequestArguments) -> str:
         filter_fields=EDL_FILTER_FIELDS,
         query=request_args.query,
         size=PAGE_SIZE,
-        limit=limit
+        prefetch=PREFETCH_PAGES,
     )
-    iocs = []
-    formatted_iocs: set = set()
-    while True:
-        indicator_searcher.limit = limit - len(formatted_iocs)
-        new_iocs = find_indicators_to_limit(indicator_searcher)
-        iocs.extend(new_iocs)
-        formatted_iocs = format_indicators(iocs, request_args)
-        # continue searching iocs if 1) iocs was truncated or 2) got all available iocs
-        if len(formatted_iocs) >= len(iocs) or indicator_searcher.total <= limit:
-            break
+    formatter = IndicatorsFormatter(request_args)
+    formatted_iocs: Optional[set] = None
+    # IP collapsing can only shrink the list, so it runs once the raw count reaches the limit
+    # and again only if the collapsed list fell short of it and enough new entries arrived since.
+    collapse_at = limit
+    try:
+        for iocs in iter_indicators_pages(indicator_searcher):
+            formatter.update(iocs)
+            if len(formatter) >= collapse_at:
+                formatted_iocs = formatter.result()
+                if len(formatted_iocs) >= limit:
+                    break
+                collapse_at = len(formatter) + limit - len(formatted_iocs)
+                formatted_iocs = None
+    finally:
+        indicator_searcher.close()
+    if formatted_iocs is None:
+        formatted_iocs = formatter.result()
     return iterable_to_str(list(formatted_iocs)[request_args.offset:limit])
 
 
-def find_indicators_to_limit(indicator_searcher: IndicatorsSearcher) -> List[dict]:
+def iter_indicators_pages(indicator_searcher: IndicatorsSearcher) -> Iterator[List[dict]]:
     """
-    Finds indicators using while loop with demisto.searchIndicators, and returns result and last page
+    Iterates the indicator searcher once, yielding each fetched page
 
     Parameters:
         indicator_searcher (IndicatorsSearcher): The indicator searcher used to look for indicators
 
     Returns:
-        (list): List of Indicators dict with value,indicator_type keys
+        (Iterator): Lists of Indicators dict with value,indicator_type keys, one per page
     """
-    iocs: List[dict] = []
     for ioc_res in indicator_searcher:
         fetched_iocs = ioc_res.get('iocs') or []
         # save only the value and type of each indicator
-        iocs.extend({'value': ioc.get('value'), 'indicator_type': ioc.get('indicator_type')}
-                    for ioc in fetched_iocs)
-    return iocs
+        yield [{'value': ioc.get('value'), 'indicator_type': ioc.get('indicator_type')} for ioc in fetched_iocs]
 
 
 def ip_groups_to_cidrs(ip_range_groups: Iterable):
@@ -226,6 +243,84 @@ def ips_to_ranges(ips: Iterable, collapse_ips: str):
         return ip_groups_to_cidrs(cidrs)
 
 
+class IndicatorsFormatter:
+    """
+    Formats indicators page by page, keeping the formatted values in running sets.
+    IPs to collapse are kept aside and collapsed only when the result is requested.
+    """
+    IP_TYPES = (FeedIndicatorType.IP, FeedIndicatorType.IPv6, FeedIndicatorType.CIDR, FeedIndicatorType.IPv6CIDR)
+
+    def __init__(self, request_args: RequestArguments):
+        self.request_args = request_args
+        self.collapse_ips = request_args.collapse_ips != DONT_COLLAPSE
+        self.formatted_indicators: set = set()
+        self.ipv4_indicators: set = set()
+        self.ipv6_indicators: set = set()
+
+    def __len__(self) -> int:
+        """Number of formatted indicators before IP collapsing"""
+        return len(self.formatted_indicators) + len(self.ipv4_indicators) + len(self.ipv6_indicators)
+
+    def update(self, iocs: Iterable[dict]):
+        """Formats a page of indicators and adds them to the running sets"""
+        request_args = self.request_args
+        formatted_indicators = self.formatted_indicators
+        for ioc in iocs:
+            indicator = ioc.get('value')
+            if not indicator:
+                continue
+            ioc_type = ioc.get('indicator_type')
+            # protocol stripping
+            indicator = _PROTOCOL_REMOVAL.sub('', indicator)
+
+            if ioc_type not in self.IP_TYPES:
+                # Port stripping
+                indicator_with_port = indicator
+                # remove port from indicator - from demisto.com:369/rest/of/path -> demisto.com/rest/of/path
+                indicator = _PORT_REMOVAL.sub(_URL_WITHOUT_PORT, indicator)
+                # check if removing the port changed something about the indicator
+                if indicator != indicator_with_port and not request_args.url_port_stripping:
+                    # if port was in the indicator and url_port_stripping param not set - ignore the indicator
+                    continue
+                # Reformatting to PAN-OS URL format
+                with_invalid_tokens_indicator = indicator
+                # mix of text and wildcard in domain field handling
+                indicator = _INVALID_TOKEN_REMOVAL.sub('*', indicator)
+                # check if the indicator held invalid tokens
+                if request_args.drop_invalids:
+                    if with_invalid_tokens_indicator != indicator:
+                        # invalid tokens in indicator - ignore the indicator
+                        continue
+                    if ioc_type == FeedIndicatorType.URL and len(indicator) >= PAN_OS_MAX_URL_LEN:
+                        # URL indicator exceeds allowed length - ignore the indicator
+                        continue
+
+                # for PAN-OS *.domain.com does not match domain.com
+                # we should provide both
+                # this could generate more than num entries according to PAGE_SIZE
+                if indicator.startswith('*.'):
+                    formatted_indicators.add(indicator.lstrip('*.'))
+
+            if self.collapse_ips and ioc_type in (FeedIndicatorType.IP, FeedIndicatorType.CIDR):
+                self.ipv4_indicators.add(indicator)
+
+            elif self.collapse_ips and ioc_type == FeedIndicatorType.IPv6:
+                self.ipv6_indicators.add(indicator)
+
+            else:
+                formatted_indicators.add(indicator)
+
+    def result(self) -> set:
+        """Returns the formatted indicators, with the IPs collapsed if requested"""
+        result = set(self.formatted_indicators)
+        if self.ipv4_indicators:
+            result.update(ips_to_ranges(self.ipv4_indicators, self.request_args.collapse_ips))
+
+        if self.ipv6_indicators:
+            result.update(ips_to_ranges(self.ipv6_indicators, self.request_args.collapse_ips))
+        return result
+
+
 def format_indicators(iocs: list, request_args: RequestArguments) -> set:
     """
     Create a list result of formatted_indicators
@@ -239,63 +334,9 @@ def format_indicators(iocs: list, request_args: RequestArguments) -> set:
         1) if drop_invalids, drop invalids (has invalid chars)
         2) if port_stripping, strip ports
     """
-    formatted_indicators = set()
-    ipv4_formatted_indicators = set()
-    ipv6_formatted_indicators = set()
-    for ioc in iocs:
-        indicator = ioc.get('value')
-        if not indicator:
-            continue
-        ioc_type = ioc.get('indicator_type')
-        # protocol stripping
-        indicator = _PROTOCOL_REMOVAL.sub('', indicator)
-
-        if ioc_type not in [FeedIndicatorType.IP, FeedIndicatorType.IPv6,
-                            FeedIndicatorType.CIDR, FeedIndicatorType.IPv6CIDR]:
-            # Port stripping
-            indicator_with_port = indicator
-            # remove port from indicator - from demisto.com:369/rest/of/path -> demisto.com/rest/of/path
-            indicator = _PORT_REMOVAL.sub(_URL_WITHOUT_PORT, indicator)
-            # check if removing the port changed something about the indicator
-            if indicator != indicator_with_port and not request_args.url_port_stripping:
-                # if port was in the indicator and url_port_stripping param not set - ignore the indicator
-                continue
-            # Reformatting to PAN-OS URL format
-            with_invalid_tokens_indicator = indicator
-            # mix of text and wildcard in domain field handling
-            indicator = _INVALID_TOKEN_REMOVAL.sub('*', indicator)
-            # check if the indicator held invalid tokens
-            if request_args.drop_invalids:
-                if with_invalid_tokens_indicator != indicator:
-                    # invalid tokens in indicator - ignore the indicator
-                    continue
-                if ioc_type == FeedIndicatorType.URL and len(indicator) >= PAN_OS_MAX_URL_LEN:
-                    # URL indicator exceeds allowed length - ignore the indicator
-                    continue
-
-            # for PAN-OS *.domain.com does not match domain.com
-            # we should provide both
-            # this could generate more than num entries according to PAGE_SIZE
-            if indicator.startswith('*.'):
-                formatted_indicators.add(indicator.lstrip('*.'))
-
-        if request_args.collapse_ips != DONT_COLLAPSE and ioc_type in (FeedIndicatorType.IP, FeedIndicatorType.CIDR):
-            ipv4_formatted_indicators.add(indicator)
-
-        elif request_args.collapse_ips != DONT_COLLAPSE and ioc_type == FeedIndicatorType.IPv6:
-            ipv6_formatted_indicators.add(indicator)
-
-        else:
-            formatted_indicators.add(indicator)
-
-    if len(ipv4_formatted_indicators) > 0:
-        ipv4_formatted_indicators = ips_to_ranges(ipv4_formatted_indicators, request_args.collapse_ips)
-        formatted_indicators.update(ipv4_formatted_indicators)
-
-    if len(ipv6_formatted_indicators) > 0:
-        ipv6_formatted_indicators = ips_to_ranges(ipv6_formatted_indicators, request_args.collapse_ips)
-        formatted_indicators.update(ipv6_formatted_indicators)
-    return formatted_indicators
+    formatter = IndicatorsFormatter(request_args)
+    formatter.update(iocs)
+    return formatter.result()
 
 
 def get_edl_on_demand():
@@ -317,6 +358,180 @@ def get_edl_on_demand():
     return edl
 
 
+class EDLCacheEntry:
+    """A pre-rendered EDL stored on the local file system"""
+
+    def __init__(self, request_args: RequestArguments, path: str, etag: str, created: datetime,
+                 query_time: float, edl_size: int):
+        self.request_args = request_args
+        self.path = path
+        self.gzip_path = f'{path}.gz'
+        self.etag = etag
+        self.created = created
+        self.query_time = query_time
+        self.edl_size = edl_size
+        self.rendered_at = time.time()
+        self.last_access = self.rendered_at
+
+    def remove_files(self):
+        for path in (self.path, self.gzip_path):
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+
+class EDLCache:
+    """
+    Keeps pre-rendered EDLs on the local file system, one per distinct RequestArguments,
+    evicting the least recently used ones. Each EDL is saved both as plain text and gzip encoded.
+    """
+
+    def __init__(self, cache_dir: str, max_entries: int = EDL_CACHE_MAX_ENTRIES):
+        self.cache_dir = cache_dir
+        self.max_entries = max_entries
+        self._entries: OrderedDict = OrderedDict()
+        self._render_locks: Dict[str, Lock] = {}
+        self._lock = Lock()
+
+    @staticmethod
+    def get_key(request_args: RequestArguments) -> str:
+        return hashlib.sha1(json.dumps(request_args.to_context_json(),  # guardrails-disable-line
+                                       sort_keys=True).encode()).hexdigest()
+
+    def _get_entry(self, key: str) -> Optional[EDLCacheEntry]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry:
+                self._entries.move_to_end(key)
+                entry.last_access = time.time()
+        return entry
+
+    @contextmanager
+    def _render_lock(self, key: str):
+        """Serializes the renders of the same EDL"""
+        with self._lock:
+            render_lock = self._render_locks.setdefault(key, Lock())
+        try:
+            with render_lock:
+                yield
+        finally:
+            with self._lock:
+                if self._render_locks.get(key) is render_lock:
+                    del self._render_locks[key]
+
+    def get(self, request_args: RequestArguments) -> EDLCacheEntry:
+        """
+        Returns the cached EDL of the request arguments, rendering it if it isn't cached yet.
+        Concurrent requests of an EDL which isn't cached wait for a single render.
+        """
+        key = self.get_key(request_args)
+        entry = self._get_entry(key)
+        if entry:
+            return entry
+        with self._render_lock(key):
+            # the EDL may have been rendered while waiting for the lock
+            return self._get_entry(key) or self.render(request_args)
+
+    def create(self, request_args: RequestArguments) -> Tuple[EDLCacheEntry, bytes]:
+        """Creates the EDL of the request arguments without saving it, returns its entry and content"""
+        created = datetime.now(timezone.utc)
+        edl = create_new_edl(request_args)
+        query_time = (datetime.now(timezone.utc) - created).total_seconds()
+        edl_size = 0
+        if edl.strip():
+            edl_size = edl.count('\n') + 1  # add 1 as last line doesn't have a \n
+        etag = hashlib.sha1(edl.encode()).hexdigest()  # guardrails-disable-line
+        if len(edl) == 0 and request_args.add_comment_if_empty:
+            edl = '# Empty EDL'
+        # every rendered version gets its own files, so EDLs being read are never overwritten
+        path = os.path.join(self.cache_dir, f'{self.get_key(request_args)}-{etag}')
+        return EDLCacheEntry(request_args, path, etag, created, query_time, edl_size), edl.encode()
+
+    def render(self, request_args: RequestArguments) -> EDLCacheEntry:
+        """Creates the EDL of the request arguments and saves it to the cache"""
+        entry, body = self.create(request_args)
+        key = self.get_key(request_args)
+        for file_path, content in ((entry.path, body), (entry.gzip_path, gzip.compress(body))):
+            tmp_fd, tmp_path = tempfile.mkstemp(dir=self.cache_dir)
+            with os.fdopen(tmp_fd, 'wb') as edl_file:
+                edl_file.write(content)
+            os.replace(tmp_path, file_path)
+
+        removed = []
+        with self._lock:
+            prev_entry = self._entries.pop(key, None)
+            if prev_entry:
+                entry.last_access = prev_entry.last_access
+                if prev_entry.path != entry.path:
+                    removed.append(prev_entry)
+            self._entries[key] = entry
+            while len(self._entries) > self.max_entries:
+                removed.append(self._entries.popitem(last=False)[1])
+        for old_entry in removed:
+            old_entry.remove_files()
+        return entry
+
+    def read(self, entry: EDLCacheEntry, gzipped: bool = False) -> Optional[bytes]:
+        """Reads the content of a cached EDL, returns None if it was evicted in the meantime"""
+        try:
+            with open(entry.gzip_path if gzipped else entry.path, 'rb') as edl_file:
+                return edl_file.read()
+        except FileNotFoundError:
+            return None
+
+    def refresh(self, refresh_rate: int):
+        """
+        Re-renders the cached EDLs older than the refresh rate.
+        EDLs that weren't requested for several refresh intervals, and at least for EDL_CACHE_MIN_IDLE_TIME,
+        are evicted instead, so clients polling less often than the refresh rate are still served from the cache.
+        """
+        now = time.time()
+        max_idle_time = max(refresh_rate * EDL_CACHE_MAX_MISSED_REFRESHES, EDL_CACHE_MIN_IDLE_TIME)
+        with self._lock:
+            stale_entries = [(key, entry) for key, entry in self._entries.items()
+                             if now - entry.rendered_at >= refresh_rate]
+        for key, entry in stale_entries:
+            if now - entry.last_access >= max_idle_time:
+                with self._lock:
+                    if self._entries.get(key) is entry:
+                        del self._entries[key]
+                entry.remove_files()
+                continue
+            try:
+                with self._render_lock(key):
+                    with self._lock:
+                        # skip the EDL if it was rendered again or evicted while waiting for the lock
+                        if self._entries.get(key) is not entry:
+                            continue
+                    self.render(entry.request_args)
+            except Exception as e:
+                demisto.error(f'Failed refreshing EDL with query [{entry.request_args.query}]: {e}')
+
+
+def get_edl_cache() -> EDLCache:
+    global EDL_CACHE
+    if EDL_CACHE is None:
+        EDL_CACHE = EDLCache(tempfile.mkdtemp(prefix='edl-cache-'))
+    return EDL_CACHE
+
+
+def edl_cache_refresh_loop(refresh_rate: int):
+    """
+    Runs in a long running container - keeps the cached EDLs up to date, so requests are served from the cache.
+    """
+    while True:
+        try:
+            get_edl_cache().refresh(refresh_rate)
+        except Exception as e:
+            demisto.error(f'Failed refreshing the EDL cache: {e}')
+        time.sleep(EDL_CACHE_CHECK_INTERVAL)
+
+
+def get_refresh_rate_seconds(cache_refresh_rate: str) -> int:
+    return ceil((datetime.now() - dateparser.parse(cache_refresh_rate)).total_seconds())  # type: ignore[operator]
+
+
 def validate_basic_authentication(headers: dict, username: str, password: str) -> bool:
     """
     Checks whether the authentication is valid.
@@ -368,25 +583,72 @@ def route_edl() -> Response:
             ])
 
     request_args = get_request_args(request.args, params)
-    on_demand = params.get('on_demand')
-    created = datetime.now(timezone.utc)
-    edl = get_edl_on_demand() if on_demand else create_new_edl(request_args)
-    etag = f'"{hashlib.sha1(edl.encode()).hexdigest()}"'  # guardrails-disable-line
-    query_time = (datetime.now(timezone.utc) - created).total_seconds()
-    edl_size = 0
-    if edl.strip():
-        edl_size = edl.count('\n') + 1  # add 1 as last line doesn't have a \n
-    if len(edl) == 0 and request_args.add_comment_if_empty:
-        edl = '# Empty EDL'
-    max_age = ceil((datetime.now() - dateparser.parse(cache_refresh_rate)).total_seconds())  # type: ignore[operator]
+    max_age = get_refresh_rate_seconds(cache_refresh_rate)
+    if params.get('on_demand'):
+        created = datetime.now(timezone.utc)
+        edl = get_edl_on_demand()
+        etag = hashlib.sha1(edl.encode()).hexdigest()  # guardrails-disable-line
+        query_time = (datetime.now(timezone.utc) - created).total_seconds()
+        edl_size = 0
+        if edl.strip():
+            edl_size = edl.count('\n') + 1  # add 1 as last line doesn't have a \n
+        if len(edl) == 0 and request_args.add_comment_if_empty:
+            edl = '# Empty EDL'
+        return create_edl_response(edl.encode(), etag, created, query_time, edl_size, max_age)
+
+    edl_cache = get_edl_cache()
+    gzipped = request.accept_encodings['gzip'] > 0
+    entry = edl_cache.get(request_args)
+    body = None
+    read_attempts = 0
+    while not request.if_none_match.contains(entry.etag):
+        body = edl_cache.read(entry, gzipped)
+        if body is not None:
+            break
+        read_attempts += 1
+        if read_attempts >= EDL_CACHE_READ_ATTEMPTS:
+            # the cached EDL keeps changing under the request, serve it without the cache
+            entry, body = edl_cache.create(request_args)
+            if gzipped:
+                body = gzip.compress(body)
+            break
+        # the entry was refreshed or evicted after it was fetched
+        entry = edl_cache.get(request_args)
+    return create_edl_response(body, entry.etag, entry.created, entry.query_time, entry.edl_size, max_age,
+                               gzipped=gzipped)
+
+
+def create_edl_response(body: Optional[bytes], etag: str, created: datetime, query_time: float, edl_size: int,
+                        max_age: int, gzipped: bool = False) -> Response:
+    """
+    Creates the EDL response, returns 304 if the client already holds the current version of the EDL.
+    Args:
+        body: The EDL content
+        etag: The EDL version
+        created: The time the EDL was created
+        query_time: Seconds it took to create the EDL
+        edl_size: Number of entries in the EDL
+        max_age: Seconds the client may cache the EDL
+        gzipped: Whether the body is gzip encoded
+
+    Returns:
+        The flask response
+    """
     demisto.debug(f'Returning edl of size: [{edl_size}], created: [{created}], query time seconds: [{query_time}],'
                   f' max age: [{max_age}], etag: [{etag}]')
-    resp = Response(edl, status=200, mimetype='text/plain', headers=[
+    headers = [
         ('X-EDL-Created', created.isoformat()),
         ('X-EDL-Query-Time-Secs', "{:.3f}".format(query_time)),
         ('X-EDL-Size', str(edl_size)),
-        ('ETag', etag),
-    ])
+        ('ETag', f'"{etag}"'),
+        ('Vary', 'Accept-Encoding'),
+    ]
+    if request.if_none_match.contains(etag):
+        resp = Response(status=304, headers=headers)
+    else:
+        if gzipped:
+            headers.append(('Content-Encoding', 'gzip'))
+        resp = Response(body, status=200, mimetype='text/plain', headers=headers)
     resp.cache_control.max_age = max_age
     resp.cache_control[
         'stale-if-error'] = '600'  # number of seconds we are willing to serve stale content when there is an error
@@ -553,6 +815,11 @@ def main():
     try:
         initialize_edl_context(params)
         if command == 'long-running-execution':
+            if not params.get('on_demand'):
+                support_multithreading()
+                refresh_rate = get_refresh_rate_seconds(params.get('cache_refresh_rate') or '5 minutes')
+                Thread(target=edl_cache_refresh_loop, args=(refresh_rate,), daemon=True).start()
+                demisto.info('Started EDL cache refresh loop thread')
             run_long_running(params)
         elif command in commands:
             readable_output, outputs, raw_response = commands[command](demisto.args(), params)
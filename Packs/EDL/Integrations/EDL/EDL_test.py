@@ -139,7 +139,8 @@ class TestHelperFunctions:
         import EDL as edl
         with open('EDL_test/TestHelperFunctions/demisto_iocs.json', 'r') as iocs_json_f:
             iocs_json = json.loads(iocs_json_f.read())
-            mocker.patch.object(edl, 'find_indicators_to_limit', return_value=iocs_json)
+            mocker.patch.object(edl.IndicatorsSearcher, 'search_indicators_by_version',
+                                side_effect=[{'iocs': iocs_json}, {'iocs': []}])
             request_args = edl.RequestArguments(query='', limit=38, url_port_stripping=True)
             edl_vals = edl.create_new_edl(request_args)
             for ioc in iocs_json:
@@ -150,18 +151,53 @@ class TestHelperFunctions:
                 else:
                     assert ip in edl_vals
 
-    def test_find_indicators_to_limit(self, mocker):
-        """Test find indicators limit"""
+    def test_create_new_edl_fetches_each_page_once(self, mocker):
+        """
+        Given
+            - Indicators served over several pages, some of them dropped by the formatting
+        When
+            - Creating a new EDL
+        Then
+            - Ensure each page is fetched and formatted once, and the search stops once the limit is reached
+        """
         import EDL as edl
-        with open('EDL_test/TestHelperFunctions/demisto_iocs.json', 'r') as iocs_json_f:
-            iocs_json = json.loads(iocs_json_f.read())
-            indicator_searcher_res = [{'iocs': iocs_json}, {'iocs': []}]
-            limit = 37
-            indicator_searcher = edl.IndicatorsSearcher()
-            indicator_searcher.limit = limit
-            mocker.patch.object(indicator_searcher, 'search_indicators_by_version', side_effect=indicator_searcher_res)
-            edl_vals = edl.find_indicators_to_limit(indicator_searcher=indicator_searcher)
-            assert len(edl_vals) == limit
+        pages = [
+            {'iocs': [{'value': 'a.com:80', 'indicator_type': 'Domain'},
+                      {'value': 'b.com', 'indicator_type': 'Domain'}]},
+            {'iocs': [{'value': 'c.com', 'indicator_type': 'Domain'}, {'value': 'd.com', 'indicator_type': 'Domain'}]},
+            {'iocs': [{'value': 'e.com', 'indicator_type': 'Domain'}]},
+        ]
+        mocker.patch.object(edl, 'PREFETCH_PAGES', 0)
+        search_mock = mocker.patch.object(edl.IndicatorsSearcher, 'search_indicators_by_version', side_effect=pages)
+        update_mock = mocker.spy(edl.IndicatorsFormatter, 'update')
+        request_args = edl.RequestArguments(query='', limit=3)
+        edl_vals = edl.create_new_edl(request_args)
+        assert set(edl_vals.split('\n')) == {'b.com', 'c.com', 'd.com'}
+        assert search_mock.call_count == 2
+        assert update_mock.call_count == 2
+
+    def test_create_new_edl_collapse_ips_once(self, mocker):
+        """
+        Given
+            - IP indicators served over several pages
+        When
+            - Creating a new EDL with IPs collapsed to CIDRs
+        Then
+            - Ensure the IPs are collapsed once, after the last page
+        """
+        import EDL as edl
+        pages = [
+            {'iocs': [{'value': '1.1.1.1', 'indicator_type': 'IP'}, {'value': '1.1.1.2', 'indicator_type': 'IP'}]},
+            {'iocs': [{'value': '1.1.1.3', 'indicator_type': 'IP'},
+                      {'value': 'demisto.com', 'indicator_type': 'Domain'}]},
+            {'iocs': []},
+        ]
+        mocker.patch.object(edl.IndicatorsSearcher, 'search_indicators_by_version', side_effect=pages)
+        collapse_mock = mocker.spy(edl, 'ips_to_ranges')
+        request_args = edl.RequestArguments(query='', limit=10, collapse_ips=edl.COLLAPSE_TO_CIDR)
+        edl_vals = edl.create_new_edl(request_args)
+        assert set(edl_vals.split('\n')) == {'1.1.1.1', '1.1.1.2/31', 'demisto.com'}
+        assert collapse_mock.call_count == 1
 
     def test_format_indicators(self):
         from EDL import format_indicators, RequestArguments, COLLAPSE_TO_RANGES
@@ -360,3 +396,185 @@ class TestHelperFunctions:
         assert res.drop_invalids == request_args["di"]
         assert res.collapse_ips == COLLAPSE_TO_RANGES
         assert res.add_comment_if_empty == request_args["ce"]
+
+
+class TestEDLCache:
+    PARAMS = {'edl_size': 10, 'indicators_query': 'type:Domain', 'cache_refresh_rate': '5 minutes'}
+
+    def test_route_edl_served_from_cache(self, mocker):
+        """
+        Given
+            - The same EDL requested twice, the second time with the ETag of the first response
+        When
+            - Routing the requests
+        Then
+            - Ensure the EDL is created once, and the second request gets a 304 with no body
+        """
+        import EDL as edl
+        mocker.patch.object(edl, 'EDL_CACHE', edl.EDLCache(mkdtemp()))
+        mocker.patch.object(edl.demisto, 'params', return_value=self.PARAMS)
+        create_mock = mocker.patch.object(edl, 'create_new_edl', return_value='a.com\nb.com')
+        client = edl.APP.test_client()
+
+        res = client.get('/')
+        assert res.status_code == 200
+        assert res.data == b'a.com\nb.com'
+        assert res.headers['X-EDL-Size'] == '2'
+        etag = res.headers['ETag']
+
+        res = client.get('/', headers={'If-None-Match': etag})
+        assert res.status_code == 304
+        assert res.data == b''
+        assert res.headers['ETag'] == etag
+        assert create_mock.call_count == 1
+
+    def test_route_edl_gzip(self, mocker):
+        """
+        Given
+            - A client which accepts gzip encoding
+        When
+            - Routing the request
+        Then
+            - Ensure the pre-computed gzip encoded EDL is returned
+        """
+        import gzip
+        import EDL as edl
+        mocker.patch.object(edl, 'EDL_CACHE', edl.EDLCache(mkdtemp()))
+        mocker.patch.object(edl.demisto, 'params', return_value=self.PARAMS)
+        mocker.patch.object(edl, 'create_new_edl', return_value='a.com\nb.com')
+        res = edl.APP.test_client().get('/', headers={'Accept-Encoding': 'gzip'})
+        assert res.headers['Content-Encoding'] == 'gzip'
+        assert gzip.decompress(res.data) == b'a.com\nb.com'
+
+    @pytest.mark.parametrize('accept_encoding', ['', 'gzip'])
+    def test_route_edl_cache_read_fails(self, mocker, accept_encoding):
+        """
+        Given
+            - A cached EDL which is refreshed or evicted every time before it is read
+        When
+            - Routing the request
+        Then
+            - Ensure the EDL is created without the cache and returned in full
+        """
+        import gzip
+        import EDL as edl
+        cache = edl.EDLCache(mkdtemp())
+        mocker.patch.object(edl, 'EDL_CACHE', cache)
+        mocker.patch.object(cache, 'read', return_value=None)
+        mocker.patch.object(edl.demisto, 'params', return_value=self.PARAMS)
+        create_mock = mocker.patch.object(edl, 'create_new_edl', return_value='a.com\nb.com')
+
+        res = edl.APP.test_client().get('/', headers={'Accept-Encoding': accept_encoding})
+        assert res.status_code == 200
+        assert (gzip.decompress(res.data) if accept_encoding else res.data) == b'a.com\nb.com'
+        assert cache.read.call_count == edl.EDL_CACHE_READ_ATTEMPTS
+        assert create_mock.call_count == 2
+
+    def test_cache_lru_eviction(self, mocker):
+        """
+        Given
+            - A cache holding a single EDL
+        When
+            - Rendering EDLs of two different request arguments
+        Then
+            - Ensure the least recently used EDL is evicted and its files are removed
+        """
+        import EDL as edl
+        mocker.patch.object(edl, 'create_new_edl', side_effect=lambda request_args: request_args.query)
+        cache = edl.EDLCache(mkdtemp(), max_entries=1)
+        first_entry = cache.get(edl.RequestArguments(query='a.com'))
+        second_entry = cache.get(edl.RequestArguments(query='b.com'))
+        assert not os.path.exists(first_entry.path)
+        assert not os.path.exists(first_entry.gzip_path)
+        assert cache.read(first_entry) is None
+        assert cache.read(second_entry) == b'b.com'
+
+    def test_cache_refresh(self, mocker):
+        """
+        Given
+            - Two stale EDLs, one was not requested in the last refresh interval and the other one for a day
+        When
+            - Refreshing the cache
+        Then
+            - Ensure the EDL requested less often than the refresh rate is rendered again
+            - Ensure the EDL which was not requested for a day is evicted
+        """
+        import EDL as edl
+        create_mock = mocker.patch.object(edl, 'create_new_edl', side_effect=lambda request_args: request_args.query)
+        cache = edl.EDLCache(mkdtemp())
+        requested_args = edl.RequestArguments(query='a.com')
+        requested_entry = cache.get(requested_args)
+        idle_entry = cache.get(edl.RequestArguments(query='b.com'))
+        requested_entry.rendered_at -= 600
+        requested_entry.last_access -= 601
+        idle_entry.rendered_at -= 600
+        idle_entry.last_access -= edl.EDL_CACHE_MIN_IDLE_TIME
+
+        cache.refresh(refresh_rate=300)
+        assert create_mock.call_count == 3
+        assert cache.get(requested_args) is not requested_entry
+        assert not os.path.exists(idle_entry.path)
+
+    def test_cache_refresh_waits_for_render(self, mocker):
+        """
+        Given
+            - A stale EDL which is being rendered by a request
+        When
+            - Refreshing the cache
+        Then
+            - Ensure the refresh waits for the render and does not render the EDL again
+        """
+        import EDL as edl
+        from threading import Thread
+        create_mock = mocker.patch.object(edl, 'create_new_edl', side_effect=lambda request_args: request_args.query)
+        cache = edl.EDLCache(mkdtemp())
+        request_args = edl.RequestArguments(query='a.com')
+        cache.get(request_args).rendered_at -= 600
+
+        with cache._render_lock(cache.get_key(request_args)):
+            refresh_thread = Thread(target=cache.refresh, args=(300,))
+            refresh_thread.start()
+            refresh_thread.join(0.5)
+            assert refresh_thread.is_alive()
+            cache.render(request_args)
+        refresh_thread.join(5)
+
+        assert not refresh_thread.is_alive()
+        assert create_mock.call_count == 2
+
+    def test_cache_single_render(self, mocker):
+        """
+        Given
+            - An EDL which is not cached yet
+        When
+            - Requesting it concurrently
+        Then
+            - Ensure the EDL is rendered once and all the requests get the same entry
+        """
+        import EDL as edl
+        from threading import Event, Thread
+
+        rendering = Event()
+        release = Event()
+
+        def slow_create_new_edl(request_args):
+            rendering.set()
+            release.wait(5)
+            return request_args.query
+
+        create_mock = mocker.patch.object(edl, 'create_new_edl', side_effect=slow_create_new_edl)
+        cache = edl.EDLCache(mkdtemp())
+        entries = []
+        threads = [Thread(target=lambda: entries.append(cache.get(edl.RequestArguments(query='a.com'))))
+                   for _ in range(3)]
+        threads[0].start()
+        rendering.wait(5)
+        for thread in threads[1:]:
+            thread.start()
+        release.set()
+        for thread in threads:
+            thread.join(5)
+
+        assert create_mock.call_count == 1
+        assert len(entries) == 3
+        assert all(entry is entries[0] for entry in entries)
@@ -4,16 +4,22 @@ from CommonServerPython import *
 from CommonServerUserPython import *
 
 import re
+import heapq
+import tempfile
 from base64 import b64decode
-from flask import Flask, Response, request
+from itertools import chain, islice
+from flask import Flask, Response, request, stream_with_context
 from netaddr import IPAddress, IPSet
-from typing import Callable, Any, cast, Dict, Tuple
+from typing import Callable, Any, cast, Dict, Tuple, Iterable, Iterator
 from math import ceil
 import dateparser
 
 ''' GLOBAL VARIABLES '''
 INTEGRATION_NAME: str = 'Export Indicators Service'
 PAGE_SIZE: int = 200
+STREAM_SORT_CHUNK_SIZE: int = 10000
+STREAM_CHUNK_SIZE: int = 65536
+PREFETCH_PAGES: int = 2
 APP: Flask = Flask('demisto-export_iocs')
 CTX_VALUES_KEY: str = 'dmst_export_iocs_values'
 CTX_MIMETYPE_KEY: str = 'dmst_export_iocs_mimetype'
@@ -192,7 +198,7 @@ def refresh_outbound_context(request_args: RequestArguments, on_demand: bool = F
     # re-polling in case formatting or ip collapse caused a lack in results
     while actual_indicator_amount < request_args.limit:
         # from where to start the new poll and how many results should be fetched
-        new_offset = len(iocs) + request_args.offset + actual_indicator_amount - 1
+        new_offset = len(iocs) + request_args.offset
         new_limit = request_args.limit - actual_indicator_amount
 
         # poll additional indicators into list from demisto
@@ -212,21 +218,7 @@ def refresh_outbound_context(request_args: RequestArguments, on_demand: bool = F
         if request_args.out_format == FORMAT_CSV:
             actual_indicator_amount = actual_indicator_amount - 1
 
-    if request_args.out_format == FORMAT_JSON:
-        out_dict[CTX_MIMETYPE_KEY] = MIMETYPE_JSON
-
-    elif request_args.out_format in [FORMAT_CSV, FORMAT_XSOAR_CSV]:
-        if request_args.csv_text:
-            out_dict[CTX_MIMETYPE_KEY] = MIMETYPE_TEXT
-
-        else:
-            out_dict[CTX_MIMETYPE_KEY] = MIMETYPE_CSV
-
-    elif request_args.out_format in [FORMAT_JSON_SEQ, FORMAT_XSOAR_JSON_SEQ]:
-        out_dict[CTX_MIMETYPE_KEY] = MIMETYPE_JSON_SEQ
-
-    else:
-        out_dict[CTX_MIMETYPE_KEY] = MIMETYPE_TEXT
+    out_dict[CTX_MIMETYPE_KEY] = get_mimetype(request_args)
 
     if on_demand:
         set_integration_context({
@@ -250,6 +242,23 @@ def refresh_outbound_context(request_args: RequestArguments, on_demand: bool = F
     return out_dict[CTX_VALUES_KEY]
 
 
+def get_mimetype(request_args: RequestArguments) -> str:
+    """Returns the mimetype of the selected output format"""
+    if request_args.out_format == FORMAT_JSON:
+        return MIMETYPE_JSON
+
+    elif request_args.out_format in [FORMAT_CSV, FORMAT_XSOAR_CSV]:
+        if request_args.csv_text:
+            return MIMETYPE_TEXT
+
+        return MIMETYPE_CSV
+
+    elif request_args.out_format in [FORMAT_JSON_SEQ, FORMAT_XSOAR_JSON_SEQ]:
+        return MIMETYPE_JSON_SEQ
+
+    return MIMETYPE_TEXT
+
+
 def find_indicators_with_limit(indicator_query: str, limit: int, offset: int) -> list:
     """
     Finds indicators using demisto.searchIndicators
@@ -346,60 +355,82 @@ def ips_to_ranges(ips: list, collapse_ips: str):
         list. a list to Ranges or CIDRs.
     """
 
+    return ip_set_to_ranges(IPSet(ips), collapse_ips)
+
+
+def ip_set_to_ranges(ip_set: IPSet, collapse_ips: str):
+    """Collapse an IP set to Ranges or CIDRs.
+
+    Args:
+        ip_set (IPSet): the IPs to collapse.
+        collapse_ips (str): Whether to collapse to Ranges or CIDRs.
+
+    Returns:
+        list. a list to Ranges or CIDRs.
+    """
+
     if collapse_ips == COLLAPSE_TO_RANGES:
-        ips_range_groups = IPSet(ips).iter_ipranges()
+        ips_range_groups = ip_set.iter_ipranges()
         return ip_groups_to_ranges(ips_range_groups)
 
     else:
-        cidrs = IPSet(ips).iter_cidrs()
+        cidrs = ip_set.iter_cidrs()
         return ip_groups_to_cidrs(cidrs)
 
 
+def panos_url_format_indicator(indicator_data: dict, drop_invalids: bool, strip_port: bool) -> list:
+    """
+    Formats a single indicator to PAN-OS URL format, returns the list of entries to export for it
+    """
+    indicator = indicator_data.get('value')
+    if not indicator:
+        return []
+    formatted_indicators = []  # type:List
+    if indicator_data.get('indicator_type') in ['URL', 'Domain', 'DomainGlob']:
+        indicator = indicator.lower()
+
+        # remove initial protocol - http/https/ftp/ftps etc
+        indicator = _PROTOCOL_REMOVAL.sub('', indicator)
+
+        indicator_with_port = indicator
+        # remove port from indicator - from demisto.com:369/rest/of/path -> demisto.com/rest/of/path
+        indicator = _PORT_REMOVAL.sub(r'\g<1>', indicator)
+        # check if removing the port changed something about the indicator
+        if indicator != indicator_with_port and not strip_port:
+            # if port was in the indicator and strip_port param not set - ignore the indicator
+            return []
+
+        with_invalid_tokens_indicator = indicator
+        # remove invalid tokens from indicator
+        indicator = _INVALID_TOKEN_REMOVAL.sub('*', indicator)
+
+        # check if the indicator held invalid tokens
+        if with_invalid_tokens_indicator != indicator:
+            # invalid tokens in indicator- if drop_invalids is set - ignore the indicator
+            if drop_invalids:
+                return []
+
+            # check if after removing the tokens the indicator is too broad if so - ignore
+            # example of too broad terms: "*.paloalto", "*.*.paloalto", "*.paloalto:60"
+            hostname = indicator
+            if '/' in hostname:
+                hostname, _ = hostname.split('/', 1)
+
+            if _BROAD_PATTERN.match(hostname) is not None:
+                return []
+
+        # for PAN-OS "*.domain.com" does not match "domain.com" - we should provide both
+        if indicator.startswith('*.'):
+            formatted_indicators.append(indicator[2:])
+
+    formatted_indicators.append(indicator)
+    return formatted_indicators
+
+
 def panos_url_formatting(iocs: list, drop_invalids: bool, strip_port: bool):
     formatted_indicators = []  # type:List
     for indicator_data in iocs:
-        # only format URLs and Domains
-        indicator = indicator_data.get('value')
-        if not indicator:
-            continue
-        if indicator_data.get('indicator_type') in ['URL', 'Domain', 'DomainGlob']:
-            indicator = indicator.lower()
-
-            # remove initial protocol - http/https/ftp/ftps etc
-            indicator = _PROTOCOL_REMOVAL.sub('', indicator)
-
-            indicator_with_port = indicator
-            # remove port from indicator - from demisto.com:369/rest/of/path -> demisto.com/rest/of/path
-            indicator = _PORT_REMOVAL.sub(r'\g<1>', indicator)
-            # check if removing the port changed something about the indicator
-            if indicator != indicator_with_port and not strip_port:
-                # if port was in the indicator and strip_port param not set - ignore the indicator
-                continue
-
-            with_invalid_tokens_indicator = indicator
-            # remove invalid tokens from indicator
-            indicator = _INVALID_TOKEN_REMOVAL.sub('*', indicator)
-
-            # check if the indicator held invalid tokens
-            if with_invalid_tokens_indicator != indicator:
-                # invalid tokens in indicator- if drop_invalids is set - ignore the indicator
-                if drop_invalids:
-                    continue
-
-                # check if after removing the tokens the indicator is too broad if so - ignore
-                # example of too broad terms: "*.paloalto", "*.*.paloalto", "*.paloalto:60"
-                hostname = indicator
-                if '/' in hostname:
-                    hostname, _ = hostname.split('/', 1)
-
-                if _BROAD_PATTERN.match(hostname) is not None:
-                    continue
-
-            # for PAN-OS "*.domain.com" does not match "domain.com" - we should provide both
-            if indicator.startswith('*.'):
-                formatted_indicators.append(indicator[2:])
-
-        formatted_indicators.append(indicator)
+        formatted_indicators.extend(panos_url_format_indicator(indicator_data, drop_invalids, strip_port))
     return {CTX_VALUES_KEY: list_to_str(formatted_indicators, '\n')}, len(formatted_indicators)
 
 
@@ -466,20 +497,24 @@ def create_proxysg_out_format(iocs: list, category_attribute: list, category_def
     return {CTX_VALUES_KEY: formatted_indicators}, num_of_returned_indicators
 
 
+def mwg_format_indicator(indicator: dict) -> str:
+    value = "\"" + indicator.get('value', '') + "\""
+    sources = indicator.get('sourceBrands')
+    if sources:
+        sources_string = "\"" + ','.join(sources) + "\""
+
+    else:
+        sources_string = "\"from CORTEX XSOAR\""
+
+    return value + " " + sources_string
+
+
 def create_mwg_out_format(iocs: list, mwg_type: str) -> dict:
     formatted_indicators = []  # type:List
     for indicator in iocs:
         if not indicator.get('value'):
             continue
-        value = "\"" + indicator.get('value') + "\""
-        sources = indicator.get('sourceBrands')
-        if sources:
-            sources_string = "\"" + ','.join(sources) + "\""
-
-        else:
-            sources_string = "\"from CORTEX XSOAR\""
-
-        formatted_indicators.append(value + " " + sources_string)
+        formatted_indicators.append(mwg_format_indicator(indicator))
 
     string_formatted_indicators = list_to_str(formatted_indicators, '\n')
 
@@ -560,6 +595,269 @@ def create_values_for_returned_dict(iocs: list, request_args: RequestArguments)
     return {CTX_VALUES_KEY: list_to_str(formatted_indicators, '\n')}, len(formatted_indicators)
 
 
+''' STREAMING FUNCTIONS '''
+
+
+def iter_indicators(indicator_query: str, offset: int = 0) -> Iterator[dict]:
+    """
+    Yields the indicators of the query page by page using IndicatorsSearcher, starting at the offset
+    """
+    next_page, offset_in_page = divmod(offset, PAGE_SIZE)
+    indicator_searcher = IndicatorsSearcher(page=next_page, query=indicator_query, size=PAGE_SIZE,
+                                            prefetch=PREFETCH_PAGES)
+    try:
+        for ioc_res in indicator_searcher:
+            yield from (ioc_res.get('iocs') or [])[offset_in_page:]
+            offset_in_page = 0
+    finally:
+        indicator_searcher.close()
+
+
+def external_sort_iocs(request_args: RequestArguments, iocs: Iterable[dict],
+                       chunk_size: int = STREAM_SORT_CHUNK_SIZE) -> Iterator[dict]:
+    """
+    Sorts the IoCs according to the sort field and order, holding at most chunk_size IoCs in memory.
+    Each chunk is sorted and spilled to a temporary file, then the sorted chunks are merged.
+    If a chunk can't be sorted, the chunks sorted so far are returned one after the other, followed by
+    the rest of the IoCs in their original order.
+    """
+    if not request_args.sort_field or request_args.sort_order not in [SORT_ASCENDING, SORT_DESCENDING]:
+        yield from iocs
+        return
+
+    chunk_files = []  # type:List
+    try:
+        iocs = iter(iocs)
+        chunk = list(islice(iocs, chunk_size))
+        while chunk:
+            sorted_chunk = sort_iocs(request_args, chunk)
+            if sorted_chunk is chunk:
+                # sort_iocs returns the given list when it fails sorting it
+                for chunk_file in chunk_files:
+                    chunk_file.seek(0)
+                    yield from map(json.loads, chunk_file)
+                yield from chunk
+                yield from iocs
+                return
+
+            chunk_file = tempfile.TemporaryFile(mode='w+')
+            chunk_files.append(chunk_file)
+            chunk_file.writelines(json.dumps(ioc) + '\n' for ioc in sorted_chunk)
+            chunk_file.seek(0)
+            chunk = list(islice(iocs, chunk_size))
+
+        yield from heapq.merge(*[map(json.loads, chunk_file) for chunk_file in chunk_files],
+                               key=lambda ioc: ioc[request_args.sort_field],
+                               reverse=request_args.sort_order == SORT_DESCENDING)
+    finally:
+        for chunk_file in chunk_files:
+            chunk_file.close()
+
+
+def iter_formatted_entries(iocs: Iterable[dict], request_args: RequestArguments) -> Iterator[str]:
+    """
+    Yields the entries of the IoCs in the selected format (json, json-seq, text, csv, McAfee Web Gateway, panosurl),
+    up to the request limit. When collapsing IPs, the collapsed IPs are yielded last, and the limit applies to the
+    collapsed ranges, as in refresh_outbound_context.
+    """
+    out_format = request_args.out_format
+    collapse_ips = request_args.collapse_ips != DONT_COLLAPSE and out_format in [FORMAT_TEXT, FORMAT_CSV]
+    ipv4_set = IPSet()
+    ipv6_set = IPSet()
+    # an IP adds at most one range, so the count is an upper bound of the entries until the IPs are collapsed.
+    # IP collapsing can only shrink the count, so it runs once the added entries reach the limit, and again only
+    # after as many new entries as the collapsed count fell short of it, as in refresh_outbound_context.
+    count = non_ip_count = added_count = 0
+    collapse_at = request_args.limit
+    for ioc in iocs:
+        if added_count >= collapse_at and (ipv4_set or ipv6_set):
+            collapsed_count = sum(len(ip_set_to_ranges(ip_set, request_args.collapse_ips))
+                                  for ip_set in (ipv4_set, ipv6_set) if ip_set)
+            count = non_ip_count + collapsed_count
+            collapse_at = added_count + request_args.limit - count
+        if count >= request_args.limit:
+            break
+
+        value = ioc.get('value')
+        ioc_type = ioc.get('indicator_type')
+        if out_format == FORMAT_XSOAR_JSON:
+            entries = [json.dumps(ioc)]
+
+        elif not value:
+            continue
+
+        elif out_format == FORMAT_PANOSURL:
+            entries = panos_url_format_indicator(ioc, request_args.drop_invalids, request_args.strip_port)
+
+        elif out_format == FORMAT_MWG:
+            entries = [mwg_format_indicator(ioc)]
+
+        elif out_format in [FORMAT_JSON, FORMAT_JSON_SEQ]:
+            entries = [json.dumps(json_format_single_indicator(ioc))]
+
+        elif out_format == FORMAT_XSOAR_JSON_SEQ:
+            entries = [json.dumps(ioc)]
+
+        elif out_format == FORMAT_XSOAR_CSV:
+            # wrap csv values with " to escape them
+            entries = [list_to_str(list(ioc.values()), map_func=lambda val: f'"{val}"')]
+
+        elif collapse_ips and ioc_type in ['IP', 'IPv6']:
+            ip_set = ipv4_set if ioc_type == 'IP' else ipv6_set
+            # an IP already covered by the collected ones adds no range
+            if value not in ip_set:
+                ip_set.add(value)
+                count += 1
+                added_count += 1
+            continue
+
+        else:
+            entries = [value]
+
+        entries = entries[:request_args.limit - count]
+        yield from entries
+        count += len(entries)
+        non_ip_count += len(entries)
+        added_count += len(entries)
+
+    for ip_set in (ipv4_set, ipv6_set):
+        if ip_set:
+            yield from ip_set_to_ranges(ip_set, request_args.collapse_ips)
+
+
+def join_entries(entries: Iterable[str], delimiter: str = '\n', prefix: str = '', suffix: str = '',
+                 chunk_size: int = STREAM_CHUNK_SIZE) -> Iterator[str]:
+    """
+    Joins the entries with the delimiter, yielding the result in chunks of about chunk_size characters
+    """
+    buffer = [prefix]
+    buffer_len = len(prefix)
+    for index, entry in enumerate(entries):
+        if index:
+            buffer.append(delimiter)
+        buffer.append(entry)
+        buffer_len += len(entry)
+        if buffer_len >= chunk_size:
+            yield ''.join(buffer)
+            buffer = []
+            buffer_len = 0
+    buffer.append(suffix)
+    chunk = ''.join(buffer)
+    if chunk:
+        yield chunk
+
+
+def iter_proxysg_out_format(iocs: Iterable[dict], category_attribute: list, limit: int,
+                            category_default: str = 'bc_category') -> Iterator[str]:
+    """
+    Groups the URL IoCs by their ProxySG category into temporary files, and returns an iterator of the output.
+    The grouping is done before returning, so an error is raised if there are no URLs to export.
+    """
+    category_files = {}  # type:Dict
+    try:
+        count = 0
+        for indicator in iocs:
+            if count >= limit:
+                break
+            if indicator.get('indicator_type') in ['URL', 'Domain', 'DomainGlob'] and indicator.get('value'):
+                stripped_indicator = _PROTOCOL_REMOVAL.sub('', indicator.get('value'))
+                category = indicator.get('proxysgcategory')
+                # if a ProxySG Category is not set or does not exist in the category_attribute list
+                # add the indicator to the default category
+                if category is None or (category_attribute and category not in category_attribute):
+                    category = category_default
+
+                if category not in category_files:
+                    category_files[category] = tempfile.TemporaryFile(mode='w+')
+                category_files[category].write(stripped_indicator + '\n')
+                count += 1
+
+        if not category_files:
+            raise Exception(CTX_NO_URLS_IN_PROXYSG_FORMAT)
+
+    except Exception:
+        for category_file in category_files.values():
+            category_file.close()
+        raise
+
+    def iter_categories():
+        try:
+            for category, category_file in category_files.items():
+                category_file.seek(0)
+                yield f"define category {category}\n"
+                yield from iter(lambda: category_file.read(STREAM_CHUNK_SIZE), '')
+                yield "end\n"
+        finally:
+            for category_file in category_files.values():
+                category_file.close()
+
+    return iter_categories()
+
+
+def iter_outbound_values(iocs: Iterable[dict], request_args: RequestArguments) -> Iterator[str]:
+    """
+    Returns an iterator of the output of the IoCs in the selected format, without holding the whole output in memory
+    """
+    if request_args.out_format == FORMAT_PROXYSG:
+        return iter_proxysg_out_format(iocs, request_args.category_attribute, request_args.limit,
+                                       request_args.category_default)
+
+    iocs = iter(iocs)
+    first_ioc = next(iocs, None)
+    if first_ioc is None:
+        iocs = iter([])
+    else:
+        headers = list(first_ioc.keys())
+        iocs = chain([first_ioc], iocs)
+
+    entries = iter_formatted_entries(iocs, request_args)
+    if request_args.out_format in [FORMAT_JSON, FORMAT_XSOAR_JSON]:
+        return join_entries(entries, delimiter=', ', prefix='[', suffix=']')
+
+    if request_args.out_format == FORMAT_MWG:
+        mwg_type = request_args.mwg_type[0] if isinstance(request_args.mwg_type, list) else request_args.mwg_type
+        return join_entries(entries, prefix=f'type={mwg_type}\n')
+
+    if first_ioc is not None and request_args.out_format == FORMAT_XSOAR_CSV:  # add csv keys as first item
+        entries = chain([list_to_str(headers)], entries)
+
+    elif first_ioc is not None and request_args.out_format == FORMAT_CSV:
+        entries = chain(['indicator'], entries)
+
+    return join_entries(entries)
+
+
+def iter_outbound_response(request_args: RequestArguments, params: dict) -> Iterator[str]:
+    """
+    Returns an iterator of the exported list, paging through the indicators while it is consumed
+    """
+    iocs = iter_indicators(request_args.query, request_args.offset)
+    if request_args.sort_field:
+        # sorting applies to the indicators window of the request, as in refresh_outbound_context
+        iocs = external_sort_iocs(request_args, islice(iocs, request_args.limit))
+    values = iter_outbound_values(iocs, request_args)
+
+    prepend_str = append_str = ''
+    # if the case there are strings to add to the EDL, add them if the output type is text
+    if request_args.out_format == FORMAT_TEXT:
+        append_str = (params.get('append_string') or '').replace('\\n', '\n')
+        prepend_str = (params.get('prepend_string') or '').replace('\\n', '\n')
+
+    def iter_response():
+        if prepend_str:
+            yield f'{prepend_str}\n'
+        is_empty = True
+        for chunk in values:
+            is_empty = is_empty and not chunk
+            yield chunk
+        if is_empty:
+            yield 'No Results Found For the Query'
+        if append_str:
+            yield append_str
+
+    return iter_response()
+
+
 def get_outbound_mimetype() -> str:
     """Returns the mimetype of the export_iocs"""
     ctx = get_integration_context().get('last_output', {})
@@ -756,6 +1054,17 @@ def route_list_values() -> Response:
         created = datetime.now(timezone.utc)
         cache_refresh_rate = params.get('cache_refresh_rate')
 
+        if params.get('stream_response') and not params.get('on_demand'):
+            max_age = ceil((datetime.now() - dateparser.parse(cache_refresh_rate)).total_seconds())  # type: ignore
+            demisto.debug(f'Streaming exported indicators list, created: [{created}], max age: [{max_age}]')
+            resp = Response(stream_with_context(iter_outbound_response(request_args, params)), status=200,
+                            mimetype=get_mimetype(request_args), headers=[
+                                ('X-ExportIndicators-Created', created.isoformat()),
+                            ])
+            resp.cache_control.max_age = max_age
+            resp.cache_control['stale-if-error'] = '600'
+            return resp
+
         values = get_outbound_ioc_values(
             on_demand=params.get('on_demand'),
             last_update_data=get_integration_context(),
@@ -616,3 +616,138 @@ class TestHelperFunctions:
             debug_list = [call[0][0] for call in demisto.debug.call_args_list]
             assert 'ExportIndicators - Could not sort IoCs, please verify that you entered the correct field name.\n' \
                    'Field used: invalid_field_name' in debug_list
+
+    @pytest.mark.parametrize('out_format, collapse_ips', [
+        ('text', "Don't Collapse"), ('text', 'To CIDRs'), ('csv', 'To Ranges'), ('json', "Don't Collapse"),
+        ('json-seq', "Don't Collapse"), ('XSOAR json', "Don't Collapse"), ('XSOAR json-seq', "Don't Collapse"),
+        ('XSOAR csv', "Don't Collapse"), ('McAfee Web Gateway', "Don't Collapse"), ('PAN-OS URL', "Don't Collapse"),
+        ('Symantec ProxySG', "Don't Collapse"),
+    ])
+    def test_iter_outbound_values(self, out_format, collapse_ips):
+        """
+        Given
+            - IP and URL indicators
+        When
+            - Streaming the output in each of the formats
+        Then
+            - Ensure the streamed output is the same as the output built in memory
+        """
+        import copy
+        from ExportIndicators import iter_outbound_values, create_values_for_returned_dict, RequestArguments, \
+            CTX_VALUES_KEY
+        iocs = []
+        for file_name in ('demisto_iocs.json', 'demisto_url_iocs.json'):
+            with open(f'ExportIndicators_test/TestHelperFunctions/{file_name}', 'r') as iocs_json_f:
+                iocs.extend(json.loads(iocs_json_f.read()))
+        request_args = RequestArguments(query='', out_format=out_format, limit=len(iocs), collapse_ips=collapse_ips,
+                                        category_attribute='', strip_port=True)
+
+        returned_dict, _ = create_values_for_returned_dict(copy.deepcopy(iocs), request_args)
+        streamed_output = ''.join(iter_outbound_values(copy.deepcopy(iocs), request_args))
+        assert streamed_output == returned_dict[CTX_VALUES_KEY]
+
+    def test_iter_outbound_values_limit(self):
+        """
+        Given
+            - More indicators than the request limit
+        When
+            - Streaming the output in text format
+        Then
+            - Ensure only limit entries are streamed
+        """
+        from ExportIndicators import iter_outbound_values, RequestArguments
+        iocs = [{'value': f'{i}.com', 'indicator_type': 'Domain'} for i in range(10)]
+        request_args = RequestArguments(query='', out_format='text', limit=3)
+        assert ''.join(iter_outbound_values(iocs, request_args)) == '0.com\n1.com\n2.com'
+
+    @pytest.mark.parametrize('out_format, collapse_ips, limit, indicators_count', [
+        ('text', 'To CIDRS', 3, 30), ('text', 'To Ranges', 5, 30), ('csv', 'To CIDRS', 12, 30),
+        ('csv', 'To Ranges', 12, 30), ('text', "Don't Collapse", 5, 0), ('McAfee Web Gateway', "Don't Collapse", 5, 0),
+    ])
+    def test_iter_outbound_response_limit(self, mocker, out_format, collapse_ips, limit, indicators_count):
+        """
+        Given
+            - IP indicators which collapse to fewer ranges than the request limit, or no indicators
+        When
+            - Streaming the response
+        Then
+            - Ensure the limit applies to the collapsed ranges, and the response is the same as the one built in memory
+        """
+        import copy
+        import ExportIndicators as ei
+        from ExportIndicators import RequestArguments
+        iocs = [{'value': f'10.0.0.{i}', 'indicator_type': 'IP'} for i in range(20)] + \
+            [{'value': 'a.com', 'indicator_type': 'Domain'}] + \
+            [{'value': f'10.0.1.{i}', 'indicator_type': 'IP'} for i in range(0, 20, 2)]
+        iocs = iocs[:indicators_count]
+        mocker.patch.object(ei, 'find_indicators_with_limit',
+                            side_effect=lambda query, limit, offset: copy.deepcopy(iocs[offset:offset + limit]))
+        mocker.patch.object(ei, 'iter_indicators', side_effect=lambda query, offset=0: iter(copy.deepcopy(iocs[offset:])))
+        request_args = RequestArguments(query='', out_format=out_format, limit=limit, collapse_ips=collapse_ips)
+
+        values = ei.refresh_outbound_context(request_args) or 'No Results Found For the Query'
+        assert ''.join(ei.iter_outbound_response(request_args, {})) == values
+
+    def test_iter_formatted_entries_overlapping_ips(self, mocker):
+        """
+        Given
+            - IP indicators which collapse to one less range than the request limit
+            - Many more IP indicators covered by these ranges, followed by domain indicators
+        When
+            - Streaming the entries in text format
+        Then
+            - Ensure the covered IPs do not trigger collapsing the IPs again
+            - Ensure the limit applies to the collapsed ranges and the first domain
+        """
+        import ExportIndicators as ei
+        from ExportIndicators import RequestArguments
+        ranges_spy = mocker.spy(ei, 'ip_set_to_ranges')
+        iocs = [{'value': f'10.0.{i}.0/24', 'indicator_type': 'IP'} for i in range(0, 8, 2)] + \
+            [{'value': f'10.0.{i % 8 // 2 * 2}.{i % 256}', 'indicator_type': 'IP'} for i in range(5000)] + \
+            [{'value': f'{i}.com', 'indicator_type': 'Domain'} for i in range(3)]
+        request_args = RequestArguments(query='', out_format='text', limit=5, collapse_ips='To CIDRS')
+
+        entries = list(ei.iter_formatted_entries(iocs, request_args))
+
+        assert entries == ['0.com', '10.0.0.0/24', '10.0.2.0/24', '10.0.4.0/24', '10.0.6.0/24']
+        assert ranges_spy.call_count == 2
+
+    @pytest.mark.parametrize('sort_order', ['asc', 'desc', 'invalid_sort_order'])
+    def test_external_sort_iocs(self, sort_order):
+        """
+        Given
+            - More indicators than the sort chunk size
+        When
+            - Sorting the indicators with the external sort
+        Then
+            - Ensure the order is the same as sorting them in memory
+        """
+        from ExportIndicators import external_sort_iocs, sort_iocs, RequestArguments
+        with open('ExportIndicators_test/TestHelperFunctions/demisto_iocs.json', 'r') as iocs_json_f:
+            iocs_json = json.loads(iocs_json_f.read())
+        request_args = RequestArguments(query='', sort_field='lastSeen', sort_order=sort_order)
+        sorted_iocs = list(external_sort_iocs(request_args, iocs_json, chunk_size=5))
+        assert [ioc['value'] for ioc in sorted_iocs] == [ioc['value'] for ioc in sort_iocs(request_args, iocs_json)]
+
+    def test_route_list_values_streaming(self, mocker):
+        """
+        Given
+            - The Stream Responses parameter is set and the indicators are served over several pages
+        When
+            - Requesting the list
+        Then
+            - Ensure the list is streamed, and the search stops once the list size is reached
+        """
+        import ExportIndicators as ei
+        pages = [{'iocs': [{'value': f'{page}-{i}.com', 'indicator_type': 'Domain'} for i in range(2)]}
+                 for page in range(3)]
+        mocker.patch.object(ei, 'PREFETCH_PAGES', 0)
+        search_mock = mocker.patch.object(ei.IndicatorsSearcher, 'search_indicators_by_version', side_effect=pages)
+        mocker.patch.object(demisto, 'params', return_value={'stream_response': True, 'list_size': 3,
+                                                             'indicators_query': 'type:Domain', 'format': 'text',
+                                                             'cache_refresh_rate': '5 minutes'})
+        res = ei.APP.test_client().get('/')
+        assert res.status_code == 200
+        assert res.mimetype == 'text/plain'
+        assert res.data == b'0-0.com\n0-1.com\n1-0.com'
+        assert search_mock.call_count == 2
@@ -2,13 +2,16 @@ import demistomock as demisto
 from CommonServerPython import *
 from CommonServerUserPython import *
 
-from typing import Any, Tuple, Dict, List, Callable, Optional
+from typing import Any, Tuple, Dict, List, Callable, Optional, Generator
 import sqlalchemy
 import pymysql
 import traceback
 import hashlib
 import logging
-from sqlalchemy.sql import text
+import csv
+from datetime import date
+from decimal import Decimal
+from sqlalchemy.sql import text, select, column, literal_column, bindparam
 from sqlalchemy.engine.url import URL
 from urllib.parse import parse_qsl
 try:
@@ -23,6 +26,11 @@ pymysql.install_as_MySQLdb()
 
 GLOBAL_CACHE_ATTR = '_generic_sql_engine_cache'
 DEFAULT_POOL_TTL = 600
+STREAM_BATCH_SIZE = 1000
+DEFAULT_FETCH_LIMIT = 50
+MAX_SEEN_ROWS = 1000
+DEFAULT_FIRST_FETCH = '3 days'
+DATE_FORMAT = '%Y-%m-%dT%H:%M:%SZ'
 
 
 class Client:
@@ -147,6 +155,35 @@ class Client:
             headers = results[0].keys()
         return results, headers
 
+    def sql_query_stream_request(self, sql_query: Any, bind_vars: Any,
+                                 batch_size: int = STREAM_BATCH_SIZE) -> Tuple[List, Generator[List, None, None]]:
+        """Execute query in DB via engine, with a server-side cursor where the driver supports it
+        :param bind_vars: in case there are names and values - a bind_var dict, in case there are only values - list
+        :param sql_query: the SQL query, as a string or as an sqlalchemy statement
+        :param batch_size: the number of rows to fetch from the cursor at a time
+        :return: table headers, a generator of batches of rows which closes the cursor once exhausted or closed
+        """
+        if type(bind_vars) is dict and isinstance(sql_query, str):
+            sql_query = text(sql_query)
+
+        result = self.connection.execution_options(stream_results=True).execute(sql_query, bind_vars)
+        if not result.returns_rows:
+            # an action e.g - insert, delete, update
+            result.close()
+            return [], (rows for rows in ())
+        return list(result.keys()), self._iterate_batches(result, batch_size)
+
+    @staticmethod
+    def _iterate_batches(result: Any, batch_size: int) -> Generator[List, None, None]:
+        try:
+            while True:
+                rows = result.fetchmany(batch_size)
+                if not rows:
+                    return
+                yield rows
+        finally:
+            result.close()
+
 
 def generate_default_port_by_dialect(dialect: str) -> Optional[str]:
     """
@@ -203,12 +240,14 @@ def sql_query_execute(client: Client, args: dict, *_) -> Tuple[str, Dict[str, An
         bind_variables_names = args.get('bind_variables_names', "")
         bind_variables_values = args.get('bind_variables_values', "")
         bind_variables = generate_bind_vars(bind_variables_names, bind_variables_values)
+        if argToBoolean(args.get('stream_to_file', False)):
+            batch_size = arg_to_number(args.get('batch_size')) or STREAM_BATCH_SIZE
+            return sql_query_stream_to_file(client, sql_query, bind_variables, skip, limit,
+                                            args.get('file_format', 'csv'), batch_size)
 
         result, headers = client.sql_query_execute_request(sql_query, bind_variables)
         # converting an sqlalchemy object to a table
-        converted_table = [dict(row) for row in result]
-        # converting b'' and datetime objects to readable ones
-        table = [{str(key): str(value) for key, value in dictionary.items()} for dictionary in converted_table]
+        table = [convert_row(row) for row in result]
         table = table[skip:skip + limit]
         human_readable = tableToMarkdown(name="Query result:", t=table, headers=headers,
                                          removeNull=True)
@@ -229,6 +268,187 @@ def sql_query_execute(client: Client, args: dict, *_) -> Tuple[str, Dict[str, An
         raise err
 
 
+def convert_row(row: Any) -> Dict[str, str]:
+    """
+    Converts an sqlalchemy row to a dict, and b'' and datetime objects to readable ones
+    :param row: a row of a query result
+    :return: the row as a dict of strings
+    """
+    return {str(key): str(value) for key, value in dict(row).items()}
+
+
+def sql_query_stream_to_file(client: Client, sql_query: str, bind_variables: Any, skip: int, limit: int,
+                             file_format: str, batch_size: int) -> Tuple[str, Dict[str, Any], List[Dict[str, Any]]]:
+    """
+    Executes the sql query and writes the rows to a CSV or JSON lines file entry batch by batch, so the result is never
+    held in memory as a whole. Only the first `limit` rows are returned to the context.
+    :param client: the client object with the db connection
+    :param sql_query: the SQL query
+    :param bind_variables: the bind variables of the query
+    :param skip: the number of rows to skip
+    :param limit: the number of rows to return to the context
+    :param file_format: csv or jsonl
+    :param batch_size: the number of rows to fetch from the cursor at a time
+    :return: Demisto outputs
+    """
+    headers, batches = client.sql_query_stream_request(sql_query, bind_variables, batch_size)
+    if not headers:
+        return 'Command executed', {}, []
+
+    file_name = f'query_result.{file_format}'
+    temp_file_name = demisto.uniqueFile()
+    table: List[Dict[str, str]] = []
+    rows_count = 0
+    with open(demisto.investigation()['id'] + '_' + temp_file_name, 'w', newline='') as output_file:
+        csv_writer = None
+        if file_format == 'csv':
+            csv_writer = csv.DictWriter(output_file, fieldnames=[str(header) for header in headers])
+            csv_writer.writeheader()
+        for rows in batches:
+            for row in rows[max(skip - rows_count, 0):]:
+                converted_row = convert_row(row)
+                if csv_writer:
+                    csv_writer.writerow(converted_row)
+                else:
+                    output_file.write(json.dumps(converted_row) + '\n')
+                if len(table) < limit:
+                    table.append(converted_row)
+            rows_count += len(rows)
+
+    demisto.results({
+        'Contents': '',
+        'ContentsFormat': formats['text'],
+        'Type': entryTypes['file'],
+        'File': file_name,
+        'FileID': temp_file_name
+    })
+    written_rows = max(rows_count - skip, 0)
+    human_readable = tableToMarkdown(name=f'Query result ({len(table)} of {written_rows} rows, all rows are in '
+                                          f'{file_name}):', t=table, headers=headers, removeNull=True)
+    context = {
+        'Result': table,
+        'Query': sql_query,
+        'InstanceName': f'{client.dialect}_{client.dbname}'
+    }
+    entry_context: Dict = {'GenericSQL(val.Query && val.Query === obj.Query)': {'GenericSQL': context}}
+    return human_readable, entry_context, table
+
+
+def build_fetch_query(fetch_query: str, fetch_column: str, has_watermark: bool, include_watermark: bool,
+                      limit: int) -> Any:
+    """
+    Wraps the fetch query so that it returns the rows after the watermark, ordered by the fetch column, in a batch
+    of at most `limit` rows. sqlalchemy compiles the limit to the syntax of the dialect (LIMIT, TOP, ROWNUM).
+    :param fetch_query: the query of the rows to fetch as incidents
+    :param fetch_column: the ID or timestamp column the watermark is taken from
+    :param has_watermark: whether to filter by the watermark, False on the first fetch of an ID column
+    :param include_watermark: whether to return the rows whose value is the watermark, for timestamp columns which
+        several rows may share
+    :param limit: the maximal number of rows to return
+    :return: an sqlalchemy statement, with a `watermark` bind parameter
+    """
+    fetch_subquery = text(fetch_query).columns(column(fetch_column)).alias('fetch_query')
+    watermark_column = fetch_subquery.c[fetch_column]
+    query = select([literal_column('*')]).select_from(fetch_subquery)
+    if has_watermark:
+        # rows which share the timestamp of the watermark may not have been fetched yet
+        query = query.where(watermark_column >= bindparam('watermark') if include_watermark
+                            else watermark_column > bindparam('watermark'))
+    return query.order_by(watermark_column).limit(limit)
+
+
+def get_row_hash(row: Dict[str, str]) -> str:
+    return hashlib.sha256(json.dumps(row, sort_keys=True).encode('utf-8')).hexdigest()
+
+
+def serialize_watermark(value: Any) -> Any:
+    """
+    Converts a fetch column value to a JSON serializable watermark
+    :param value: the value of the fetch column, e.g. a datetime or date of a timestamp column or a Decimal ID
+    :return: ISO format for dates and times, an int or a string for decimals, otherwise the value itself
+    """
+    if isinstance(value, date):  # datetime included
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return int(value) if value == value.to_integral_value() else str(value)
+    return value
+
+
+def fetch_incidents(client: Client, params: dict, last_run: dict) -> Tuple[Dict[str, Any], List[Dict[str, Any]]]:
+    """
+    Fetches the rows of the fetch query which come after the watermark of the last run, in bounded batches.
+    The watermark is the value of the fetch column in the last fetched row. For timestamp columns, the rows which share
+    the timestamp of the watermark are remembered by their hash, so they are not fetched twice. At most MAX_SEEN_ROWS
+    rows are remembered: when more rows share the timestamp, the next fetch moves past it.
+    :param client: the client object with the db connection
+    :param params: the integration parameters
+    :param last_run: the last run object
+    :return: the next run object, incidents
+    """
+    fetch_query = params.get('fetch_query')
+    fetch_column = params.get('fetch_column')
+    if not fetch_query or not fetch_column:
+        raise ValueError('Fetch query and Fetch column must be set in order to fetch incidents.')
+    is_timestamp = params.get('fetch_column_type', 'ID') == 'Timestamp'
+    max_fetch = arg_to_number(params.get('max_fetch')) or DEFAULT_FETCH_LIMIT
+    incident_name_column = params.get('incident_name_column')
+
+    last_watermark = last_run.get('watermark')
+    seen_rows = set(last_run.get('seen_rows', []))
+    include_watermark = is_timestamp and not last_run.get('skip_watermark', False)
+    watermark: Any = last_watermark
+    if is_timestamp and watermark:
+        # the watermark of a DATE column is only YYYY-MM-DD
+        watermark = date.fromisoformat(watermark) if len(watermark) == 10 else datetime.fromisoformat(watermark)
+    elif is_timestamp:
+        watermark = arg_to_datetime(params.get('first_fetch') or DEFAULT_FIRST_FETCH, 'First fetch')
+    elif watermark is None:
+        watermark = params.get('first_fetch') or None
+    if isinstance(watermark, str) and watermark.lstrip('-').isdigit():
+        watermark = int(watermark)
+
+    query = build_fetch_query(fetch_query, fetch_column, watermark is not None, include_watermark,
+                              max_fetch + len(seen_rows))
+    _, batches = client.sql_query_stream_request(query, {'watermark': watermark}, max_fetch)
+    incidents: List[Dict[str, Any]] = []
+    next_watermark = last_watermark
+    try:
+        for rows in batches:
+            for row in rows:
+                converted_row = convert_row(row)
+                row_hash = get_row_hash(converted_row)
+                if include_watermark and row_hash in seen_rows:
+                    continue
+                value = row[fetch_column]
+                if serialize_watermark(value) != next_watermark:
+                    next_watermark = serialize_watermark(value)
+                    seen_rows = set()
+                seen_rows.add(row_hash)
+                incidents.append({
+                    'name': converted_row.get(incident_name_column) or f'Generic SQL {fetch_column} {value}',
+                    'occurred': value.strftime(DATE_FORMAT) if isinstance(value, datetime) else None,
+                    'rawJSON': json.dumps(converted_row)
+                })
+                if len(incidents) >= max_fetch:
+                    break
+            if len(incidents) >= max_fetch:
+                break
+    finally:
+        # a server-side cursor left open fails the next statement on the (possibly pooled) connection
+        batches.close()
+
+    # the watermark is still skipped as long as no row comes after it
+    skip_watermark = is_timestamp and not include_watermark and next_watermark == last_watermark
+    if is_timestamp and len(seen_rows) >= MAX_SEEN_ROWS:
+        demisto.info(f'{len(seen_rows)} rows were fetched with the {fetch_column} value {next_watermark}, '
+                     f'the next fetch skips the other rows with this value.')
+        skip_watermark = True
+        seen_rows = set()
+    next_run = {'watermark': next_watermark, 'seen_rows': list(seen_rows) if is_timestamp else [],
+                'skip_watermark': skip_watermark}
+    return next_run, incidents
+
+
 # list of loggers we should set to debug when running in debug_mode
 # taken from: https://docs.sqlalchemy.org/en/13/core/engines.html#configuring-logging
 SQL_LOGGERS = [
@@ -277,7 +497,11 @@ def main():
             'pgsql-query': sql_query_execute,
             'sql-command': sql_query_execute
         }
-        if command in commands:
+        if command == 'fetch-incidents':
+            next_run, incidents = fetch_incidents(client, params, demisto.getLastRun() or {})
+            demisto.setLastRun(next_run)
+            demisto.incidents(incidents)
+        elif command in commands:
             return_outputs(*commands[command](client, demisto.args(), command))
         else:
             raise NotImplementedError(f'{command} is not an existing Generic SQL command')
@@ -1,9 +1,13 @@
+import json
 import os
+from datetime import date, datetime, timedelta
+from decimal import Decimal
 
 import pytest
 import sqlalchemy
 
-from GenericSQL import Client, sql_query_execute, generate_default_port_by_dialect
+import demistomock as demisto
+from GenericSQL import Client, sql_query_execute, generate_default_port_by_dialect, fetch_incidents
 
 
 class ResultMock:
@@ -250,3 +254,150 @@ def test_mysql_integration():
      {'arg1': 'value1', 'arg2': 'value2', 'driver': 'ODBC Driver 17 for SQL Server'})])
 def test_parse_connect_parameters(connect_parameters, dialect, expected_response):
     assert Client.parse_connect_parameters(connect_parameters, dialect) == expected_response
+
+
+@pytest.fixture
+def sqlite_client(tmp_path):
+    db_path = str(tmp_path / 'audit.db')
+    with sqlalchemy.create_engine(f'sqlite:///{db_path}').connect() as connection:
+        connection.execute('create table audit (id integer primary key, created datetime, user text)')
+        for i in range(1, 8):
+            connection.execute('insert into audit (id, created, user) values (?, ?, ?)',
+                               (i, datetime(2021, 1, 1) + timedelta(minutes=i // 3), f'user{i}'))
+    client = Client('sqlite', None, None, None, None, db_path, '', False)
+    yield client
+    client.connection.close()
+
+
+@pytest.mark.parametrize('file_format, expected_file', [
+    ('csv', 'id,user\n3,user3\n4,user4\n5,user5\n6,user6\n7,user7\n'),
+    ('jsonl', ''.join(f'{{"id": "{i}", "user": "user{i}"}}\n' for i in range(3, 8))),
+])
+def test_sql_query_stream_to_file(sqlite_client, tmp_path, monkeypatch, mocker, file_format, expected_file):
+    """Unit test
+    Given
+    - select query with a bind variable, skip and limit
+    When
+    - streaming the result to a file in batches smaller than the result
+    Then
+    - the file contains all the rows after skip
+    - the context contains the first limit rows
+    """
+    monkeypatch.chdir(tmp_path)
+    mocker.patch.object(demisto, 'investigation', return_value={'id': '1'})
+    mocker.patch.object(demisto, 'uniqueFile', return_value='result')
+    file_entry = mocker.patch.object(demisto, 'results')
+    args = {'query': 'select id, user from audit where id > :min_id', 'bind_variables_names': 'min_id',
+            'bind_variables_values': '1', 'skip': '1', 'limit': '2', 'stream_to_file': 'true',
+            'file_format': file_format, 'batch_size': '2'}
+
+    _, context, table = sql_query_execute(sqlite_client, args)
+
+    assert file_entry.call_args[0][0]['File'] == f'query_result.{file_format}'
+    assert (tmp_path / '1_result').read_text() == expected_file
+    assert table == [{'id': '3', 'user': 'user3'}, {'id': '4', 'user': 'user4'}]
+    assert context['GenericSQL(val.Query && val.Query === obj.Query)']['GenericSQL']['Result'] == table
+
+
+@pytest.mark.parametrize('params', [
+    {'fetch_column': 'id', 'fetch_column_type': 'ID'},
+    {'fetch_column': 'created', 'fetch_column_type': 'Timestamp', 'first_fetch': '2020-12-31'},
+])
+def test_fetch_incidents_watermark(sqlite_client, params):
+    """Unit test
+    Given
+    - a fetch query over a table, with an ID column or a timestamp column which several rows share
+    When
+    - fetching incidents in batches smaller than the table
+    Then
+    - every row is fetched exactly once and the last fetch returns no incidents
+    """
+    params = dict(params, fetch_query='select * from audit', max_fetch='2', incident_name_column='user')
+    last_run: dict = {}
+    fetched = []
+    for _ in range(5):
+        last_run, incidents = fetch_incidents(sqlite_client, params, last_run)
+        assert len(incidents) <= 2
+        fetched.extend(incident['name'] for incident in incidents)
+
+    assert fetched == [f'user{i}' for i in range(1, 8)]
+    assert fetch_incidents(sqlite_client, params, last_run)[1] == []
+
+
+def test_fetch_incidents_max_seen_rows(sqlite_client, mocker):
+    """Unit test
+    Given
+    - a fetch query over a table with a timestamp column which more than MAX_SEEN_ROWS rows share
+    When
+    - fetching incidents
+    Then
+    - the remembered rows are capped and the next fetch moves past the shared timestamp
+    """
+    mocker.patch('GenericSQL.MAX_SEEN_ROWS', 2)
+    params = {'fetch_column': 'created', 'fetch_column_type': 'Timestamp', 'first_fetch': '2020-12-31',
+              'fetch_query': 'select * from audit', 'max_fetch': '2', 'incident_name_column': 'user'}
+    last_run: dict = {}
+    fetched = []
+    for _ in range(4):
+        last_run, incidents = fetch_incidents(sqlite_client, params, last_run)
+        assert len(last_run['seen_rows']) < 2
+        fetched.extend(incident['name'] for incident in incidents)
+
+    # user3 and user4 share their timestamp with user5, which is skipped as the cap is reached
+    assert fetched == ['user1', 'user2', 'user3', 'user4', 'user6', 'user7']
+    assert fetch_incidents(sqlite_client, params, last_run)[1] == []
+
+
+def test_fetch_incidents_closes_batches(sqlite_client, mocker):
+    """Unit test
+    Given
+    - a fetch query which returns more rows than the fetch limit
+    When
+    - fetching incidents
+    Then
+    - the result batches are closed, so the server-side cursor does not stay open on the connection
+    """
+    closed = []
+
+    def batches():
+        try:
+            yield [{'id': 1}, {'id': 2}]
+            yield [{'id': 3}]
+        finally:
+            closed.append(True)
+
+    mocker.patch.object(sqlite_client, 'sql_query_stream_request', return_value=(['id'], batches()))
+    params = {'fetch_column': 'id', 'fetch_query': 'select * from audit', 'max_fetch': '1'}
+
+    _, incidents = fetch_incidents(sqlite_client, params, {})
+
+    assert len(incidents) == 1
+    assert closed == [True]
+
+
+@pytest.mark.parametrize('fetch_column_type, value, expected_watermark, expected_bound_watermark', [
+    ('Timestamp', date(2021, 1, 2), '2021-01-02', date(2021, 1, 2)),
+    ('ID', Decimal('12'), 12, 12),
+    ('ID', Decimal('12.5'), '12.5', '12.5'),
+])
+def test_fetch_incidents_watermark_types(sqlite_client, mocker, fetch_column_type, value, expected_watermark,
+                                         expected_bound_watermark):
+    """Unit test
+    Given
+    - a fetch query over a DATE column, or a NUMERIC ID column returned as Decimal
+    When
+    - fetching incidents twice
+    Then
+    - the next run is JSON serializable and the next fetch binds the watermark as the column type
+    """
+    stream_mock = mocker.patch.object(sqlite_client, 'sql_query_stream_request',
+                                      side_effect=lambda *args: (['col'], (rows for rows in [[{'col': value}]])))
+    params = {'fetch_column': 'col', 'fetch_column_type': fetch_column_type, 'first_fetch': '2020-12-31',
+              'fetch_query': 'select * from audit'}
+
+    next_run, incidents = fetch_incidents(sqlite_client, params, {})
+    assert len(incidents) == 1
+    assert json.loads(json.dumps(next_run))['watermark'] == expected_watermark
+
+    fetch_incidents(sqlite_client, params, next_run)
+    assert stream_mock.call_args[0][1] == {'watermark': expected_bound_watermark}
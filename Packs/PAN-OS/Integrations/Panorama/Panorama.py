@@ -7,6 +7,8 @@ from datetime import datetime
 from typing import Dict, List, Any, Optional, Tuple, Union
 import uuid
 import json
+import time
+import hashlib
 import requests
 
 # disable insecure warnings
@@ -28,6 +30,21 @@ XPATH_OBJECTS = ''
 
 XPATH_RULEBASE = ''
 
+# a single session keeps the connection to the device open between API calls
+SESSION = requests.Session()
+
+# Config read cache, disabled when the TTL is 0
+CONFIG_CACHE_TTL = 0
+CONFIG_CACHE_KEY = 'config_cache'
+CONFIG_CACHE_MAX_ENTRIES = 100
+# larger responses, such as whole configuration trees, are not cached to keep the integration context small
+CONFIG_CACHE_MAX_RESPONSE_SIZE = 64 * 1024
+CONFIG_CACHE: Optional[Dict[str, Dict[str, Any]]] = None
+# config actions which only read the configuration, their responses can be cached
+CONFIG_READ_ACTIONS = ('get', 'show')
+# request types which may change the configuration, unless they only read it they invalidate the cache
+CONFIG_CHANGE_TYPES = ('config', 'commit', 'import')
+
 # Security rule arguments for output handling
 SECURITY_RULE_ARGS = {
     'rulename': 'Name',
@@ -84,30 +101,109 @@ class PAN_OS_Not_Found(Exception):
         pass
 
 
+def get_config_cache() -> Dict[str, Dict[str, Any]]:
+    """
+    Returns the config read cache, loading it from the integration context on first use
+    """
+    global CONFIG_CACHE
+    if CONFIG_CACHE is None:
+        CONFIG_CACHE = get_integration_context().get(CONFIG_CACHE_KEY, {})
+    return CONFIG_CACHE
+
+
+def get_config_cache_key(uri: str, request_params: dict) -> Optional[str]:
+    """
+    Returns the cache key of a config read request, or None if the request is not a config read
+    """
+    if request_params.get('type') != 'config' or request_params.get('action') not in CONFIG_READ_ACTIONS:
+        return None
+    cache_params = {param: value for param, value in request_params.items() if param != 'key'}
+    return hashlib.sha256((uri + json.dumps(cache_params, sort_keys=True)).encode('utf-8')).hexdigest()
+
+
+def get_cached_config_response(cache_key: str) -> Optional[str]:
+    entry = get_config_cache().get(cache_key)
+    if entry and entry['expires'] > time.time():
+        return entry['response']
+    return None
+
+
+def cache_config_response(cache_key: str, response: str):
+    """
+    Caches a converted config read response for CONFIG_CACHE_TTL seconds, keeping at most CONFIG_CACHE_MAX_ENTRIES.
+    The response is added to the cache currently stored in the integration context, so the entries which another
+    command cleared meanwhile are not restored.
+    """
+    global CONFIG_CACHE
+    if len(response) > CONFIG_CACHE_MAX_RESPONSE_SIZE:
+        return
+    now = time.time()
+    integration_context = get_integration_context()
+    config_cache = {key: entry for key, entry in integration_context.get(CONFIG_CACHE_KEY, {}).items()
+                    if entry['expires'] > now}
+    config_cache[cache_key] = {'expires': now + CONFIG_CACHE_TTL, 'response': response}
+    if len(config_cache) > CONFIG_CACHE_MAX_ENTRIES:
+        newest_keys = sorted(config_cache, key=lambda key: config_cache[key]['expires'])[-CONFIG_CACHE_MAX_ENTRIES:]
+        config_cache = {key: config_cache[key] for key in newest_keys}
+    CONFIG_CACHE = config_cache
+    integration_context[CONFIG_CACHE_KEY] = config_cache
+    set_integration_context(integration_context)
+
+
+def invalidate_config_cache():
+    """
+    Clears the config read cache, both of this command and of the integration context
+    """
+    global CONFIG_CACHE
+    CONFIG_CACHE = {}
+    integration_context = get_integration_context()
+    if integration_context.get(CONFIG_CACHE_KEY):
+        demisto.debug('Configuration may have changed, clearing the config read cache')
+        integration_context[CONFIG_CACHE_KEY] = {}
+        set_integration_context(integration_context)
+
+
 def http_request(uri: str, method: str, headers: dict = {},
                  body: dict = {}, params: dict = {}, files: dict = None, is_pcap: bool = False) -> Any:
     """
     Makes an API call with the given arguments
     """
-    result = requests.request(
-        method,
-        uri,
-        headers=headers,
-        data=body,
-        verify=USE_SSL,
-        params=params,
-        files=files
-    )
+    request_params = {**(params or {}), **(body or {})}
+    cache_key = get_config_cache_key(uri, request_params) if CONFIG_CACHE_TTL and not is_pcap else None
+    is_config_change = bool(CONFIG_CACHE_TTL and not cache_key and request_params.get('type') in CONFIG_CHANGE_TYPES)
+    if is_config_change:
+        invalidate_config_cache()
 
-    if result.status_code < 200 or result.status_code >= 300:
-        raise Exception(
-            'Request Failed. with status: ' + str(result.status_code) + '. Reason is: ' + str(result.reason))
+    cached_result = get_cached_config_response(cache_key) if cache_key else None
+    if cached_result is not None:
+        json_result = json.loads(cached_result)
+    else:
+        result = SESSION.request(
+            method,
+            uri,
+            headers=headers,
+            data=body,
+            verify=USE_SSL,
+            params=params,
+            files=files
+        )
+
+        if result.status_code < 200 or result.status_code >= 300:
+            raise Exception(
+                'Request Failed. with status: ' + str(result.status_code) + '. Reason is: ' + str(result.reason))
+
+        if is_config_change:
+            # a read which ran during the change might have cached the previous configuration
+            invalidate_config_cache()
 
-    # if pcap download
-    if is_pcap:
-        return result
+        # if pcap download
+        if is_pcap:
+            return result
 
-    json_result = json.loads(xml2json(result.text))
+        json_result = xml2dict(result.text)
+        # only successful reads are cached, so a missing object is looked up again on the next call
+        if cache_key and dict_safe_get(json_result, ['response', '@status']) == 'success':
+            cache_config_response(cache_key, json.dumps(json_result))
 
     # handle raw response that does not contain the response key, e.g configuration export
     if ('response' not in json_result or '@code' not in json_result['response']) and \
@@ -3123,7 +3219,7 @@ def panorama_list_pcaps_command(args: dict):
         params['target'] = serial_number
 
     result = http_request(URL, 'GET', params=params, is_pcap=True)
-    json_result = json.loads(xml2json(result.text))['response']
+    json_result = xml2dict(result.text)['response']
     if json_result['@status'] != 'success':
         raise Exception('Request to get list of Pcaps Failed.\nStatus code: ' + str(
             json_result['response']['@code']) + '\nWith message: ' + str(json_result['response']['msg']['line']))
@@ -6900,7 +6996,7 @@ def list_configured_user_id_agents_command(args):
 
 def initialize_instance(args: Dict[str, str], params: Dict[str, str]):
     global URL, API_KEY, USE_SSL, USE_URL_FILTERING, VSYS, DEVICE_GROUP, XPATH_SECURITY_RULES, XPATH_OBJECTS, \
-        XPATH_RULEBASE, TEMPLATE, PRE_POST
+        XPATH_RULEBASE, TEMPLATE, PRE_POST, CONFIG_CACHE_TTL
     if not params.get('port'):
         raise DemistoException('Set a port for the instance')
 
@@ -6909,6 +7005,7 @@ def initialize_instance(args: Dict[str, str], params: Dict[str, str]):
     USE_SSL = not params.get('insecure')
     USE_URL_FILTERING = params.get('use_url_filtering')
     TEMPLATE = params.get('template')
+    CONFIG_CACHE_TTL = arg_to_number(params.get('config_cache_ttl'), 'config_cache_ttl') or 0
 
     # determine a vsys or a device-group
     VSYS = params.get('vsys', '')
@@ -1,5 +1,6 @@
 import pytest
 import demistomock as demisto
+import time
 from CommonServerPython import DemistoException
 
 integration_params = {
@@ -352,3 +353,73 @@ def test_prettify_configured_user_id_agents__single_result():
                 'CollectorName': 'demisto', 'Secret': 'secret', 'EnableHipCollection': 'no', 'SerialNumber': None,
                 'IpUserMapping': 'yes', 'Disabled': 'no'}
     assert response == expected
+
+
+def test_http_request_config_cache(mocker, requests_mock):
+    """
+    Given:
+        - the config read cache enabled
+    When:
+        - reading the same configuration twice, then editing it and reading it again
+    Then:
+        - the second read is returned from the cache and the edit clears it
+    """
+    import Panorama
+    integration_context = {}
+    mocker.patch.object(Panorama, 'get_integration_context', side_effect=lambda: integration_context)
+    mocker.patch.object(Panorama, 'set_integration_context', side_effect=integration_context.update)
+    mocker.patch.object(Panorama, 'CONFIG_CACHE_TTL', 60)
+    mocker.patch.object(Panorama, 'CONFIG_CACHE', None)
+    read_mock = requests_mock.get('https://1.1.1.1:443/api/', text='<response status="success" code="19"><result>'
+                                                                   '<entry name="a"/></result></response>')
+    edit_mock = requests_mock.post('https://1.1.1.1:443/api/', text='<response status="success" code="20">'
+                                                                    '<msg>command succeeded</msg></response>')
+    read_params = {'type': 'config', 'action': 'get', 'xpath': '/config/shared/address', 'key': 'key'}
+
+    first_read = Panorama.http_request('https://1.1.1.1:443/api/', 'GET', params=read_params)
+    second_read = Panorama.http_request('https://1.1.1.1:443/api/', 'GET', params=dict(read_params, key='other'))
+    assert first_read == second_read
+    assert read_mock.call_count == 1
+
+    Panorama.http_request('https://1.1.1.1:443/api/', 'POST', body={'type': 'config', 'action': 'edit', 'key': 'key'})
+    assert edit_mock.call_count == 1
+    assert integration_context[Panorama.CONFIG_CACHE_KEY] == {}
+
+    Panorama.http_request('https://1.1.1.1:443/api/', 'GET', params=read_params)
+    assert read_mock.call_count == 2
+
+
+def test_config_cache_concurrent_commands(mocker, requests_mock):
+    """
+    Given:
+        - the config read cache enabled, and other commands of the instance running at the same time
+    When:
+        - another command clears the cache while this command caches a read
+        - another command caches a read of the previous configuration while this command edits it
+        - reading a large configuration
+    Then:
+        - the cleared entries are not restored, the edit clears the cache after it is done, and the large response
+          is not cached
+    """
+    import Panorama
+    integration_context = {}
+    mocker.patch.object(Panorama, 'get_integration_context', side_effect=lambda: dict(integration_context))
+    mocker.patch.object(Panorama, 'set_integration_context', side_effect=integration_context.update)
+    mocker.patch.object(Panorama, 'CONFIG_CACHE_TTL', 60)
+    mocker.patch.object(Panorama, 'CONFIG_CACHE', {'stale': {'expires': time.time() + 60, 'response': '{}'}})
+    requests_mock.get('https://1.1.1.1:443/api/', text='<response status="success"><result/></response>')
+
+    Panorama.http_request('https://1.1.1.1:443/api/', 'GET', params={'type': 'config', 'action': 'get', 'xpath': 'a'})
+    assert 'stale' not in integration_context[Panorama.CONFIG_CACHE_KEY]
+
+    def edit_callback(request, context):
+        integration_context[Panorama.CONFIG_CACHE_KEY] = {'previous': {'expires': time.time() + 60, 'response': '{}'}}
+        return '<response status="success"><msg>command succeeded</msg></response>'
+
+    requests_mock.post('https://1.1.1.1:443/api/', text=edit_callback)
+    Panorama.http_request('https://1.1.1.1:443/api/', 'POST', body={'type': 'config', 'action': 'edit'})
+    assert integration_context[Panorama.CONFIG_CACHE_KEY] == {}
+
+    mocker.patch.object(Panorama, 'CONFIG_CACHE_MAX_RESPONSE_SIZE', 10)
+    Panorama.http_request('https://1.1.1.1:443/api/', 'GET', params={'type': 'config', 'action': 'show'})
+    assert integration_context[Panorama.CONFIG_CACHE_KEY] == {}
@@ -3,8 +3,15 @@ from CommonServerPython import *
 
 import pyshark
 import re
-from typing import Dict, Any
+from typing import Dict, Any, Optional
 import traceback
+import mmap
+import multiprocessing
+import os
+import queue
+import socket
+import struct
+from email.parser import BytesHeaderParser
 
 
 '''GLOBAL VARS'''
@@ -22,6 +29,33 @@ MESSAGE_CODE = r'Message Code: (.+)'
 RESPONSE_CODE = r'Response code: (.+)'
 ALL_SUPPORTED_PROTOCOLS = ['HTTP', 'DNS', 'LLMNR', 'SYSLOG', 'SMTP', 'NETBIOS', 'ICMP', 'KERBEROS',
                            'TELNET', 'SSH', 'IRC', 'FTP', 'SMB2']
+NATIVE_SUPPORTED_PROTOCOLS = ['HTTP', 'DNS', 'SMTP']
+NATIVE_CHUNK_SIZE = 128 * 1024 * 1024
+# seconds between the checks that the native engine workers are still running
+NATIVE_WORKER_POLL_INTERVAL = 5
+PCAP_MAGIC = {
+    b'\xd4\xc3\xb2\xa1': ('<', 10 ** 6),
+    b'\xa1\xb2\xc3\xd4': ('>', 10 ** 6),
+    b'\x4d\x3c\xb2\xa1': ('<', 10 ** 9),
+    b'\xa1\xb2\x3c\x4d': ('>', 10 ** 9),
+}
+PCAPNG_SECTION_HEADER = 0x0A0D0D0A
+PCAPNG_BYTE_ORDER_MAGIC = b'\x4d\x3c\x2b\x1a'
+LINKTYPE_NULL = 0
+LINKTYPE_ETHERNET = 1
+LINKTYPE_LINUX_SLL = 113
+LINKTYPE_RAW = (12, 14, 101, 228, 229)
+NATIVE_LINKTYPES = (LINKTYPE_NULL, LINKTYPE_ETHERNET, LINKTYPE_LINUX_SLL) + LINKTYPE_RAW
+PPP_TO_ETHER_TYPE = {0x0021: 0x0800, 0x0057: 0x86DD}
+SMTP_PORTS = (25, 587)
+SMTP_HEADERS_MAX_SIZE = 64 * 1024
+HTTP_REQUEST_PREFIXES = (b'GET ', b'POST ', b'HEAD ', b'PUT ', b'DELETE ', b'OPTIONS ', b'PATCH ', b'CONNECT ',
+                         b'TRACE ')
+PORT_TO_LAYER = {21: 'FTP', 22: 'SSH', 23: 'TELNET', 25: 'SMTP', 53: 'DNS', 67: 'DHCP', 68: 'DHCP', 88: 'KERBEROS',
+                 123: 'NTP', 137: 'NBNS', 138: 'NBDGM', 161: 'SNMP', 162: 'SNMP', 443: 'TLS', 514: 'SYSLOG',
+                 587: 'SMTP', 1900: 'SSDP', 5353: 'MDNS', 5355: 'LLMNR'}
+DNS_TYPES = {1: 'A', 2: 'NS', 5: 'CNAME', 6: 'SOA', 12: 'PTR', 15: 'MX', 16: 'TXT', 28: 'AAAA', 33: 'SRV',
+             65: 'HTTPS', 255: 'ANY'}
 
 
 class PCAP():
@@ -564,6 +598,96 @@ class PCAP():
             if cap:
                 cap.close()
 
+    @logger
+    def mine_native(self, file_path: str, is_flows: bool, is_reg_extract: bool, workers: Optional[int] = None) -> None:
+        """
+        Mines the PCAP without tshark. Only the layers needed for the statistics, the flows and the protocols in
+        `NATIVE_SUPPORTED_PROTOCOLS` are decoded. Large captures are split between worker processes.
+
+        Args:
+            file_path: The PCAP's file path.
+            is_flows: Whether to extract flows.
+            is_reg_extract: Whether to extract regexes from the PCAP.
+            workers: The number of worker processes. Chosen according to the file size if not given.
+        """
+        with open(file_path, 'rb') as capture_file:
+            file_size = os.fstat(capture_file.fileno()).st_size
+            if not file_size:
+                raise CaptureFormatError('The file is empty.')
+            with mmap.mmap(capture_file.fileno(), 0, access=mmap.ACCESS_READ) as buf:
+                reader = CaptureReader.from_buffer(buf)
+                if not workers:
+                    workers = min(os.cpu_count() or 1, -(-file_size // NATIVE_CHUNK_SIZE))
+                chunks = reader.split(-(-file_size // workers)) if workers > 1 else [reader.snapshot()]
+
+        options = (self.entry_id, self.extracted_protocols, is_flows, is_reg_extract, self.homemade_regex)
+        if len(chunks) == 1:
+            results = [mine_native_chunk(file_path, chunks[0], options)]
+        else:
+            results = mine_native_chunks(file_path, chunks, options)
+
+        tcp_streams: set = set()
+        udp_streams: set = set()
+        http_requests: Dict[tuple, list] = {}
+        for result in results:
+            tcp_streams.update(result['tcp_streams'])
+            udp_streams.update(result['udp_streams'])
+            self.merge_native_results(result, http_requests)
+        self.tcp_streams = len(tcp_streams)
+        self.udp_streams = len(udp_streams)
+
+    def merge_native_results(self, results: dict, http_requests: dict) -> None:
+        """
+        Merges the results of a NativeMiner into the PCAP. Results must be merged in the order of the capture.
+
+        Args:
+            results: The results of a NativeMiner, as returned by `NativeMiner.results`.
+            http_requests: The frame numbers of unanswered HTTP requests by connection, shared between chunks.
+        """
+        for layers, count in results['hierarchy'].items():
+            self.hierarchy[layers] = self.hierarchy.get(layers, 0) + count
+        self.last_layer.update(results['last_layer'])
+        self.num_of_packets += results['num_of_packets']
+        self.bytes_transmitted += results['bytes_transmitted']
+        self.last_packet = max(self.last_packet, results['last_packet'])
+        self.min_time = min(self.min_time, results['min_time'])
+        self.max_time = max(self.max_time, results['max_time'])
+        self.unique_source_ip.update(results['unique_source_ip'])
+        self.unique_dest_ip.update(results['unique_dest_ip'])
+        self.ips_extracted.update(results['ips_extracted'])
+        self.urls_extracted.update(results['urls_extracted'])
+        self.emails_extracted.update(results['emails_extracted'])
+        self.homemade_extracted.update(results['homemade_extracted'])
+
+        for (a, b), count in results['conversations'].items():
+            if (b, a) in self.conversations:
+                a, b = b, a
+            self.conversations[(a, b)] = self.conversations.get((a, b), 0) + count
+
+        for (a, src_port, b, dest_port), data in results['flows'].items():
+            if (b, dest_port, a, src_port) in self.flows:
+                b, a, src_port, dest_port = a, b, dest_port, src_port
+            flow_data = self.flows.setdefault((a, src_port, b, dest_port), {'EntryID': self.entry_id,
+                                                                            'Transport': data['Transport'],
+                                                                            'min_time': float('inf'),
+                                                                            'max_time': -float('inf'),
+                                                                            'bytes': 0,
+                                                                            'counter': 0})
+            flow_data['min_time'] = min(flow_data['min_time'], data['min_time'])
+            flow_data['max_time'] = max(flow_data['max_time'], data['max_time'])
+            flow_data['bytes'] += data['bytes']
+            flow_data['counter'] += data['counter']
+
+        for protocol, data, next_id, connection, is_response in results['events']:
+            if protocol == 'HTTP':
+                # a response is linked to the oldest unanswered request of its connection, like http.request_in
+                pending_requests = http_requests.setdefault(connection, [])
+                if not is_response:
+                    pending_requests.append(data['ID'])
+                elif pending_requests:
+                    data['ID'] = pending_requests.pop(0)
+            add_to_data(self.protocol_data[protocol], data, next_id)
+
 
 '''HELPER FUNCTIONS'''
 
@@ -682,7 +806,6 @@ def flows_to_ec(flows: dict) -> list:
     return flows_ec
 
 
-@logger
 def add_to_data(d: dict, data: dict, next_id: int = None) -> None:
     """
     updates dictionary d to include/update the data. Also removes None values.
@@ -720,6 +843,683 @@ def add_to_data(d: dict, data: dict, next_id: int = None) -> None:
                 d[data_id].update(assign_params(**data))
 
 
+'''NATIVE ENGINE'''
+
+
+class CaptureFormatError(Exception):
+    """Raised when a capture can't be read by the native engine."""
+
+
+class CaptureReader():
+    def __init__(self, buf, offset: int, end: int, capture_format: str, endian: str, interfaces: list,
+                 frame: int = 0, timestamp: float = 0.0):
+        """
+        Reads the packets of a pcap/pcapng file without copying more than a packet at a time.
+
+        Args:
+            buf: The memory-mapped capture file.
+            offset: The offset of the first record/block to read.
+            end: The offset to stop reading at.
+            capture_format: 'pcap' or 'pcapng'.
+            endian: The struct byte order of the file (or of the current pcapng section).
+            interfaces: A (link type, timestamp units per second) tuple for each interface of the current section.
+            frame: The number of packets before offset.
+            timestamp: The timestamp of the last packet before offset, used for packets without a timestamp.
+        """
+        self.buf = buf
+        self.offset = offset
+        self.end = end
+        self.capture_format = capture_format
+        self.endian = endian
+        self.interfaces = interfaces
+        self.frame = frame
+        self.timestamp = timestamp
+
+    @classmethod
+    def from_buffer(cls, buf):
+        """
+        Creates a reader for the capture in buf.
+
+        Raises:
+            CaptureFormatError: If the file is not a pcap/pcapng file or its link type can't be decoded.
+        """
+        magic = bytes(buf[:4])
+        if magic in PCAP_MAGIC and len(buf) >= 24:
+            endian, units = PCAP_MAGIC[magic]
+            link_type = struct.unpack_from(endian + 'I', buf, 20)[0] & 0x0FFFFFFF
+            reader = cls(buf, 24, len(buf), 'pcap', endian, [(link_type, units)])
+        elif len(buf) >= 12 and struct.unpack_from('<I', buf)[0] == PCAPNG_SECTION_HEADER:
+            reader = cls(buf, 0, len(buf), 'pcapng', '<', [])
+        else:
+            raise CaptureFormatError('The file is not a pcap or pcapng file.')
+
+        for link_type, _, _, _ in cls(buf, **reader.snapshot()).packets():
+            if link_type not in NATIVE_LINKTYPES:
+                raise CaptureFormatError(f'Link type {link_type} is not supported.')
+            break
+        return reader
+
+    def snapshot(self) -> dict:
+        """Returns the reading state, from which a new reader can continue with `CaptureReader(buf, **state)`."""
+        return {
+            'offset': self.offset,
+            'end': self.end,
+            'capture_format': self.capture_format,
+            'endian': self.endian,
+            'interfaces': list(self.interfaces),
+            'frame': self.frame,
+            'timestamp': self.timestamp
+        }
+
+    def split(self, chunk_size: int) -> list:
+        """
+        Splits the capture into chunks of about chunk_size bytes. Record boundaries can only be found by walking the
+        record headers, so this reads the headers of the whole capture (but decodes nothing).
+
+        Returns:
+            A list of reading states, one for each chunk.
+        """
+        chunks = []
+        chunk = self.snapshot()
+        for _ in self.packets():
+            if self.offset - chunk['offset'] >= chunk_size and self.offset < self.end:
+                chunk['end'] = self.offset
+                chunks.append(chunk)
+                chunk = self.snapshot()
+        chunks.append(chunk)
+        return chunks
+
+    def packets(self):
+        """Yields a (link type, timestamp, original length, captured bytes) tuple for each packet."""
+        if self.capture_format == 'pcap':
+            return self.pcap_packets()
+        return self.pcapng_packets()
+
+    def pcap_packets(self):
+        buf = self.buf
+        record_header = struct.Struct(self.endian + 'IIII')
+        link_type, units = self.interfaces[0]
+        while self.offset + 16 <= self.end:
+            seconds, fraction, captured_length, original_length = record_header.unpack_from(buf, self.offset)
+            start = self.offset + 16
+            if start + captured_length > len(buf):
+                # the capture was cut in the middle of a packet
+                return
+            self.offset = start + captured_length
+            self.frame += 1
+            self.timestamp = seconds + fraction / units
+            yield link_type, self.timestamp, original_length, buf[start:self.offset]
+
+    def pcapng_packets(self):
+        buf = self.buf
+        while self.offset + 12 <= self.end:
+            offset = self.offset
+            block_type, block_length = struct.unpack_from(self.endian + 'II', buf, offset)
+            if block_type == PCAPNG_SECTION_HEADER:
+                self.endian = '<' if buf[offset + 8:offset + 12] == PCAPNG_BYTE_ORDER_MAGIC else '>'
+                block_length = struct.unpack_from(self.endian + 'I', buf, offset + 4)[0]
+                self.interfaces = []
+            if block_length < 12 or offset + block_length > len(buf):
+                # the capture was cut in the middle of a block
+                return
+            self.offset = offset + block_length
+
+            if block_type == 1:  # interface description block
+                self.interfaces.append(self.read_interface(offset, block_length))
+            elif block_type in (2, 6):  # (obsolete) packet block and enhanced packet block
+                if block_type == 6:
+                    interface_id, high, low, captured_length, original_length = struct.unpack_from(
+                        self.endian + 'IIIII', buf, offset + 8)
+                else:
+                    interface_id, _, high, low, captured_length, original_length = struct.unpack_from(
+                        self.endian + 'HHIIII', buf, offset + 8)
+                if interface_id >= len(self.interfaces):
+                    raise CaptureFormatError(f'Packet of an undefined interface at offset {offset}.')
+                link_type, units = self.interfaces[interface_id]
+                self.frame += 1
+                self.timestamp = ((high << 32) | low) / units
+                yield link_type, self.timestamp, original_length, buf[offset + 28:offset + 28 + captured_length]
+            elif block_type == 3:  # simple packet block
+                if not self.interfaces:
+                    raise CaptureFormatError(f'Packet of an undefined interface at offset {offset}.')
+                original_length = struct.unpack_from(self.endian + 'I', buf, offset + 8)[0]
+                captured_length = min(original_length, block_length - 16)
+                self.frame += 1
+                yield self.interfaces[0][0], self.timestamp, original_length, buf[offset + 12:offset + 12 + captured_length]
+
+    def read_interface(self, offset: int, block_length: int) -> tuple:
+        link_type = struct.unpack_from(self.endian + 'H', self.buf, offset + 8)[0]
+        units = 10 ** 6
+        option_offset = offset + 16
+        while option_offset + 4 <= offset + block_length - 4:
+            code, length = struct.unpack_from(self.endian + 'HH', self.buf, option_offset)
+            if code == 0:
+                break
+            if code == 9 and length == 1:  # if_tsresol
+                resolution = self.buf[option_offset + 4]
+                units = 2 ** (resolution & 0x7F) if resolution & 0x80 else 10 ** resolution
+            option_offset += 4 + length + (-length % 4)
+        return link_type, units
+
+
+class NativePacket():
+    """The layers of a packet decoded by the native engine."""
+    __slots__ = ('layers', 'src', 'dst', 'transport', 'src_port', 'dest_port', 'seq', 'payload')
+
+    def __init__(self):
+        self.layers: list = []
+        self.src: Optional[str] = None
+        self.dst: Optional[str] = None
+        self.transport: Optional[str] = None
+        self.src_port = 0
+        self.dest_port = 0
+        self.seq = 0
+        self.payload = b''
+
+
+def decode_frame(link_type: int, frame: bytes) -> NativePacket:
+    """
+    Decodes the link, network and transport layers of a frame. The application layer is only named.
+
+    Args:
+        link_type: The link type of the interface the frame was captured on.
+        frame: The captured bytes.
+
+    Returns:
+        The decoded packet. Malformed and truncated packets keep the layers decoded before the error.
+    """
+    packet = NativePacket()
+    try:
+        if link_type == LINKTYPE_ETHERNET:
+            packet.layers.append('ETH')
+            ether_type = struct.unpack_from('!H', frame, 12)[0]
+            offset = 14
+            while ether_type in (0x8100, 0x88A8):
+                packet.layers.append('VLAN')
+                ether_type = struct.unpack_from('!H', frame, offset + 2)[0]
+                offset += 4
+            if ether_type == 0x8864:
+                packet.layers.extend(('PPPOES', 'PPP'))
+                ether_type = PPP_TO_ETHER_TYPE.get(struct.unpack_from('!H', frame, offset + 6)[0])
+                offset += 8
+        elif link_type == LINKTYPE_LINUX_SLL:
+            packet.layers.append('SLL')
+            ether_type = struct.unpack_from('!H', frame, 14)[0]
+            offset = 16
+        elif link_type == LINKTYPE_NULL:
+            packet.layers.append('NULL')
+            # the address family is in the byte order of the capturing host and AF_INET is 2 everywhere
+            ether_type = 0x0800 if 2 in (frame[0], frame[3]) else 0x86DD
+            offset = 4
+        elif link_type in LINKTYPE_RAW:
+            ether_type = 0x0800 if frame[0] >> 4 == 4 else 0x86DD
+            offset = 0
+        else:
+            ether_type = None
+        if ether_type is not None:
+            decode_network_layer(packet, ether_type, frame, offset)
+    except (struct.error, IndexError, ValueError, OSError):
+        pass
+    if not packet.layers:
+        packet.layers.append('DATA')
+    return packet
+
+
+def decode_network_layer(packet: NativePacket, ether_type: int, frame: bytes, offset: int) -> None:
+    if ether_type == 0x0800:
+        packet.layers.append('IP')
+        total_length = struct.unpack_from('!H', frame, offset + 2)[0]
+        fragment_offset = struct.unpack_from('!H', frame, offset + 6)[0] & 0x1FFF
+        protocol = None if fragment_offset else frame[offset + 9]
+        packet.src = socket.inet_ntoa(frame[offset + 12:offset + 16])
+        packet.dst = socket.inet_ntoa(frame[offset + 16:offset + 20])
+        # the total length is 0 for packets captured before TCP segmentation offload
+        end = offset + total_length if total_length else len(frame)
+        offset += (frame[offset] & 0x0F) * 4
+    elif ether_type == 0x86DD:
+        packet.layers.append('IPV6')
+        payload_length, protocol = struct.unpack_from('!HB', frame, offset + 4)
+        packet.src = socket.inet_ntop(socket.AF_INET6, frame[offset + 8:offset + 24])
+        packet.dst = socket.inet_ntop(socket.AF_INET6, frame[offset + 24:offset + 40])
+        end = offset + 40 + payload_length if payload_length else len(frame)
+        offset += 40
+        while protocol in (0, 43, 60):  # hop-by-hop, routing and destination options headers
+            protocol, offset = frame[offset], offset + (frame[offset + 1] + 1) * 8
+        if protocol == 44:  # fragments are not reassembled
+            protocol = None
+    elif ether_type == 0x0806:
+        packet.layers.append('ARP')
+        return
+    else:
+        packet.layers.append('LLC' if ether_type < 0x0600 else 'DATA')
+        return
+    decode_transport_layer(packet, protocol, frame[offset:end])
+
+
+def decode_transport_layer(packet: NativePacket, protocol: Optional[int], segment: bytes) -> None:
+    if protocol == 6:
+        packet.layers.append('TCP')
+        packet.transport = 'TCP'
+        packet.src_port, packet.dest_port, packet.seq = struct.unpack_from('!HHI', segment)
+        packet.payload = segment[(segment[12] >> 4) * 4:]
+    elif protocol == 17:
+        packet.layers.append('UDP')
+        packet.transport = 'UDP'
+        packet.src_port, packet.dest_port = struct.unpack_from('!HH', segment)
+        packet.payload = segment[8:]
+    elif protocol == 1:
+        packet.layers.append('ICMP')
+    elif protocol == 58:
+        packet.layers.append('ICMPV6')
+    elif protocol == 2:
+        packet.layers.append('IGMP')
+    elif segment:
+        packet.layers.append('DATA')
+    if packet.payload:
+        packet.layers.append(get_application_layer(packet))
+
+
+def get_application_layer(packet: NativePacket) -> str:
+    """
+    Names the application layer of a packet by its content for HTTP and by its well-known port for other protocols,
+    as tshark does for packets that don't need reassembly.
+    """
+    if packet.transport == 'TCP' and packet.payload.startswith(HTTP_REQUEST_PREFIXES + (b'HTTP/1.',)):
+        return 'HTTP'
+    for port in sorted((packet.src_port, packet.dest_port)):
+        if port in PORT_TO_LAYER:
+            return PORT_TO_LAYER[port]
+    return 'DATA'
+
+
+def get_connection_key(packet: NativePacket) -> tuple:
+    """Returns the same key for both directions of a connection."""
+    a, b = (packet.src, packet.src_port), (packet.dst, packet.dest_port)
+    return (a, b) if a <= b else (b, a)
+
+
+def read_dns_name(message: bytes, offset: int) -> tuple:
+    """
+    Reads a (possibly compressed) domain name from a DNS message.
+
+    Returns:
+        The name and the offset right after it in the message.
+    """
+    labels = []
+    end = None
+    for _ in range(128):
+        length = message[offset]
+        if length & 0xC0 == 0xC0:
+            if end is None:
+                end = offset + 2
+            offset = struct.unpack_from('!H', message, offset)[0] & 0x3FFF
+            continue
+        if not length:
+            break
+        labels.append(message[offset + 1:offset + 1 + length].decode('latin-1'))
+        offset += 1 + length
+    return '.'.join(labels), offset + 1 if end is None else end
+
+
+def parse_dns(message: bytes) -> Optional[dict]:
+    """
+    Parses the fields PcapMiner extracts from a DNS message.
+
+    Returns:
+        The ID, the first question name and type and the first A record of the answers. None for malformed messages.
+    """
+    try:
+        dns_id, _, questions, answers = struct.unpack_from('!HHHH', message)
+        offset = 12
+        name = query_type = response = None
+        for i in range(questions):
+            question_name, offset = read_dns_name(message, offset)
+            if not i:
+                name = question_name
+                query_type = struct.unpack_from('!H', message, offset)[0]
+            offset += 4
+        for _ in range(answers):
+            _, offset = read_dns_name(message, offset)
+            record_type, _, _, data_length = struct.unpack_from('!HHIH', message, offset)
+            offset += 10
+            if record_type == 1 and data_length == 4:
+                response = socket.inet_ntoa(message[offset:offset + 4])
+                break
+            offset += data_length
+    except (struct.error, IndexError):
+        return None
+    return {
+        'ID': f'0x{dns_id:04x}',
+        'Request': name,
+        'Response': response,
+        'Type': None if query_type is None else f'{DNS_TYPES.get(query_type, "Unknown")} ({query_type})'
+    }
+
+
+class NativeMiner():
+    def __init__(self, entry_id: str, extracted_protocols: list, is_flows: bool, is_reg_extract: bool,
+                 homemade_regex: str):
+        """
+        Mines a chunk of a capture with the native engine. Protocol data is collected as ordered events of
+        (protocol, data, next_id, connection, is_response) since requests, responses and SMTP sessions may span
+        several chunks. The results are merged into a PCAP with `PCAP.merge_native_results`.
+
+        Args:
+            entry_id: The entry ID of the PCAP.
+            extracted_protocols: A list of protocols to extract, out of NATIVE_SUPPORTED_PROTOCOLS.
+            is_flows: Whether to extract flows.
+            is_reg_extract: Whether to extract regular expressions from the PCAP. URL, IP, Email
+            homemade_regex: A regex to extract from the PCAP
+        """
+        self.entry_id = entry_id
+        self.extracted_protocols = extracted_protocols
+        self.is_flows = is_flows
+        self.is_reg_extract = is_reg_extract
+        self.hierarchy: Dict[str, int] = {}
+        self.last_layer: set = set()
+        self.num_of_packets = 0
+        self.bytes_transmitted = 0
+        self.last_packet = 0
+        self.min_time = float('inf')
+        self.max_time = -float('inf')
+        self.conversations: Dict[tuple, int] = {}
+        self.flows: Dict[tuple, Any] = {}
+        self.tcp_streams: set = set()
+        self.udp_streams: set = set()
+        self.unique_source_ip: set = set()
+        self.unique_dest_ip: set = set()
+        self.ips_extracted: set = set()
+        self.urls_extracted: set = set()
+        self.emails_extracted: set = set()
+        self.homemade_extracted: set = set()
+        self.events: list = []
+        # the headers of messages being sent over SMTP by connection, None once they were extracted
+        self.smtp_messages: Dict[tuple, Optional[bytearray]] = {}
+
+        if is_reg_extract:
+            self.reg_ip = re.compile(IP_REGEX)
+            self.reg_email = re.compile(EMAIL_REGEX)
+            self.reg_url = re.compile(URL_REGEX)
+        self.reg_homemade = re.compile(homemade_regex) if homemade_regex else None
+
+    def mine(self, reader: CaptureReader) -> None:
+        for link_type, timestamp, length, frame in reader.packets():
+            self.add_packet(reader.frame, timestamp, length, decode_frame(link_type, frame))
+
+    def add_packet(self, frame_number: int, timestamp: float, length: int, packet: NativePacket) -> None:
+        # remove duplicate layer names such as ETH,DATA,DATA -> ETH,DATA
+        layers = ','.join(dict.fromkeys(packet.layers))
+        self.hierarchy[layers] = self.hierarchy.get(layers, 0) + 1
+        self.last_layer.add(packet.layers[-1])
+        self.last_packet = frame_number
+        self.num_of_packets += 1
+        self.bytes_transmitted += length
+        self.max_time = max(self.max_time, timestamp)
+        self.min_time = min(self.min_time, timestamp)
+        if packet.src is None:
+            return
+
+        a, b = packet.src, packet.dst
+        self.unique_source_ip.add(a)
+        self.unique_dest_ip.add(b)
+        if self.is_reg_extract:
+            self.ips_extracted.update((a, b))
+        if (b, a) in self.conversations:
+            a, b = b, a
+        self.conversations[(a, b)] = self.conversations.get((a, b), 0) + 1
+        if packet.transport is None:
+            return
+
+        connection = get_connection_key(packet)
+        if packet.transport == 'TCP':
+            self.tcp_streams.add(connection)
+        else:
+            self.udp_streams.add(connection)
+        if self.is_flows:
+            self.add_to_flow(timestamp, length, packet)
+        if packet.payload:
+            if self.is_reg_extract or self.reg_homemade:
+                self.extract_strings(packet.payload.decode('latin-1'))
+            self.extract_protocols(frame_number, timestamp, packet, connection)
+
+    def add_to_flow(self, timestamp: float, length: int, packet: NativePacket) -> None:
+        a, src_port, b, dest_port = packet.src, packet.src_port, packet.dst, packet.dest_port
+        if (b, dest_port, a, src_port) in self.flows:
+            b, a, src_port, dest_port = a, b, dest_port, src_port
+        flow_data = self.flows.setdefault((a, src_port, b, dest_port), {'Transport': packet.transport,
+                                                                        'min_time': float('inf'),
+                                                                        'max_time': -float('inf'),
+                                                                        'bytes': 0,
+                                                                        'counter': 0})
+        flow_data['min_time'] = min(flow_data['min_time'], timestamp)
+        flow_data['max_time'] = max(flow_data['max_time'], timestamp)
+        flow_data['bytes'] += length
+        flow_data['counter'] += 1
+
+    def extract_strings(self, text: str) -> None:
+        if self.is_reg_extract:
+            self.ips_extracted.update(self.reg_ip.findall(text))
+            self.emails_extracted.update(self.reg_email.findall(text))
+            self.urls_extracted.update(self.reg_url.findall(text))
+        if self.reg_homemade:
+            self.homemade_extracted.update(self.reg_homemade.findall(text))
+
+    def extract_protocols(self, frame_number: int, timestamp: float, packet: NativePacket, connection: tuple) -> None:
+        if 'DNS' in self.extracted_protocols and 53 in (packet.src_port, packet.dest_port):
+            # DNS over TCP has a 2 bytes length prefix
+            dns_data = parse_dns(packet.payload[2:] if packet.transport == 'TCP' else packet.payload)
+            if dns_data:
+                dns_data['EntryID'] = self.entry_id
+                self.events.append(('DNS', dns_data, None, None, False))
+        elif 'HTTP' in self.extracted_protocols and packet.layers[-1] == 'HTTP':
+            self.extract_http(frame_number, timestamp, packet, connection)
+        elif 'SMTP' in self.extracted_protocols and packet.transport == 'TCP' and packet.dest_port in SMTP_PORTS:
+            self.extract_smtp(packet, connection)
+
+    def extract_http(self, frame_number: int, timestamp: float, packet: NativePacket, connection: tuple) -> None:
+        head = packet.payload.split(b'\r\n\r\n', 1)[0].decode('latin-1').split('\r\n')
+        start_line = head[0].split(' ', 2) + [None, None]  # type: ignore[list-item]
+        headers = {}
+        for line in head[1:]:
+            name, separator, value = line.partition(':')
+            if separator:
+                headers[name.strip().lower()] = value.strip()
+
+        is_response = head[0].startswith('HTTP/')
+        if is_response:
+            http_data = {
+                'EntryID': self.entry_id,
+                'ID': frame_number,
+                'ResponseStatusCode': start_line[1],
+                'ResponseVersion': start_line[0],
+                'ResponseCodeDesc': start_line[2],
+                'ResponseContentLength': headers.get('content-length'),
+                'ResponseContentType': headers.get('content-type'),
+                'ResponseDate': formatEpochDate(timestamp)
+            }
+        else:
+            method, uri, version = start_line[:3]
+            host = headers.get('host')
+            http_data = {
+                'EntryID': self.entry_id,
+                'ID': frame_number,
+                'RequestAgent': headers.get('user-agent'),
+                'RequestHost': host,
+                'RequestSourceIP': packet.src,
+                'RequestURI': f'http://{host}{uri}' if host and uri and uri.startswith('/') else uri,
+                'RequestMethod': method,
+                'RequestVersion': version,
+                'RequestAcceptEncoding': headers.get('accept-encoding'),
+                'RequestPragma': headers.get('pragma'),
+                'RequestAcceptLanguage': headers.get('accept-language'),
+                'RequestCacheControl': headers.get('cache-control')
+            }
+        self.events.append(('HTTP', http_data, None, connection, is_response))
+
+    def extract_smtp(self, packet: NativePacket, connection: tuple) -> None:
+        payload = packet.payload
+        smtp_data = {'ID': packet.seq, 'EntryID': self.entry_id}
+        if connection in self.smtp_messages:
+            # the client is sending a message after a DATA command, only its headers are kept
+            message = self.smtp_messages[connection]
+            is_last = payload.endswith(b'\r\n.\r\n') or payload == b'.\r\n'
+            if message is not None:
+                message += payload
+                if is_last or b'\r\n\r\n' in message or len(message) >= SMTP_HEADERS_MAX_SIZE:
+                    self.extract_imf(bytes(message))
+                    self.smtp_messages[connection] = None
+            if is_last:
+                del self.smtp_messages[connection]
+        else:
+            command, _, parameter = payload.split(b'\r\n', 1)[0].decode('latin-1').partition(' ')
+            parameters = parameter.split(':')
+            if len(parameters) == 2:
+                smtp_data[parameters[0].title()] = strip(parameters[1], ['<', '>'])
+            if command.upper() == 'DATA':
+                self.smtp_messages[connection] = bytearray()
+        # SMTP commands have no ID, so a session is linked by the next sequence number of the client
+        self.events.append(('SMTP', smtp_data, (packet.seq + len(payload)) & 0xFFFFFFFF, None, False))
+
+    def extract_imf(self, message: bytes) -> None:
+        headers = BytesHeaderParser().parsebytes(message)
+        imf_data = {
+            'EntryID': self.entry_id,
+            'ID': headers.get('Message-ID', -1),
+            'To': strip(str(headers['To']), ['<', '>']) if headers['To'] else None,
+            'From': strip(str(headers['From']), ['<', '>']) if headers['From'] else None,
+            'Subject': headers.get('Subject'),
+            'MimeVersion': headers.get('MIME-Version')
+        }
+        self.events.append(('SMTP', imf_data, None, None, False))
+
+    def results(self) -> dict:
+        """Returns the results as builtin types, so that they can be sent back from a worker process."""
+        return {
+            'hierarchy': self.hierarchy,
+            'last_layer': self.last_layer,
+            'num_of_packets': self.num_of_packets,
+            'bytes_transmitted': self.bytes_transmitted,
+            'last_packet': self.last_packet,
+            'min_time': self.min_time,
+            'max_time': self.max_time,
+            'conversations': self.conversations,
+            'flows': self.flows,
+            'tcp_streams': self.tcp_streams,
+            'udp_streams': self.udp_streams,
+            'unique_source_ip': self.unique_source_ip,
+            'unique_dest_ip': self.unique_dest_ip,
+            'ips_extracted': self.ips_extracted,
+            'urls_extracted': self.urls_extracted,
+            'emails_extracted': self.emails_extracted,
+            'homemade_extracted': self.homemade_extracted,
+            'events': self.events
+        }
+
+
+def mine_native_chunk(file_path: str, chunk: dict, options: tuple) -> dict:
+    """
+    Mines a chunk of a capture.
+
+    Args:
+        file_path: The PCAP's file path.
+        chunk: The reading state of the chunk, as returned by `CaptureReader.split`.
+        options: The arguments of NativeMiner.
+
+    Returns:
+        The results of the NativeMiner.
+    """
+    miner = NativeMiner(*options)
+    with open(file_path, 'rb') as capture_file:
+        with mmap.mmap(capture_file.fileno(), 0, access=mmap.ACCESS_READ) as buf:
+            miner.mine(CaptureReader(buf, **chunk))
+    return miner.results()
+
+
+def mine_native_chunks(file_path: str, chunks: list, options: tuple) -> list:
+    """
+    Mines each chunk of a capture in a worker process. The workers are forked rather than spawned since the script
+    doesn't run as an importable module, so only the results have to be pickled.
+
+    Returns:
+        The results of the chunks, in the order of the chunks.
+
+    Raises:
+        ValueError if a worker was killed before returning its results, usually since it ran out of memory.
+    """
+    context = multiprocessing.get_context('fork')
+    results_queue = context.Queue()
+
+    def run_worker(index, chunk):
+        try:
+            results_queue.put((index, mine_native_chunk(file_path, chunk, options), None))
+        except Exception as e:
+            results_queue.put((index, None, (type(e) is CaptureFormatError, str(e))))
+
+    workers = [context.Process(target=run_worker, args=(index, chunk)) for index, chunk in enumerate(chunks)]
+    for worker in workers:
+        worker.start()
+    results: list = [None] * len(chunks)
+    errors = []
+    done = set()
+    try:
+        # the results are read before joining, a worker can't exit before its results are consumed
+        while len(done) < len(chunks):
+            try:
+                index, chunk_results, error = results_queue.get(timeout=NATIVE_WORKER_POLL_INTERVAL)
+            except queue.Empty:
+                # a worker which returned its results exits with 0, even if mining its chunk failed
+                killed = [index for index, worker in enumerate(workers)
+                          if index not in done and worker.exitcode not in (None, 0)]
+                if killed:
+                    raise ValueError(f'The worker of chunk {killed[0] + 1} exited with code {workers[killed[0]].exitcode} '
+                                     f'before returning its results, probably since it ran out of memory. '
+                                     f'Try mining the PCAP with more workers.')
+                continue
+            done.add(index)
+            results[index] = chunk_results
+            if error:
+                errors.append(error)
+    finally:
+        for worker in workers:
+            if len(done) < len(chunks) and worker.is_alive():
+                worker.terminate()
+            worker.join()
+    if errors:
+        is_format_error, message = errors[0]
+        raise CaptureFormatError(message) if is_format_error else ValueError(message)
+    return results
+
+
+def use_native_engine(engine: str, extracted_protocols: list, wpa_password: str, rsa_key_file_path: Optional[str],
+                      pcap_filter: str, pcap_filter_new_file_name: str) -> bool:
+    """
+    Whether to mine with the native engine. Decryption, display filters, saving the filtered file and the protocols
+    that are not in NATIVE_SUPPORTED_PROTOCOLS need tshark.
+
+    Args:
+        engine: 'auto', 'native' or 'pyshark'.
+        extracted_protocols: A list of protocols to extract
+        wpa_password: The wpa password for the decryption
+        rsa_key_file_path: The path of the rsa key for the decryption
+        pcap_filter: A filter to apply on the PCAP.
+        pcap_filter_new_file_name: The name of the filtered PCAP file to save.
+
+    Returns:
+        True for the native engine, False for pyshark.
+    """
+    if engine == 'pyshark':
+        return False
+    unsupported_protocols = [protocol for protocol in extracted_protocols
+                             if protocol not in NATIVE_SUPPORTED_PROTOCOLS]
+    if not (wpa_password or rsa_key_file_path or pcap_filter or pcap_filter_new_file_name or unsupported_protocols):
+        return True
+    if engine == 'native':
+        raise ValueError('The native engine does not support decryption, filters, saving a filtered file or '
+                         f'extracting the protocols {", ".join(unsupported_protocols)}. '
+                         'Use the auto or pyshark engine.')
+    return False
+
+
 '''MAIN'''
 
 
@@ -744,6 +1544,8 @@ def main():
     pcap_filter_new_file_path = ''
     pcap_filter_new_file_name = args.get('filtered_file_name', '')
     unique_ips = args.get('extract_ips', 'False') == 'True'
+    engine = args.get('engine', 'pyshark')
+    workers = arg_to_number(args.get('workers'), 'workers')
 
     if pcap_filter_new_file_name:
         temp = demisto.uniqueFile()
@@ -751,8 +1553,19 @@ def main():
 
     try:
         pcap = PCAP(is_reg_extract, extracted_protocols, homemade_regex, unique_ips, entry_id)
-        pcap.mine(file_path, wpa_password, rsa_key_file_path, is_flows, is_reg_extract, pcap_filter,
-                  pcap_filter_new_file_path)
+        is_native = use_native_engine(engine, extracted_protocols, wpa_password, rsa_key_file_path, pcap_filter,
+                                      pcap_filter_new_file_name)
+        if is_native:
+            try:
+                pcap.mine_native(file_path, is_flows, is_reg_extract, workers)
+            except CaptureFormatError as e:
+                if engine == 'native':
+                    raise
+                demisto.debug(f'Could not mine the PCAP with the native engine, falling back to pyshark: {e}')
+                is_native = False
+        if not is_native:
+            pcap.mine(file_path, wpa_password, rsa_key_file_path, is_flows, is_reg_extract, pcap_filter,
+                      pcap_filter_new_file_path)
         hr, ec, raw = pcap.get_outputs(conversation_number_to_display, is_flows, is_reg_extract)
         return_outputs(hr, ec, raw)
 
@@ -1,3 +1,6 @@
+import socket
+import struct
+
 import pytest
 
 
@@ -75,3 +78,112 @@ def test_mine_pcap():
     assert len(ec['PCAPResultsSMB2']) == 7
     assert raw['URL'][0] == 'http://239.255.255.250:1900*'
     assert raw['Regex'] != []
+
+
+@pytest.mark.parametrize('workers', [1, 3])
+def test_mine_native_pcap(workers):
+    """
+    Given:
+        - A pcapng file.
+    When:
+        - Mining it with the native engine, in one or several worker processes.
+    Then:
+        - Ensure the results are the same as the results of pyshark.
+    """
+    from PcapMinerV2 import PCAP
+    pcap = PCAP(True, ['DNS'], 'M-SEARCH * (.+)', False, 'entry_id')
+    pcap.mine_native('./TestData/smb-on-windows-10.pcapng', True, True, workers)
+    hr, ec, raw = pcap.get_outputs(15, True, True)
+    assert raw['EntryID'] == 'entry_id'
+    assert raw['Packets'] == 1000
+    assert len(ec['PCAPResultsDNS']) == 80
+    assert raw['Regex'] != []
+    assert pcap.hierarchy['ETH,IP,UDP,DNS'] == 357
+
+
+def tcp_frame(src, dst, src_port, dest_port, seq, payload):
+    tcp = struct.pack('!HHIIBBHHH', src_port, dest_port, seq, 0, 5 << 4, 0x18, 65535, 0, 0) + payload
+    ip = struct.pack('!BBHHHBBH4s4s', 0x45, 0, 20 + len(tcp), 0, 0, 64, 6, 0, socket.inet_aton(src),
+                     socket.inet_aton(dst))
+    return b'\x00' * 12 + b'\x08\x00' + ip + tcp
+
+
+@pytest.mark.parametrize('workers', [1, 2])
+def test_mine_native_http_and_smtp(tmp_path, workers):
+    """
+    Given:
+        - A pcap with an HTTP request and its response and an SMTP session.
+    When:
+        - Mining it with the native engine, in one or several worker processes.
+    Then:
+        - Ensure the response is merged into its request and the SMTP session is linked by sequence numbers.
+    """
+    from PcapMinerV2 import PCAP
+    smtp_commands = [b'MAIL FROM:<a@example.com>\r\n', b'RCPT TO:<b@example.com>\r\n', b'DATA\r\n',
+                     b'Message-ID: <1@example.com>\r\nFrom: <a@example.com>\r\nSubject: Hi\r\n\r\nHi\r\n.\r\n']
+    frames = [
+        tcp_frame('10.0.0.1', '10.0.0.3', 1026, 80, 1, b'GET /a HTTP/1.1\r\nHost: example.com\r\n\r\n'),
+        tcp_frame('10.0.0.3', '10.0.0.1', 80, 1026, 1, b'HTTP/1.1 404 Not Found\r\nContent-Length: 0\r\n\r\n'),
+    ]
+    seq = 1
+    for command in smtp_commands:
+        frames.append(tcp_frame('10.0.0.1', '10.0.0.2', 1025, 25, seq, command))
+        seq += len(command)
+    capture = struct.pack('<IHHiIII', 0xa1b2c3d4, 2, 4, 0, 0, 65535, 1)
+    for i, frame in enumerate(frames):
+        capture += struct.pack('<IIII', 1600000000 + i, 0, len(frame), len(frame)) + frame
+    file_path = tmp_path / 'test.pcap'
+    file_path.write_bytes(capture)
+
+    pcap = PCAP(False, ['HTTP', 'SMTP'], '', False, 'entry_id')
+    pcap.mine_native(str(file_path), True, False, workers)
+    hr, ec, raw = pcap.get_outputs(15, True, False)
+
+    assert raw['Packets'] == 6
+    assert raw['StreamCount'] == 2
+    assert ec['PCAPResultsHTTP'] == [{
+        'EntryID': 'entry_id',
+        'ID': 1,
+        'RequestHost': 'example.com',
+        'RequestSourceIP': '10.0.0.1',
+        'RequestURI': 'http://example.com/a',
+        'RequestMethod': 'GET',
+        'RequestVersion': 'HTTP/1.1',
+        'ResponseStatusCode': '404',
+        'ResponseVersion': 'HTTP/1.1',
+        'ResponseCodeDesc': 'Not Found',
+        'ResponseContentLength': '0',
+        'ResponseDate': 'Sun Sep 13 12:26:41 2020'
+    }]
+    assert len(ec['PCAPResultsSMTP']) == 2
+    message = next(data for data in ec['PCAPResultsSMTP'] if data['ID'] == '<1@example.com>')
+    session = next(data for data in ec['PCAPResultsSMTP'] if data is not message)
+    assert session['From'] == 'a@example.com'
+    assert session['To'] == 'b@example.com'
+    assert message['ID'] == '<1@example.com>'
+    assert message['From'] == 'a@example.com'
+    assert message['Subject'] == 'Hi'
+
+
+def test_mine_native_chunks_killed_worker(mocker):
+    """
+    Given:
+        - A PCAP split to two chunks, where the worker of the second chunk is killed, e.g. by the OOM killer.
+    When:
+        - Mining the chunks with the native engine.
+    Then:
+        - An error is raised instead of waiting for the results of the killed worker.
+    """
+    import os
+    import signal
+    import PcapMinerV2
+
+    def mine_native_chunk(file_path, chunk, options):
+        if chunk == 1:
+            os.kill(os.getpid(), signal.SIGKILL)
+        return chunk
+
+    mocker.patch.object(PcapMinerV2, 'NATIVE_WORKER_POLL_INTERVAL', 0.1)
+    mocker.patch.object(PcapMinerV2, 'mine_native_chunk', side_effect=mine_native_chunk)
+    with pytest.raises(ValueError, match='chunk 2 exited with code -9'):
+        PcapMinerV2.mine_native_chunks('file.pcap', [0, 1], ())
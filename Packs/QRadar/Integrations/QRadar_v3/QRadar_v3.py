@@ -1,9 +1,10 @@
 import concurrent.futures
 import secrets
+from collections import OrderedDict
 from enum import Enum
 from ipaddress import ip_address
 from threading import Lock
-from typing import Tuple
+from typing import Callable, Tuple
 
 import pytz
 import urllib3
@@ -29,6 +30,8 @@ RULES_ENRCH_FLG = 'true'  # when set to true, will try to enrich offense with ru
 MAX_FETCH_EVENT_RETIRES = 3  # max iteration to try search the events of an offense
 SLEEP_FETCH_EVENT_RETIRES = 10  # sleep between iteration to try search the events of an offense
 MAX_NUMBER_OF_OFFENSES_TO_CHECK_SEARCH = 5  # Number of offenses to check during mirroring if search was completed.
+LOOKUP_CACHE_TTL = 3600  # seconds to keep the names of offense types, closing reasons, domains, rules and addresses
+LOOKUP_CACHE_SIZE = 500  # max amount of names to keep for each of the above
 
 ADVANCED_PARAMETERS_STRING_NAMES = [
     'DOMAIN_ENRCH_FLG',
@@ -44,13 +47,18 @@ ADVANCED_PARAMETER_INT_NAMES = [
     'LOCK_WAIT_TIME',
     'MAX_WORKERS',
     'MAX_FETCH_EVENT_RETIRES',
-    'SLEEP_FETCH_EVENT_RETIRES'
+    'SLEEP_FETCH_EVENT_RETIRES',
+    'LOOKUP_CACHE_TTL',
+    'LOOKUP_CACHE_SIZE'
 ]
 
 ''' CONSTANTS '''
 API_USERNAME = '_api_token_key'
 RESET_KEY = 'reset'
 LAST_FETCH_KEY = 'id'
+OFFENSES_IN_FLIGHT_KEY = 'offenses_in_flight'
+EVENTS_SEARCHES_COUNT_KEY = 'events_searches_count'
+LOOKUP_CACHE_KEY = 'lookup_cache'
 MINIMUM_API_VERSION = 10.1
 DEFAULT_RANGE_VALUE = '0-49'
 DEFAULT_TIMEOUT_VALUE = '35'
@@ -726,6 +734,76 @@ def is_valid_ip(ip: str) -> bool:
         return False
 
 
+class LookupCache:
+    """
+    Cache of the names of QRadar objects referenced by ID in offenses, e.g. offense types and rules.
+    Kept between fetch cycles of the long running execution, and saved in the integration context for mirroring.
+    Names are kept for LOOKUP_CACHE_TTL seconds, up to LOOKUP_CACHE_SIZE names for each kind of object, and only the IDs
+    which are not in the cache are requested from QRadar.
+    """
+
+    def __init__(self):
+        self.names: Dict[str, OrderedDict] = {}
+        self.hits = 0
+        self.misses = 0
+
+    def get_names(self, kind: str, ids: Set, fetch_names: Callable[[List], Dict]) -> Dict:
+        """
+        Returns the names of the given IDs, requesting from QRadar only the IDs which are not cached.
+        Args:
+            kind (str): Kind of the objects, e.g. 'rules'.
+            ids (Set): IDs to get their names.
+            fetch_names (Callable[[List], Dict]): Function which requests the names of a list of IDs from QRadar.
+
+        Returns:
+            (Dict): Dictionary of {id: name}, without the IDs which were not found.
+        """
+        now = time.time()
+        cached_names = self.names.setdefault(kind, OrderedDict())
+        result = {}
+        missing_ids = []
+        for id_ in ids:
+            cached = cached_names.get(str(id_))
+            if cached and now - cached[1] < LOOKUP_CACHE_TTL:
+                cached_names.move_to_end(str(id_))
+                result[id_] = cached[0]
+            else:
+                missing_ids.append(id_)
+        self.hits += len(result)
+        self.misses += len(missing_ids)
+
+        if missing_ids:
+            fetched_names = fetch_names(missing_ids)
+            for id_, name in fetched_names.items():
+                cached_names[str(id_)] = [name, now]
+                cached_names.move_to_end(str(id_))
+            while len(cached_names) > LOOKUP_CACHE_SIZE:
+                cached_names.popitem(last=False)
+            result.update(fetched_names)
+        return result
+
+    def log_stats(self):
+        total = self.hits + self.misses
+        if total:
+            print_debug_msg(f'Lookup cache: {self.hits} hits out of {total} names '
+                            f'({round(100 * self.hits / total)}% hit rate).')
+
+    def to_context(self) -> Dict:
+        return {kind: list(cached_names.items()) for kind, cached_names in self.names.items()}
+
+    def load_context(self, context_data: Dict):
+        # names cached by this process are newer than the ones saved in the context
+        for kind, items in (context_data or {}).items():
+            cached_names = self.names.setdefault(kind, OrderedDict())
+            for id_, cached in items:
+                if id_ not in cached_names:
+                    cached_names[id_] = cached
+                    cached_names.move_to_end(id_, last=False)
+
+
+LOOKUP_CACHE = LookupCache()
+
+
 def get_offense_types(client: Client, offenses: List[Dict]) -> Dict:
     """
     Receives list of offenses, and performs API call to QRadar service to retrieve the offense type names
@@ -740,9 +818,12 @@ def get_offense_types(client: Client, offenses: List[Dict]) -> Dict:
     offense_types_ids = {offense.get('offense_type') for offense in offenses if offense.get('offense_type') is not None}
     if not offense_types_ids:
         return dict()
-    offense_types = client.offense_types(filter_=f'''id in ({','.join(map(str, offense_types_ids))})''',
-                                         fields='id,name')
-    return {offense_type.get('id'): offense_type.get('name') for offense_type in offense_types}
+
+    def fetch_offense_types(ids: List) -> Dict:
+        offense_types = client.offense_types(filter_=f'''id in ({','.join(map(str, ids))})''', fields='id,name')
+        return {offense_type.get('id'): offense_type.get('name') for offense_type in offense_types}
+
+    return LOOKUP_CACHE.get_names('offense_types', offense_types_ids, fetch_offense_types)
 
 
 def get_offense_closing_reasons(client: Client, offenses: List[Dict]) -> Dict:
@@ -760,9 +841,13 @@ def get_offense_closing_reasons(client: Client, offenses: List[Dict]) -> Dict:
                           if offense.get('closing_reason_id') is not None}
     if not closing_reason_ids:
         return dict()
-    closing_reasons = client.closing_reasons_list(filter_=f'''id in ({','.join(map(str, closing_reason_ids))})''',
-                                                  fields='id,text')
-    return {closing_reason.get('id'): closing_reason.get('text') for closing_reason in closing_reasons}
+
+    def fetch_closing_reasons(ids: List) -> Dict:
+        closing_reasons = client.closing_reasons_list(filter_=f'''id in ({','.join(map(str, ids))})''',
+                                                      fields='id,text')
+        return {closing_reason.get('id'): closing_reason.get('text') for closing_reason in closing_reasons}
+
+    return LOOKUP_CACHE.get_names('closing_reasons', closing_reason_ids, fetch_closing_reasons)
 
 
 def get_domain_names(client: Client, outputs: List[Dict]) -> Dict:
@@ -779,8 +864,12 @@ def get_domain_names(client: Client, outputs: List[Dict]) -> Dict:
     domain_ids = {offense.get('domain_id') for offense in outputs if offense.get('domain_id') is not None}
     if not domain_ids:
         return dict()
-    domains_info = client.domains_list(filter_=f'''id in ({','.join(map(str, domain_ids))})''', fields='id,name')
-    return {domain_info.get('id'): domain_info.get('name') for domain_info in domains_info}
+
+    def fetch_domain_names(ids: List) -> Dict:
+        domains_info = client.domains_list(filter_=f'''id in ({','.join(map(str, ids))})''', fields='id,name')
+        return {domain_info.get('id'): domain_info.get('name') for domain_info in domains_info}
+
+    return LOOKUP_CACHE.get_names('domains', domain_ids, fetch_domain_names)
 
 
 def get_rules_names(client: Client, offenses: List[Dict]) -> Dict:
@@ -797,8 +886,12 @@ def get_rules_names(client: Client, offenses: List[Dict]) -> Dict:
     rules_ids = {rule.get('id') for offense in offenses for rule in offense.get('rules', [])}
     if not rules_ids:
         return dict()
-    rules = client.rules_list(None, None, f'''id in ({','.join(map(str, rules_ids))})''', 'id,name')
-    return {rule.get('id'): rule.get('name') for rule in rules}
+
+    def fetch_rules_names(ids: List) -> Dict:
+        rules = client.rules_list(None, None, f'''id in ({','.join(map(str, ids))})''', 'id,name')
+        return {rule.get('id'): rule.get('name') for rule in rules}
+
+    return LOOKUP_CACHE.get_names('rules', rules_ids, fetch_rules_names)
 
 
 def get_offense_addresses(client: Client, offenses: List[Dict], is_destination_addresses: bool) -> Dict:
@@ -824,13 +917,16 @@ def get_offense_addresses(client: Client, offenses: List[Dict], is_destination_a
     addresses_ids = [address_id for offense in offenses
                      for address_id in offense.get(address_list_field, [])]
 
-    # Submit addresses in batches to avoid overloading QRadar service
-    addresses_batches = [get_addresses_for_batch(b) for b
-                         in batch(addresses_ids[:OFF_ENRCH_LIMIT], batch_size=int(BATCH_SIZE))]
+    def fetch_addresses(ids: List) -> Dict:
+        # Submit addresses in batches to avoid overloading QRadar service
+        addresses_batches = [get_addresses_for_batch(b) for b in batch(ids, batch_size=int(BATCH_SIZE))]
+        return {address_data.get('id'): address_data.get(address_field)
+                for addresses_batch in addresses_batches
+                for address_data in addresses_batch}
 
-    return {address_data.get('id'): address_data.get(address_field)
-            for addresses_batch in addresses_batches
-            for address_data in addresses_batch}
+    if not addresses_ids:
+        return dict()
+    return LOOKUP_CACHE.get_names(address_field, set(addresses_ids[:OFF_ENRCH_LIMIT]), fetch_addresses)
 
 
 def create_single_asset_for_offense_enrichment(asset: Dict) -> Dict:
@@ -957,6 +1053,7 @@ def enrich_offenses_result(client: Client, offenses: Any, enrich_ip_addresses: b
                     **destination_addresses_enrich, **asset_enrich)
 
     result = [create_enriched_offense(offense) for offense in offenses]
+    LOOKUP_CACHE.log_stats()
     print_debug_msg('Enriched offenses successfully.')
     return result
 
@@ -1222,6 +1319,30 @@ def fetch_incidents_command() -> List[Dict]:
     return get_integration_context().get('samples', [])
 
 
+def get_offense_events_query(fetch_mode: str, offense: Dict, event_columns: str, events_limit: int) -> str:
+    """
+    Builds the AQL query which retrieves the events of an offense.
+    Args:
+        fetch_mode (str): Which enrichment mode was requested.
+                          Can be 'Fetch With All Events', 'Fetch Correlation Events Only'
+        offense (Dict): Offense to retrieve its events.
+        event_columns (str): Columns of the events to be extracted from query.
+        events_limit (int): Maximum number of events to enrich the offense.
+
+    Returns:
+        (str): The query expression.
+    """
+    additional_where = ''' AND LOGSOURCETYPENAME(devicetype) = 'Custom Rule Engine' ''' \
+        if fetch_mode == FetchMode.correlations_events_only.value else ''
+    # Decrease 1 minute from start_time to avoid the case where the minute queried of start_time equals end_time.
+    offense_start_time = offense['start_time'] - 60 * 1000
+    offense_id = offense['id']
+    return (
+        f'SELECT {event_columns} FROM events WHERE INOFFENSE({offense_id}) {additional_where} limit {events_limit} '
+        f'START {offense_start_time}'
+    )
+
+
 def create_search_with_retry(client: Client, fetch_mode: str, offense: Dict, event_columns: str, events_limit: int,
                              max_retries: int = EVENTS_FAILURE_LIMIT) -> Optional[Dict]:
     """
@@ -1243,15 +1364,7 @@ def create_search_with_retry(client: Client, fetch_mode: str, offense: Dict, eve
         (Dict): If search was created successfully.
         None: If reset was triggered or number of retries exceeded limit.
     """
-    additional_where = ''' AND LOGSOURCETYPENAME(devicetype) = 'Custom Rule Engine' ''' \
-        if fetch_mode == FetchMode.correlations_events_only.value else ''
-    # Decrease 1 minute from start_time to avoid the case where the minute queried of start_time equals end_time.
-    offense_start_time = offense['start_time'] - 60 * 1000
-    offense_id = offense['id']
-    query_expression = (
-        f'SELECT {event_columns} FROM events WHERE INOFFENSE({offense_id}) {additional_where} limit {events_limit} '
-        f'START {offense_start_time}'
-    )
+    query_expression = get_offense_events_query(fetch_mode, offense, event_columns, events_limit)
     num_of_failures = 0
     while num_of_failures <= max_retries:
         if is_reset_triggered():
@@ -1417,6 +1530,152 @@ def get_incidents_long_running_execution(client: Client, offenses_per_fetch: int
     return incidents, new_highest_offense_id
 
 
+def advance_offense_events_search(client: Client, offense_in_flight: Dict, fetch_mode: str, events_columns: str,
+                                  events_limit: int, max_retries: int = MAX_FETCH_EVENT_RETIRES,
+                                  offense: Optional[Dict] = None) -> Tuple[Dict, Optional[Dict]]:
+    """
+    Performs a single step of the events search of an offense, without waiting for QRadar:
+    creates the search, or checks its status and retrieves its events once it is done.
+    Like 'enrich_offense_with_events', the search is made again (up to 'max_retries' times) when it returns less
+    events than expected, because events might not be indexed yet.
+    Args:
+        client (Client): Client to perform the API calls.
+        offense_in_flight (Dict): The offense ID and the state of its events search, as kept in the integration
+                                  context.
+        fetch_mode (str): Which enrichment mode was requested.
+                          Can be 'Fetch With All Events', 'Fetch Correlation Events Only'
+        events_columns (str): Columns of the events to be extracted from query.
+        events_limit (int): Maximum number of events to enrich the offense.
+        max_retries (int): Number of searches to make for the offense.
+        offense (Optional[Dict]): The offense, if it was just listed. Otherwise it is retrieved when it is needed,
+                                  so only the IDs of the offenses in flight are kept in the integration context.
+
+    Returns:
+        (Dict, None): The updated state, if the offense is still in flight.
+        (Dict, Dict): The state and the offense, enriched with its events unless they could not be retrieved.
+    """
+    offense_id = offense_in_flight['id']
+    if time.time() < offense_in_flight.get('next_step_time', 0):
+        return offense_in_flight, None
+
+    search_id = offense_in_flight.get('search_id')
+    try:
+        if not search_id:
+            offense = offense or client.offenses_list(offense_id=offense_id)
+            query_expression = get_offense_events_query(fetch_mode, offense, events_columns, events_limit)
+            search_response = client.search_create(query_expression=query_expression)
+            return dict(offense_in_flight, search_id=search_response['search_id'], failures=0), None
+
+        query_status = client.search_status_get(search_id).get('status')
+        if query_status not in TERMINATING_SEARCH_STATUSES:
+            return dict(offense_in_flight, failures=0), None
+
+        events = sanitize_outputs(client.search_results_get(search_id).get('events', []))
+        # the offense is retrieved after its search is done, so its events count is up to date
+        offense = offense or client.offenses_list(offense_id=offense_id)
+    except Exception as e:
+        # failures are relevant only when consecutive
+        failures = offense_in_flight.get('failures', 0) + 1
+        print_debug_msg(f'Error while fetching offense {offense_id} events, search_id: {search_id}. '
+                        f'Error details: {str(e)}')
+        if failures >= EVENTS_FAILURE_LIMIT:
+            # the offense is created without its events
+            try:
+                return offense_in_flight, offense or client.offenses_list(offense_id=offense_id)
+            except Exception as e:
+                print_debug_msg(f'Error while fetching offense {offense_id}. Error details: {str(e)}')
+        return dict(offense_in_flight, failures=failures, next_step_time=time.time() + FAILURE_SLEEP), None
+
+    print_debug_msg(f'Events fetched for offense {offense_id}.')
+    if len(events) >= min(offense.get('event_count', 0), events_limit):
+        return offense_in_flight, dict(offense, events=events)
+
+    searches_made = offense_in_flight.get('searches_made', 0) + 1
+    if searches_made >= max_retries:
+        return offense_in_flight, offense
+    return dict(offense_in_flight, search_id=None, searches_made=searches_made, failures=0,
+                next_step_time=time.time() + SLEEP_FETCH_EVENT_RETIRES), None
+
+
+def get_incidents_pipelined_execution(client: Client, offenses_per_fetch: int, user_query: str, fetch_mode: str,
+                                      events_columns: str, events_limit: int, ip_enrich: bool, asset_enrich: bool,
+                                      last_highest_id: int, incident_type: Optional[str],
+                                      mirror_direction: Optional[str], offenses_in_flight: List[Dict]
+                                      ) -> Tuple[Optional[List[Dict]], Optional[int], List[Dict]]:
+    """
+    Single cycle of the long running execution when offenses are fetched with events.
+    Unlike 'get_incidents_long_running_execution', it does not wait for the events searches: new offenses are listed
+    as long as there is room in the queue of offenses in flight, every offense in flight advances its events search
+    by a single step, and the offenses whose events are done are returned as incidents. Offenses whose searches take
+    longer stay in flight for the next cycles, without delaying the others.
+    Args:
+        client (Client): Client to perform the API calls.
+        offenses_per_fetch (int): Maximum number of offenses in flight, which bounds the concurrent events searches.
+        user_query (str): If given, the user filters for fetching offenses from QRadar service.
+        fetch_mode (str): Fetch mode of the offenses.
+                          Can be 'Fetch With All Events', 'Fetch Correlation Events Only'
+        events_columns (str): Events columns to extract by search query for each offense.
+        events_limit (int): Number of events to be fetched for each offense.
+        ip_enrich (bool): Whether to enrich offense by changing IP IDs of each offense to its IP value.
+        asset_enrich (bool): Whether to enrich offense with assets
+        last_highest_id (int): The highest ID of all the offenses that have been fetched from QRadar service.
+        incident_type (Optional[str]): Incident type.
+        mirror_direction (Optional[str]): Whether mirror in is activated or not.
+        offenses_in_flight (List[Dict]): The IDs of the offenses whose events are still searched, with the state of
+                                         their searches, from the previous cycle.
+
+    Returns:
+        (List[Dict], int, List[Dict]): List of the incidents, the new highest ID for next fetch and the offenses which
+                                       are still in flight.
+        (None, None, []): if reset was triggered
+    """
+    new_highest_offense_id = last_highest_id
+    max_in_flight = offenses_per_fetch or MAXIMUM_OFFENSES_PER_FETCH
+    listed_offenses: Dict[int, Dict] = {}
+    if len(offenses_in_flight) < max_in_flight:
+        offense_highest_id = get_minimum_id_to_fetch(last_highest_id, user_query)
+        filter_fetch_query = f'id>{offense_highest_id}' + (f' AND {user_query}' if user_query else '')
+        range_ = f'items=0-{max_in_flight - len(offenses_in_flight) - 1}'
+        offenses = client.offenses_list(range_, filter_=filter_fetch_query, sort=ASCENDING_ID_ORDER)
+        new_highest_offense_id = offenses[-1].get('id') if offenses else offense_highest_id
+        listed_offenses = {offense['id']: offense for offense in offenses}
+        offenses_in_flight = offenses_in_flight + [{'id': offense['id']} for offense in offenses]
+
+    futures = [EXECUTOR.submit(
+        advance_offense_events_search,
+        client=client,
+        offense_in_flight=offense_in_flight,
+        fetch_mode=fetch_mode,
+        events_columns=events_columns,
+        events_limit=events_limit,
+        offense=listed_offenses.get(offense_in_flight['id']),
+    ) for offense_in_flight in offenses_in_flight]
+    still_in_flight = []
+    offenses = []
+    for future in futures:
+        offense_in_flight, offense = future.result()
+        if offense:
+            offenses.append(offense)
+        else:
+            still_in_flight.append(offense_in_flight)
+
+    if is_reset_triggered(handle_reset=True):
+        return None, None, []
+    searches_count = len([offense_in_flight for offense_in_flight in still_in_flight
+                          if offense_in_flight.get('search_id')])
+    print_debug_msg(f'{len(offenses)} offenses done, {len(still_in_flight)} offenses in flight, '
+                    f'{searches_count} events searches running.')
+
+    offenses_with_mirror = [
+        dict(offense, mirror_direction=mirror_direction, mirror_instance=demisto.integrationInstance())
+        for offense in offenses] if mirror_direction else offenses
+    enriched_offenses = enrich_offenses_result(client, offenses_with_mirror, ip_enrich, asset_enrich) \
+        if offenses else []
+    final_offenses = sanitize_outputs(enriched_offenses)
+    incidents = create_incidents_from_offenses(final_offenses, incident_type)
+    return incidents, new_highest_offense_id, still_in_flight
+
+
 def create_incidents_from_offenses(offenses: List[Dict], incident_type: Optional[str]) -> List[Dict]:
     """
     Transforms list of offenses given into incidents for Demisto.
@@ -1458,39 +1717,66 @@ def long_running_execution_command(client: Client, params: Dict):
     events_limit = int(params.get('events_limit') or DEFAULT_EVENTS_LIMIT)
     incident_type = params.get('incident_type')
     mirror_direction = MIRROR_DIRECTION.get(params.get('mirror_options', DEFAULT_MIRRORING_DIRECTION))
+    LOOKUP_CACHE.load_context(get_integration_context().get(LOOKUP_CACHE_KEY, {}))
     while True:
+        offenses_in_flight: List[Dict] = []
         try:
             is_reset_triggered(handle_reset=True)
             ctx = get_integration_context()
             print_debug_msg(f'Starting fetch loop. Fetch mode: {fetch_mode}.')
-            incidents, new_highest_id = get_incidents_long_running_execution(
-                client=client,
-                offenses_per_fetch=offenses_per_fetch,
-                user_query=user_query,
-                fetch_mode=fetch_mode,
-                events_columns=events_columns,
-                events_limit=events_limit,
-                ip_enrich=ip_enrich,
-                asset_enrich=asset_enrich,
-                last_highest_id=ctx.get(LAST_FETCH_KEY, 0),
-                incident_type=incident_type,
-                mirror_direction=mirror_direction
-            )
+            if fetch_mode == FetchMode.no_events.value:
+                incidents, new_highest_id = get_incidents_long_running_execution(
+                    client=client,
+                    offenses_per_fetch=offenses_per_fetch,
+                    user_query=user_query,
+                    fetch_mode=fetch_mode,
+                    events_columns=events_columns,
+                    events_limit=events_limit,
+                    ip_enrich=ip_enrich,
+                    asset_enrich=asset_enrich,
+                    last_highest_id=ctx.get(LAST_FETCH_KEY, 0),
+                    incident_type=incident_type,
+                    mirror_direction=mirror_direction
+                )
+            else:
+                incidents, new_highest_id, offenses_in_flight = get_incidents_pipelined_execution(
+                    client=client,
+                    offenses_per_fetch=offenses_per_fetch,
+                    user_query=user_query,
+                    fetch_mode=fetch_mode,
+                    events_columns=events_columns,
+                    events_limit=events_limit,
+                    ip_enrich=ip_enrich,
+                    asset_enrich=asset_enrich,
+                    last_highest_id=ctx.get(LAST_FETCH_KEY, 0),
+                    incident_type=incident_type,
+                    mirror_direction=mirror_direction,
+                    offenses_in_flight=ctx.get(OFFENSES_IN_FLIGHT_KEY, [])
+                )
             # Reset was called during execution, skip creating incidents.
-            if not incidents and not new_highest_id:
+            if incidents is None and new_highest_id is None:
                 continue
 
+            # the context is read again, as the mirroring commands might have updated it during the cycle
+            ctx = get_integration_context()
             incident_batch_for_sample = incidents[:SAMPLE_SIZE] if incidents else ctx.get('samples', [])
             set_integration_context({LAST_FETCH_KEY: new_highest_id, 'samples': incident_batch_for_sample,
-                                     'last_mirror_update': ctx.get('last_mirror_update')})
+                                     'last_mirror_update': ctx.get('last_mirror_update'),
+                                     OFFENSES_IN_FLIGHT_KEY: offenses_in_flight,
+                                     LOOKUP_CACHE_KEY: LOOKUP_CACHE.to_context(),
+                                     EVENTS_SEARCHES_COUNT_KEY: len([offense_in_flight
+                                                                     for offense_in_flight in offenses_in_flight
+                                                                     if offense_in_flight.get('search_id')])})
 
-            demisto.createIncidents(incidents)
+            if incidents:
+                demisto.createIncidents(incidents)
 
         except Exception as e:
             demisto.error(str(e))
 
         finally:
-            time.sleep(FETCH_SLEEP)
+            # the events searches of the offenses in flight are checked again soon, new offenses are listed meanwhile
+            time.sleep(EVENTS_INTERVAL_SECS if offenses_in_flight else FETCH_SLEEP)
 
 
 def qradar_offenses_list_command(client: Client, args: Dict) -> CommandResults:
@@ -2648,6 +2934,7 @@ def get_remote_data_command(client: Client, params: Dict[str, Any], args: Dict)
         return GetRemoteDataResponse({'id': offense_id, 'in_mirror_error': ''}, [])
 
     demisto.debug(f'Updating offense. Offense last update was {offense_last_update}')
+    LOOKUP_CACHE.load_context(get_integration_context().get(LOOKUP_CACHE_KEY, {}))
     entries = []
     if offense.get('status') == 'CLOSED' and argToBoolean(params.get('close_incident', False)):
         demisto.debug(f'Offense is closed: {offense}')
@@ -2712,8 +2999,10 @@ def get_modified_remote_data_command(client: Client, params: Dict[str, str],
     new_modified_records_ids = [str(offense.get('id')) for offense in offenses if 'id' in offense]
 
     current_last_update = ctx.get('last_mirror_update') if not offenses else offenses[-1].get('last_persisted_time')
-    set_integration_context({'samples': ctx.get('samples', []), 'last_mirror_update': current_last_update,
-                             LAST_FETCH_KEY: ctx.get(LAST_FETCH_KEY, 0)})
+    # only the mirroring key is updated, in the current context, as the long running execution keeps updating the rest
+    ctx = get_integration_context()
+    ctx['last_mirror_update'] = current_last_update
+    set_integration_context(ctx)
 
     return GetModifiedRemoteDataResponse(new_modified_records_ids)
 
@@ -10,7 +10,7 @@ import pytest
 import pytz
 
 import QRadar_v3  # import module separately for mocker
-from CommonServerPython import DemistoException, set_integration_context, CommandResults, \
+from CommonServerPython import DemistoException, set_integration_context, get_integration_context, CommandResults, \
     GetModifiedRemoteDataResponse, GetRemoteDataResponse
 from QRadar_v3 import USECS_ENTRIES, OFFENSE_OLD_NEW_NAMES_MAP, MINIMUM_API_VERSION, REFERENCE_SETS_OLD_NEW_MAP, \
     Client, RESET_KEY, ASSET_PROPERTIES_NAME_MAP, \
@@ -28,7 +28,8 @@ from QRadar_v3 import get_time_parameter, add_iso_entries_to_dict, build_final_o
     qradar_reference_set_delete_command, qradar_reference_set_value_upsert_command, \
     qradar_reference_set_value_delete_command, qradar_domains_list_command, qradar_geolocations_for_ip_command, \
     qradar_log_sources_list_command, qradar_get_custom_properties_command, enrich_asset_properties, \
-    flatten_nested_geolocation_values, get_modified_remote_data_command, get_remote_data_command, is_valid_ip
+    flatten_nested_geolocation_values, get_modified_remote_data_command, get_remote_data_command, is_valid_ip, \
+    advance_offense_events_search, get_incidents_pipelined_execution
 
 client = Client(
     server='https://192.168.0.1',
@@ -42,6 +43,11 @@ client = Client(
 )
 
 
+@pytest.fixture(autouse=True)
+def clear_lookup_cache():
+    QRadar_v3.LOOKUP_CACHE = QRadar_v3.LookupCache()
+
+
 def util_load_json(path):
     with io.open(path, mode='r', encoding='utf-8') as f:
         return json.loads(f.read())
@@ -890,6 +896,29 @@ def test_get_modified_remote_data_command(mocker):
     assert expected.modified_incident_ids == result.modified_incident_ids
 
 
+def test_get_modified_remote_data_command_keeps_offenses_in_flight(mocker):
+    """
+    Given:
+     - The long running execution updated the offenses in flight while the mirroring command ran.
+
+    When:
+     - Command 'get-modified-remote-data' saves the last mirror update time.
+
+    Then:
+     - Ensure the newer offenses in flight are not overwritten.
+    """
+    set_integration_context({QRadar_v3.OFFENSES_IN_FLIGHT_KEY: [{'id': 1}]})
+
+    def offenses_list(**_):
+        set_integration_context({QRadar_v3.OFFENSES_IN_FLIGHT_KEY: [{'id': 1}, {'id': 2}]})
+        return [{'id': 1, 'last_persisted_time': 1613399051536}]
+
+    mocker.patch.object(client, 'offenses_list', side_effect=offenses_list)
+    get_modified_remote_data_command(client, dict(), command_test_data['get_modified_remote_data']['args'])
+    assert get_integration_context() == {QRadar_v3.OFFENSES_IN_FLIGHT_KEY: [{'id': 1}, {'id': 2}],
+                                         'last_mirror_update': 1613399051536}
+
+
 @pytest.mark.parametrize('params, args, expected',
                          [
                              (dict(), {'lastUpdate': 1613399051537,
@@ -1054,3 +1083,151 @@ def test_validate_long_running_params():
         params_without_required_param = {k: v for k, v in LONG_RUNNING_REQUIRED_PARAMS.items() if k is not param_name}
         with pytest.raises(DemistoException):
             validate_long_running_params(params_without_required_param)
+
+
+@pytest.mark.parametrize('offense_in_flight, status, events, search_exception, expected_in_flight, with_events', [
+    # no search yet - search is created
+    ({'failures': 1}, None, None, None, {'search_id': 'search', 'failures': 0}, None),
+    # search is still running
+    ({'search_id': 'search'}, 'EXECUTE', None, None, {'search_id': 'search', 'failures': 0}, None),
+    # search is done with enough events
+    ({'search_id': 'search'}, 'COMPLETED', [{'a': 1}], None, {'search_id': 'search'}, True),
+    # search is done without enough events - searched again later
+    ({'search_id': 'search'}, 'COMPLETED', [], None, {'search_id': None, 'searches_made': 1, 'failures': 0}, None),
+    # search is done without enough events for the last time
+    ({'search_id': 'search', 'searches_made': 2}, 'COMPLETED', [], None, {'search_id': 'search', 'searches_made': 2},
+     False),
+    # failure - tried again later
+    ({'search_id': 'search'}, None, None, DemistoException('error'), {'search_id': 'search', 'failures': 1}, None),
+    # too many failures
+    ({'search_id': 'search', 'failures': 2}, None, None, DemistoException('error'),
+     {'search_id': 'search', 'failures': 2}, False),
+])
+def test_advance_offense_events_search(mocker, offense_in_flight, status, events, search_exception, expected_in_flight,
+                                       with_events):
+    """
+    Given:
+     - An offense in flight, in various states of its events search.
+
+    When:
+     - Advancing its events search by a single step.
+
+    Then:
+     - Ensure the state is updated as expected, and the offense is returned only when its events search is done.
+    """
+    offense = {'id': 16, 'event_count': 1, 'start_time': 1613399051536}
+    mocker.patch.object(client, 'search_create', return_value={'search_id': 'search'})
+    mocker.patch.object(client, 'search_status_get', return_value={'status': status},
+                        side_effect=search_exception)
+    mocker.patch.object(client, 'search_results_get', return_value={'events': events})
+    mocker.patch.object(client, 'offenses_list', return_value=offense)
+    mocker.patch.object(QRadar_v3.time, 'time', return_value=0)
+
+    state, done_offense = advance_offense_events_search(client, dict(offense_in_flight, id=16),
+                                                        'Fetch With All Events', event_columns_default_value,
+                                                        events_limit=20, max_retries=3)
+
+    state.pop('next_step_time', None)
+    assert state == dict(expected_in_flight, id=16)
+    if with_events is None:
+        assert done_offense is None
+    elif with_events:
+        assert done_offense == dict(offense, events=events)
+    else:
+        assert done_offense == offense
+
+
+def test_get_incidents_pipelined_execution(mocker):
+    """
+    Given:
+     - Two offenses in flight, one whose events search is done and one whose search is still running.
+
+    When:
+     - Running a cycle of the pipelined long running execution.
+
+    Then:
+     - Ensure new offenses are listed only up to the maximum offenses in flight.
+     - Ensure the done offense is returned as incident and the other one stays in flight.
+    """
+    set_integration_context({})
+    offenses_in_flight = [{'id': 1, 'search_id': 'done'}, {'id': 2, 'search_id': 'running'}]
+    offenses_list = mocker.patch.object(client, 'offenses_list', return_value=[{'id': 3}])
+    listed_offenses = {}
+
+    def advance(offense_in_flight, offense=None, **_):
+        listed_offenses[offense_in_flight['id']] = offense
+        if offense_in_flight.get('search_id') == 'done':
+            return offense_in_flight, {'id': offense_in_flight['id'], 'events': []}
+        return dict(offense_in_flight, search_id='running'), None
+
+    mocker.patch.object(QRadar_v3, 'advance_offense_events_search', side_effect=advance)
+    mocker.patch.object(QRadar_v3, 'enrich_offenses_result', side_effect=lambda _, offenses, *args: offenses)
+
+    incidents, highest_id, still_in_flight = get_incidents_pipelined_execution(
+        client, offenses_per_fetch=3, user_query='', fetch_mode='Fetch With All Events',
+        events_columns=event_columns_default_value, events_limit=20, ip_enrich=False, asset_enrich=False,
+        last_highest_id=2, incident_type=None, mirror_direction=None, offenses_in_flight=offenses_in_flight)
+
+    assert offenses_list.call_args[0][0] == 'items=0-0'
+    assert offenses_list.call_args[1]['filter_'] == 'id>2'
+    assert [json.loads(incident['rawJSON'])['id'] for incident in incidents] == [1]
+    assert highest_id == 3
+    assert still_in_flight == [{'id': 2, 'search_id': 'running'}, {'id': 3, 'search_id': 'running'}]
+    # only the offense listed in this cycle is passed, the others are retrieved by their IDs when needed
+    assert listed_offenses == {1: None, 2: None, 3: {'id': 3}}
+
+
+def test_long_running_execution_keeps_offenses_in_flight(mocker):
+    """
+    Given:
+     - A fresh instance, whose first offense is still searched for events.
+
+    When:
+     - Running a cycle of the long running execution which completes no incident.
+
+    Then:
+     - Ensure the offense in flight is saved in the integration context, so its search is not started again.
+    """
+    set_integration_context({})
+    mocker.patch.object(QRadar_v3, 'validate_long_running_params')
+    mocker.patch.object(QRadar_v3, 'is_reset_triggered', return_value=False)
+    mocker.patch.object(QRadar_v3, 'get_incidents_pipelined_execution',
+                        return_value=([], 0, [{'id': 1, 'search_id': 'running'}]))
+    mocker.patch.object(QRadar_v3.time, 'sleep', side_effect=StopIteration)
+    with pytest.raises(StopIteration):
+        QRadar_v3.long_running_execution_command(client, {'fetch_mode': 'Fetch With All Events',
+                                                          'offenses_per_fetch': '20'})
+    assert get_integration_context()[QRadar_v3.OFFENSES_IN_FLIGHT_KEY] == [{'id': 1, 'search_id': 'running'}]
+
+
+def test_lookup_cache(mocker):
+    """
+    Given:
+     - Offenses with rules, some of them already cached.
+
+    When:
+     - Getting the rules names of the offenses in two fetch cycles, and after the cached names expired.
+
+    Then:
+     - Ensure only the rules which are not cached are requested from QRadar.
+     - Ensure the cache is restored from the integration context.
+    """
+    rules_list = mocker.patch.object(client, 'rules_list',
+                                     side_effect=lambda _, __, filter_, ___: [
+                                         {'id': int(id_), 'name': f'rule {id_}'}
+                                         for id_ in filter_[len('id in ('):-1].split(',')])
+    mocker.patch.object(QRadar_v3.time, 'time', return_value=1000)
+    assert get_rules_names(client, [{'rules': [{'id': 1}, {'id': 2}]}]) == {1: 'rule 1', 2: 'rule 2'}
+    assert get_rules_names(client, [{'rules': [{'id': 2}, {'id': 3}]}]) == {2: 'rule 2', 3: 'rule 3'}
+    assert rules_list.call_args_list[1][0][2] == 'id in (3)'
+    assert (QRadar_v3.LOOKUP_CACHE.hits, QRadar_v3.LOOKUP_CACHE.misses) == (1, 3)
+
+    restored_cache = QRadar_v3.LookupCache()
+    restored_cache.load_context(json.loads(json.dumps(QRadar_v3.LOOKUP_CACHE.to_context())))
+    QRadar_v3.LOOKUP_CACHE = restored_cache
+    assert get_rules_names(client, [{'rules': [{'id': 1}]}]) == {1: 'rule 1'}
+    assert rules_list.call_count == 2
+
+    mocker.patch.object(QRadar_v3.time, 'time', return_value=1000 + QRadar_v3.LOOKUP_CACHE_TTL)
+    assert get_rules_names(client, [{'rules': [{'id': 1}]}]) == {1: 'rule 1'}
+    assert rules_list.call_count == 3
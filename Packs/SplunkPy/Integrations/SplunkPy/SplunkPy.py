@@ -17,6 +17,12 @@ import requests
 import urllib3
 import io
 import re
+import csv
+import shutil
+import tempfile
+import threading
+from Queue import Queue, Empty, Full
+from multiprocessing.pool import ThreadPool
 
 urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
 
@@ -35,6 +41,9 @@ FETCH_TIME = demisto.params().get('fetch_time')
 PROXIES = handle_proxy()
 TIME_UNIT_TO_MINUTES = {'minute': 1, 'hour': 60, 'day': 24 * 60, 'week': 7 * 24 * 60, 'month': 30 * 24 * 60,
                         'year': 365 * 24 * 60}
+# Number of downloaded result pages that may wait for the parser when streaming search results to a file
+STREAM_PREFETCH_PAGES = 2
+STREAM_CHUNK_SIZE = 64 * 1024
 
 # =========== Mirroring Mechanism Globals ===========
 MIRROR_DIRECTION = {
@@ -71,6 +80,13 @@ TYPE = 'type'
 ID = 'id'
 CREATION_TIME = 'creation_time'
 INCIDENT_CREATED = 'incident_created'
+ENRICHMENT_RESULTS = 'enrichment_results'
+SHARED_SEARCHES = 'shared_searches'
+# Number of enrichment jobs that are submitted or checked in parallel
+ENRICHMENT_CONCURRENCY = max(int(params.get('enrichment_concurrency') or 4), 1)
+# Enrichment types by the order in which their jobs are scheduled
+ENRICHMENT_PRIORITY = argToList(params.get('enrichment_priority')) or [DRILLDOWN_ENRICHMENT, ASSET_ENRICHMENT,
+                                                                       IDENTITY_ENRICHMENT]
 
 DRILLDOWN_REGEX = r'([^\s\$]+)=(\$[^\$]+\$)|(\$[^\$]+\$)'
 
@@ -197,23 +213,6 @@ class Enrichment:
         self.creation_time = creation_time if creation_time else datetime.utcnow().isoformat()
         self.status = status if status else Enrichment.IN_PROGRESS
 
-    @classmethod
-    def from_job(cls, enrichment_type, job):
-        """ Creates an Enrichment object from Splunk Job object
-
-        Args:
-            enrichment_type (str): The enrichment type
-            job (splunklib.client.Job): The corresponding Splunk Job
-
-        Returns:
-            The created enrichment (Enrichment)
-
-        """
-        if job:
-            return cls(enrichment_type=enrichment_type, enrichment_id=job["sid"])
-        else:
-            return cls(enrichment_type=enrichment_type, status=Enrichment.FAILED)
-
     @classmethod
     def from_json(cls, enrichment_dict):
         """ Deserialization method.
@@ -335,20 +334,6 @@ class Notable:
         return all(enrichment.status in Enrichment.HANDLED for enrichment in self.enrichments) or \
             any(enrichment.status == Enrichment.EXCEEDED_TIMEOUT for enrichment in self.enrichments)
 
-    def get_submitted_enrichments(self):
-        """ Returns indicators on whether each enrichment was submitted/failed or not initiated """
-        submitted_drilldown, submitted_asset, submitted_identity = False, False, False
-
-        for enrichment in self.enrichments:
-            if enrichment.type == DRILLDOWN_ENRICHMENT:
-                submitted_drilldown = True
-            elif enrichment.type == ASSET_ENRICHMENT:
-                submitted_asset = True
-            elif enrichment.type == IDENTITY_ENRICHMENT:
-                submitted_identity = True
-
-        return submitted_drilldown, submitted_asset, submitted_identity
-
     def get_occurred(self):
         """ Returns the occurred time, if not exists in data, returns the current fetch time """
         if '_time' in self.data:
@@ -427,12 +412,18 @@ class Cache:
     Attributes:
         not_yet_submitted_notables (list): The list of all notables that were fetched but not yet submitted.
         submitted_notables (list): The list of all submitted notables that needs to be handled.
+        enrichment_results (dict): The retrieved results of the enrichment jobs by their sid. The results of a job
+            are kept once, even when it is shared by the enrichments of several notables.
+        shared_searches (dict): The sid of each submitted enrichment search by the search key.
 
     """
 
-    def __init__(self, not_yet_submitted_notables=None, submitted_notables=None):
+    def __init__(self, not_yet_submitted_notables=None, submitted_notables=None, enrichment_results=None,
+                 shared_searches=None):
         self.not_yet_submitted_notables = not_yet_submitted_notables if not_yet_submitted_notables else []
         self.submitted_notables = submitted_notables if submitted_notables else []
+        self.enrichment_results = enrichment_results if enrichment_results else {}
+        self.shared_searches = shared_searches if shared_searches else {}
 
     def done_submitting(self):
         return not self.not_yet_submitted_notables
@@ -440,6 +431,12 @@ class Cache:
     def done_handling(self):
         return not self.submitted_notables
 
+    def fill_enrichments_data(self, notable):
+        """ Sets the retrieved results of the shared enrichment jobs in the enrichments of the given notable """
+        for enrichment in notable.enrichments:
+            if not enrichment.data and enrichment.status == Enrichment.SUCCESSFUL:
+                enrichment.data = self.enrichment_results.get(enrichment.id, [])
+
     def organize(self):
         """ This function is designated to handle unexpected behaviors in the enrichment mechanism.
          E.g. Connection error, instance disabling, etc...
@@ -474,6 +471,16 @@ class Cache:
         self.not_yet_submitted_notables = not_yet_submitted
         self.submitted_notables = submitted
 
+        for notable in handled_not_created_incident:
+            self.fill_enrichments_data(notable)
+
+        # drop the jobs that no remaining notable uses, to keep the integration context small, and the failed jobs,
+        # so their searches are submitted again for the next notables
+        used_sids = set(enrichment.id for notable in not_yet_submitted + submitted
+                        for enrichment in notable.enrichments if enrichment.status != Enrichment.FAILED)
+        self.enrichment_results = {sid: data for sid, data in self.enrichment_results.items() if sid in used_sids}
+        self.shared_searches = {key: sid for key, sid in self.shared_searches.items() if sid in used_sids}
+
         return handled_not_created_incident
 
     @classmethod
@@ -489,7 +496,9 @@ class Cache:
         """
         return cls(
             not_yet_submitted_notables=list(map(Notable.from_json, cache_dict.get(NOT_YET_SUBMITTED_NOTABLES, []))),
-            submitted_notables=list(map(Notable.from_json, cache_dict.get(SUBMITTED_NOTABLES, [])))
+            submitted_notables=list(map(Notable.from_json, cache_dict.get(SUBMITTED_NOTABLES, []))),
+            enrichment_results=cache_dict.get(ENRICHMENT_RESULTS),
+            shared_searches=cache_dict.get(SHARED_SEARCHES)
         )
 
     @classmethod
@@ -624,18 +633,15 @@ def get_drilldown_timeframe(notable_data, raw):
     return task_status, earliest_offset, latest_offset
 
 
-def drilldown_enrichment(service, notable_data, num_enrichment_events):
-    """ Performs a drilldown enrichment.
+def get_drilldown_search(notable_data):
+    """ Builds the search of a drilldown enrichment.
 
     Args:
-        service (splunklib.client.Service): Splunk service object.
         notable_data (dict): The notable data
-        num_enrichment_events (int): The maximal number of events to return per enrichment type.
 
-    Returns: The Splunk Job
+    Returns (str): The drilldown search query, or None if it can not be built for the notable
 
     """
-    job = None
     search = notable_data.get("drilldown_search", "")
 
     if search:
@@ -648,13 +654,9 @@ def drilldown_enrichment(service, notable_data, num_enrichment_events):
                     searchable_query = "latest={} ".format(latest_offset) + searchable_query
                 if "earliest" not in searchable_query:
                     searchable_query = "earliest={} ".format(earliest_offset) + searchable_query
-                kwargs = {"count": num_enrichment_events, "exec_mode": "normal"}
                 query = build_search_query({"query": searchable_query})
                 demisto.debug("Drilldown query for notable {}: {}".format(notable_data[EVENT_ID], query))
-                try:
-                    job = service.jobs.create(query, **kwargs)
-                except Exception as e:
-                    demisto.error("Caught an exception in drilldown_enrichment function: {}".format(str(e)))
+                return query
             else:
                 demisto.debug('Failed getting the drilldown timeframe for notable {}'.format(notable_data[EVENT_ID]))
         else:
@@ -663,70 +665,211 @@ def drilldown_enrichment(service, notable_data, num_enrichment_events):
     else:
         demisto.debug("drill-down was not configured for notable {}".format(notable_data[EVENT_ID]))
 
-    return job
+    return None
 
 
-def identity_enrichment(service, notable_data, num_enrichment_events):
-    """ Performs an identity enrichment.
+def get_identity_search(notable_data):
+    """ Builds the search of an identity enrichment.
 
     Args:
-        service (splunklib.client.Service): Splunk service object
         notable_data (dict): The notable data
-        num_enrichment_events (int): The maximal number of events to return per enrichment type.
 
-    Returns: The Splunk Job
+    Returns (str): The identity search query, or None if no users were found in the notable
 
     """
-    job = None
     error_msg = "Failed submitting identity enrichment request to Splunk for notable {}".format(notable_data[EVENT_ID])
     users = get_fields_query_part(
         notable_data=notable_data, prefix="identity", fields=["user", "src_user"], add_backslash=True
     )
 
     if users:
-        kwargs = {"count": num_enrichment_events, "exec_mode": "normal"}
         query = '| inputlookup identity_lookup_expanded where {}'.format(users)
         demisto.debug("Identity query for notable {}: {}".format(notable_data[EVENT_ID], query))
-        try:
-            job = service.jobs.create(query, **kwargs)
-        except Exception as e:
-            demisto.error("Caught an exception in drilldown_enrichment function: {}".format(str(e)))
-    else:
-        demisto.debug('No users were found in notable. {}'.format(error_msg))
+        return query
 
-    return job
+    demisto.debug('No users were found in notable. {}'.format(error_msg))
+    return None
 
 
-def asset_enrichment(service, notable_data, num_enrichment_events):
-    """ Performs an asset enrichment.
+def get_asset_search(notable_data):
+    """ Builds the search of an asset enrichment.
 
     Args:
-        service (splunklib.client.Service): Splunk service object
         notable_data (dict): The notable data
-        num_enrichment_events (int): The maximal number of events to return per enrichment type.
 
-    Returns: The Splunk Job
+    Returns (str): The asset search query, or None if no assets were found in the notable
 
     """
-    job = None
     error_msg = "Failed submitting asset enrichment request to Splunk for notable {}".format(notable_data[EVENT_ID])
     assets = get_fields_query_part(
         notable_data=notable_data, prefix="asset", fields=["src", "dest", "src_ip", "dst_ip"]
     )
 
     if assets:
-        kwargs = {"count": num_enrichment_events, "exec_mode": "normal"}
         query = '| inputlookup append=T asset_lookup_by_str where {} | inputlookup append=t asset_lookup_by_cidr ' \
                 'where {} | rename _key as asset_id | stats values(*) as * by asset_id'.format(assets, assets)
         demisto.debug("Asset query for notable {}: {}".format(notable_data[EVENT_ID], query))
-        try:
-            job = service.jobs.create(query, **kwargs)
-        except Exception as e:
-            demisto.error("Caught an exception in asset_enrichment function: {}".format(str(e)))
-    else:
-        demisto.debug('No assets were found in notable. {}'.format(error_msg))
+        return query
+
+    demisto.debug('No assets were found in notable. {}'.format(error_msg))
+    return None
+
+
+ENRICHMENT_TYPE_TO_SEARCH_BUILDER = {
+    DRILLDOWN_ENRICHMENT: get_drilldown_search,
+    ASSET_ENRICHMENT: get_asset_search,
+    IDENTITY_ENRICHMENT: get_identity_search
+}
+
+
+def get_enrichment_priority(enrichment_type):
+    """ Returns the scheduling priority of an enrichment type, lower values are scheduled first """
+    if enrichment_type in ENRICHMENT_PRIORITY:
+        return ENRICHMENT_PRIORITY.index(enrichment_type)
+    return len(ENRICHMENT_PRIORITY)
+
+
+def get_search_key(query):
+    """ Returns the key under which a submitted enrichment search is shared in the cache object """
+    return hashlib.md5(convert_to_str(query)).hexdigest()
+
+
+def run_enrichment_tasks(task, items):
+    """ Runs the task on each of the items, with up to ENRICHMENT_CONCURRENCY items in parallel.
+    The items are started in the given order, and the results are returned in the same order.
+    The task runs outside of the main thread, so it must not call demisto functions.
+
+    Args:
+        task (function): The function to run on each item.
+        items (list): The items.
+
+    Returns (list): The results of the task for each of the items.
+
+    """
+    if ENRICHMENT_CONCURRENCY == 1 or len(items) <= 1:
+        return [task(item) for item in items]
+
+    pool = ThreadPool(min(ENRICHMENT_CONCURRENCY, len(items)))
+    try:
+        return pool.map(task, items, chunksize=1)
+    finally:
+        pool.close()
+        pool.join()
+
+
+def create_enrichment_job(service, query, num_enrichment_events):
+    """ Submits an enrichment search to Splunk.
+
+    Args:
+        service (splunklib.client.Service): Splunk service object.
+        query (str): The enrichment search query.
+        num_enrichment_events (int): The maximal number of events to return per enrichment type.
+
+    Returns: A tuple of the job's sid and the error message, one of them is None
+
+    """
+    try:
+        job = service.jobs.create(query, count=num_enrichment_events, exec_mode="normal")
+        return job.sid, None
+    except Exception as e:
+        return None, str(e)
+
+
+def get_enrichment_job_results(service, sid):
+    """ Retrieves the results of a submitted enrichment job.
+
+    Args:
+        service (splunklib.client.Service): Splunk service object.
+        sid (str): The job's sid.
+
+    Returns: A tuple of the job's results (None if the job is not ready yet) and the error message
+
+    """
+    try:
+        job = client.Job(service=service, sid=sid)
+        if not job.is_ready():
+            return None, None
+        return list(results.ResultsReader(job.results())), None
+    except Exception as e:
+        return None, str(e)
+
+
+def submit_enrichments(service, notables, num_enrichment_events, cache_object):
+    """ Submits the missing enrichments of the given notables to Splunk. The enrichment searches are submitted by
+     the priority of their type, and identical searches share a single Splunk job, also with the jobs that were
+     submitted in previous fetches and are still in use.
+
+    Args:
+        service (splunklib.client.Service): Splunk service object
+        notables (list): The notables to submit.
+        num_enrichment_events (int): The maximal number of events to return per enrichment type.
+        cache_object (Cache): The enrichment mechanism cache object
+
+    """
+    enrichments_to_submit = []
+    for notable in notables:
+        submitted_types = [enrichment.type for enrichment in notable.enrichments]
+        for enrichment_type in ENABLED_ENRICHMENTS:
+            if enrichment_type not in submitted_types:
+                query = ENRICHMENT_TYPE_TO_SEARCH_BUILDER[enrichment_type](notable.data)
+                enrichments_to_submit.append((notable, enrichment_type, query))
+    enrichments_to_submit.sort(key=lambda enrichment: get_enrichment_priority(enrichment[1]))
+
+    new_searches = []  # type: List[str]
+    for _, _, query in enrichments_to_submit:
+        if query and get_search_key(query) not in cache_object.shared_searches and query not in new_searches:
+            new_searches.append(query)
+
+    jobs = run_enrichment_tasks(lambda query: create_enrichment_job(service, query, num_enrichment_events),
+                                new_searches)
+    for query, (sid, error) in zip(new_searches, jobs):
+        if sid:
+            cache_object.shared_searches[get_search_key(query)] = sid
+        else:
+            demisto.error("Caught an exception while submitting the enrichment search {}: {}".format(query, error))
+    if len(new_searches) < len(enrichments_to_submit):
+        demisto.debug('Submitted {} enrichment searches for {} enrichments'.format(
+            len(new_searches), len(enrichments_to_submit)))
+
+    for notable, enrichment_type, query in enrichments_to_submit:
+        sid = cache_object.shared_searches.get(get_search_key(query)) if query else None
+        if sid:
+            notable.enrichments.append(Enrichment(enrichment_type=enrichment_type, enrichment_id=sid))
+        else:
+            notable.enrichments.append(Enrichment(enrichment_type=enrichment_type, status=Enrichment.FAILED))
+
+
+def retrieve_enrichments_results(service, notables, cache_object):
+    """ Retrieves the results of the ready enrichment jobs of the given notables into the cache object.
+    Jobs are checked by the priority of their enrichment type, and each shared job is checked once.
+
+    Args:
+        service (splunklib.client.Service): Splunk service object.
+        notables (list): The notables that their enrichments should be handled.
+        cache_object (Cache): The enrichment mechanism cache object
+
+    Returns (dict): The error messages of the failed jobs by their sid
+
+    """
+    in_progress_enrichments = sorted(
+        (get_enrichment_priority(enrichment.type), enrichment.id) for notable in notables
+        for enrichment in notable.enrichments
+        if enrichment.status == Enrichment.IN_PROGRESS and enrichment.id not in cache_object.enrichment_results
+    )
+    sids = []  # type: List[str]
+    for _, sid in in_progress_enrichments:
+        if sid not in sids:
+            sids.append(sid)
+
+    failed_jobs = {}
+    jobs_results = run_enrichment_tasks(lambda sid: get_enrichment_job_results(service, sid), sids)
+    for sid, (job_results, error) in zip(sids, jobs_results):
+        if error:
+            failed_jobs[sid] = error
+        elif job_results is not None:
+            cache_object.enrichment_results[sid] = job_results
 
-    return job
+    return failed_jobs
 
 
 def handle_submitted_notables(service, incidents, cache_object):
@@ -745,9 +888,18 @@ def handle_submitted_notables(service, incidents, cache_object):
     total = len(notables)
     demisto.debug("Trying to handle {}/{} open enrichments".format(len(notables[:MAX_HANDLE_NOTABLES]), total))
 
-    for notable in notables[:MAX_HANDLE_NOTABLES]:
-        task_status = handle_submitted_notable(service, notable, enrichment_timeout)
+    exceeding_timeout = [notable.is_enrichment_process_exceeding_timeout(enrichment_timeout)
+                         for notable in notables[:MAX_HANDLE_NOTABLES]]
+    failed_jobs = retrieve_enrichments_results(
+        service, [notable for notable, exceeding in zip(notables, exceeding_timeout) if not exceeding], cache_object
+    )
+    cache_object.shared_searches = {key: sid for key, sid in cache_object.shared_searches.items()
+                                    if sid not in failed_jobs}
+
+    for notable, exceeding in zip(notables, exceeding_timeout):
+        task_status = handle_submitted_notable(notable, exceeding, enrichment_timeout, cache_object, failed_jobs)
         if task_status:
+            cache_object.fill_enrichments_data(notable)
             incidents.append(notable.to_incident())
             handled_notables.append(notable)
 
@@ -757,13 +909,15 @@ def handle_submitted_notables(service, incidents, cache_object):
         demisto.debug("Handled {}/{} notables.".format(len(handled_notables), total))
 
 
-def handle_submitted_notable(service, notable, enrichment_timeout):
+def handle_submitted_notable(notable, exceeding_timeout, enrichment_timeout, cache_object, failed_jobs):
     """ Handles submitted notable. If enrichment process timeout has reached, creates an incident.
 
     Args:
-        service (splunklib.client.Service): Splunk service object
         notable (Notable): The notable
+        exceeding_timeout (bool): Whether the enrichment process of the notable exceeded the timeout
         enrichment_timeout (int): The timeout for the enrichment process
+        cache_object (Cache): The enrichment mechanism cache object, holding the retrieved enrichment results
+        failed_jobs (dict): The error messages of the failed enrichment jobs by their sid
 
     Returns:
         notable_status (str): The status of the notable
@@ -771,21 +925,17 @@ def handle_submitted_notable(service, notable, enrichment_timeout):
     """
     task_status = False
 
-    if not notable.is_enrichment_process_exceeding_timeout(enrichment_timeout):
+    if not exceeding_timeout:
         demisto.debug("Trying to handle open enrichment {}".format(notable.id))
         for enrichment in notable.enrichments:
             if enrichment.status == Enrichment.IN_PROGRESS:
-                try:
-                    job = client.Job(service=service, sid=enrichment.id)
-                    if job.is_ready():
-                        demisto.debug('Handling open {} enrichment for notable {}'.format(enrichment.type, notable.id))
-                        for item in results.ResultsReader(job.results()):
-                            enrichment.data.append(item)
-                        enrichment.status = Enrichment.SUCCESSFUL
-                except Exception as e:
+                if enrichment.id in failed_jobs:
                     demisto.error("Caught an exception while retrieving {} enrichment results for notable {}: "
-                                  "{}".format(enrichment.type, notable.id, str(e)))
+                                  "{}".format(enrichment.type, notable.id, failed_jobs[enrichment.id]))
                     enrichment.status = Enrichment.FAILED
+                elif enrichment.id in cache_object.enrichment_results:
+                    demisto.debug('Handling open {} enrichment for notable {}'.format(enrichment.type, notable.id))
+                    enrichment.status = Enrichment.SUCCESSFUL
 
         if notable.handled():
             task_status = True
@@ -817,9 +967,10 @@ def submit_notables(service, incidents, cache_object):
     if notables:
         demisto.debug('Enriching {}/{} fetched notables'.format(len(notables[:MAX_SUBMIT_NOTABLES]), total))
 
+    submit_enrichments(service, notables[:MAX_SUBMIT_NOTABLES], num_enrichment_events, cache_object)
+
     for notable in notables[:MAX_SUBMIT_NOTABLES]:
-        task_status = submit_notable(service, notable, num_enrichment_events)
-        if task_status:
+        if notable.submitted():
             cache_object.submitted_notables.append(notable)
             submitted_notables.append(notable)
             demisto.debug('Submitted enrichment request to Splunk for notable {}'.format(notable.id))
@@ -838,35 +989,6 @@ def submit_notables(service, incidents, cache_object):
                       'enrichment.'.format(len(failed_notables), [notable.id for notable in failed_notables]))
 
 
-def submit_notable(service, notable, num_enrichment_events):
-    """ Submits fetched notable to Splunk for an Enrichment. Three enrichments possible: Drilldown, Asset & Identity.
-     If all enrichment type executions were unsuccessful, creates a regular incident, Otherwise updates the
-     integration context for the next fetch to handle the submitted notable.
-
-    Args:
-        service (splunklib.client.Service): Splunk service object
-        notable (Notable): The notable.
-        num_enrichment_events (int): The maximal number of events to return per enrichment type.
-
-    Returns:
-        task_status (bool): True if any of the enrichment's succeeded to be submitted to Splunk, False otherwise
-
-    """
-    submitted_drilldown, submitted_asset, submitted_identity = notable.get_submitted_enrichments()
-
-    if DRILLDOWN_ENRICHMENT in ENABLED_ENRICHMENTS and not submitted_drilldown:
-        job = drilldown_enrichment(service, notable.data, num_enrichment_events)
-        notable.enrichments.append(Enrichment.from_job(DRILLDOWN_ENRICHMENT, job))
-    if ASSET_ENRICHMENT in ENABLED_ENRICHMENTS and not submitted_asset:
-        job = asset_enrichment(service, notable.data, num_enrichment_events)
-        notable.enrichments.append(Enrichment.from_job(ASSET_ENRICHMENT, job))
-    if IDENTITY_ENRICHMENT in ENABLED_ENRICHMENTS and not submitted_identity:
-        job = identity_enrichment(service, notable.data, num_enrichment_events)
-        notable.enrichments.append(Enrichment.from_job(IDENTITY_ENRICHMENT, job))
-
-    return notable.submitted()
-
-
 def run_enrichment_mechanism(service, integration_context):
     """ Execute the enriching fetch mechanism
     1. We first handle submitted notables that have not been handled in the last fetch run
@@ -1654,30 +1776,216 @@ def get_current_results_batch(search_job, batch_size, results_offset):
     return results_batch
 
 
+def parse_search_result_item(item, app):
+    """ Parses a single item read from the search results.
+
+    Returns a tuple of the parsed item and its DBot score, each of them is None when not relevant for the item.
+    """
+    if isinstance(item, results.Message):
+        if "Error in" in item.message:
+            raise ValueError(item.message)
+        return convert_to_str(item.message), None
+
+    if isinstance(item, dict):
+        dbot_score = None
+        if demisto.get(item, 'host'):
+            dbot_score = {'Indicator': item['host'], 'Type': 'hostname',
+                          'Vendor': 'Splunk', 'Score': 0, 'isTypedIndicator': True}
+        if app:
+            item['app'] = app
+        # Normal events are returned as dicts
+        return item, dbot_score
+
+    return None, None
+
+
 def parse_batch_of_results(current_batch_of_results, max_results_to_add, app):
     parsed_batch_results = []
     batch_dbot_scores = []
     results_reader = results.ResultsReader(io.BufferedReader(ResponseReaderWrapper(current_batch_of_results)))
     for item in results_reader:
-        if isinstance(item, results.Message):
-            if "Error in" in item.message:
-                raise ValueError(item.message)
-            parsed_batch_results.append(convert_to_str(item.message))
-
-        elif isinstance(item, dict):
-            if demisto.get(item, 'host'):
-                batch_dbot_scores.append({'Indicator': item['host'], 'Type': 'hostname',
-                                          'Vendor': 'Splunk', 'Score': 0, 'isTypedIndicator': True})
-            if app:
-                item['app'] = app
-            # Normal events are returned as dicts
-            parsed_batch_results.append(item)
+        parsed_item, dbot_score = parse_search_result_item(item, app)
+        if dbot_score:
+            batch_dbot_scores.append(dbot_score)
+        if parsed_item is not None:
+            parsed_batch_results.append(parsed_item)
 
         if len(parsed_batch_results) >= max_results_to_add:
             break
     return parsed_batch_results, batch_dbot_scores
 
 
+class SearchResultsFileWriter(object):
+    """ Writes search results to an open file one at a time, either as JSON lines or as CSV rows.
+    As the results of a search may have different fields, the CSV rows are spooled to a temporary file until
+    the writer is closed, and the CSV columns are all the fields of the written results.
+    """
+
+    def __init__(self, output_file, file_format='jsonl'):
+        self.output_file = output_file
+        self.file_format = file_format
+        self.csv_fieldnames = []  # type: List[str]
+        self.csv_fieldnames_set = set()  # type: Set[str]
+        self.csv_spool = tempfile.TemporaryFile() if file_format == 'csv' else None  # type: Any
+
+    def write(self, parsed_item):
+        if self.file_format == 'csv':
+            self.spool_csv_row(parsed_item)
+        else:
+            self.output_file.write(json.dumps(parsed_item) + '\n')
+
+    def spool_csv_row(self, parsed_item):
+        if not isinstance(parsed_item, dict):
+            # search messages have no fields to fill the columns with
+            return
+        row = [(convert_to_str(key), json.dumps(value) if isinstance(value, (list, dict)) else convert_to_str(value))
+               for key, value in parsed_item.items()]
+        for key, _ in row:
+            if key not in self.csv_fieldnames_set:
+                self.csv_fieldnames_set.add(key)
+                self.csv_fieldnames.append(key)
+        self.csv_spool.write(json.dumps(dict(row)) + '\n')
+
+    def close(self):
+        """ Writes the spooled CSV rows to the output file, under a header of all their fields """
+        if self.csv_spool is None:
+            return
+        try:
+            if self.csv_fieldnames:
+                csv_writer = csv.DictWriter(self.output_file, fieldnames=self.csv_fieldnames)
+                csv_writer.writeheader()
+                self.csv_spool.seek(0)
+                for line in self.csv_spool:
+                    csv_writer.writerow({convert_to_str(key): convert_to_str(value)
+                                         for key, value in json.loads(line).items()})
+        finally:
+            self.csv_spool.close()
+            self.csv_spool = None
+
+
+def put_until_stopped(pages_queue, page, stop_event):
+    while not stop_event.is_set():
+        try:
+            pages_queue.put(page, timeout=1)
+            return True
+        except Full:
+            continue
+    return False
+
+
+def close_result_page(page):
+    if hasattr(page, 'close'):
+        page.close()
+
+
+def download_search_results_pages(search_job, batch_size, results_to_fetch, pages_queue, stop_event):
+    """ Downloads the search results page by page into temporary files and passes them to the parser.
+    As the queue is bounded, the download stops when the parser falls STREAM_PREFETCH_PAGES pages behind.
+    An exception raised while downloading is passed through the queue, None marks the last page.
+    """
+    try:
+        for results_offset in range(0, results_to_fetch, batch_size):
+            if stop_event.is_set():
+                return
+            current_batch_of_results = get_current_results_batch(search_job, batch_size, results_offset)
+            page = tempfile.TemporaryFile()
+            try:
+                shutil.copyfileobj(current_batch_of_results, page, STREAM_CHUNK_SIZE)
+            finally:
+                current_batch_of_results.close()
+            page.seek(0)
+            if not put_until_stopped(pages_queue, page, stop_event):
+                page.close()
+                return
+        put_until_stopped(pages_queue, None, stop_event)
+    except Exception as e:
+        put_until_stopped(pages_queue, e, stop_event)
+
+
+def stream_search_results(search_job, results_to_fetch, batch_size, app, writer, preview_limit):
+    """ Writes the search results with the given writer while the next pages are downloaded in the background,
+    so only the page being parsed and the prefetched pages are held at any time.
+
+    Returns the number of written results, the first preview_limit results and their DBot scores.
+    """
+    pages_queue = Queue(maxsize=STREAM_PREFETCH_PAGES)
+    stop_event = threading.Event()
+    downloader = threading.Thread(target=download_search_results_pages,
+                                  args=(search_job, batch_size, results_to_fetch, pages_queue, stop_event))
+    downloader.daemon = True
+    downloader.start()
+
+    written_results = 0
+    preview_results = []  # type: List[Any]
+    preview_dbot_scores = []  # type: List[Dict[str,Any]]
+    try:
+        while written_results < results_to_fetch:
+            page = pages_queue.get()
+            if page is None:
+                break
+            if isinstance(page, Exception):
+                raise page
+            try:
+                for item in results.ResultsReader(page):
+                    parsed_item, dbot_score = parse_search_result_item(item, app)
+                    if parsed_item is None:
+                        continue
+                    writer.write(parsed_item)
+                    if written_results < preview_limit:
+                        preview_results.append(parsed_item)
+                        if dbot_score:
+                            preview_dbot_scores.append(dbot_score)
+                    written_results += 1
+                    if written_results >= results_to_fetch:
+                        break
+            finally:
+                page.close()
+    finally:
+        stop_event.set()
+        while True:
+            try:
+                close_result_page(pages_queue.get_nowait())
+            except Empty:
+                break
+
+    return written_results, preview_results, preview_dbot_scores
+
+
+def splunk_search_to_file(args, search_job, results_to_fetch, batch_size, app):
+    file_format = args.get('file_format', 'jsonl')
+    if file_format not in ('jsonl', 'csv'):
+        raise ValueError('Unsupported file format "{}", use one of: jsonl, csv.'.format(file_format))
+    preview_limit = int(args.get('preview_limit', 50))
+
+    file_name = 'splunk_search_results.{}'.format(file_format)
+    temp_file_name = demisto.uniqueFile()
+    with open(demisto.investigation()['id'] + '_' + temp_file_name, 'wb') as output_file:
+        writer = SearchResultsFileWriter(output_file, file_format)
+        try:
+            written_results, preview_results, preview_dbot_scores = stream_search_results(
+                search_job, results_to_fetch, batch_size, app, writer, preview_limit)
+        finally:
+            writer.close()
+
+    demisto.results({
+        'Contents': '',
+        'ContentsFormat': formats['text'],
+        'Type': entryTypes['file'],
+        'File': file_name,
+        'FileID': temp_file_name
+    })
+
+    human_readable = '{} search results were written to {}, showing the first {}.\n'.format(
+        written_results, file_name, len(preview_results))
+    demisto.results({
+        "Type": 1,
+        "Contents": preview_results,
+        "ContentsFormat": "json",
+        "EntryContext": create_entry_context(args, preview_results, preview_dbot_scores),
+        "HumanReadable": human_readable + build_search_human_readable(args, preview_results)
+    })
+
+
 def splunk_search_command(service):
     args = demisto.args()
 
@@ -1692,6 +2000,11 @@ def splunk_search_command(service):
         results_limit = float("inf")
     batch_size = int(demisto.args().get("batch_limit", 25000))
 
+    if argToBoolean(args.get('stream_to_file', 'false')):
+        results_to_fetch = int(min(int(num_of_results_from_query), results_limit))
+        splunk_search_to_file(args, search_job, results_to_fetch, batch_size, search_kwargs.get('app', ''))
+        return
+
     results_offset = 0
     total_parsed_results = []  # type: List[Dict[str,Any]]
     dbot_scores = []  # type: List[Dict[str,Any]]
@@ -4,6 +4,9 @@ import SplunkPy as splunk
 import demistomock as demisto
 from CommonServerPython import *
 from datetime import timedelta, datetime
+from StringIO import StringIO
+import json
+import re
 
 RETURN_ERROR_TARGET = 'SplunkPy.return_error'
 
@@ -1068,3 +1071,171 @@ def test_build_search_human_readable(mocker):
     splunk.build_search_human_readable(args, results)
     headers = func_patch.call_args[0][1]
     assert headers == expected_headers
+
+
+class FakeSearchJob:
+    def __init__(self, events):
+        self.events = events
+
+    def results(self, count, offset):
+        page = self.events[offset:offset + count]
+        return StringIO(''.join(json.dumps(event) + '\n' for event in page))
+
+
+@pytest.mark.parametrize('file_format, results_to_fetch, expected_file', [
+    ('jsonl', 5, '{"host": "h0", "id": 0}\n{"host": "h1", "id": 1}\n{"host": "h2", "id": 2}\n'
+                 '{"host": "h3", "id": 3}\n{"host": "h4", "id": 4}\n'),
+    ('csv', 3, 'host,id\r\nh0,0\r\nh1,1\r\nh2,2\r\n'),
+])
+def test_stream_search_results(file_format, results_to_fetch, expected_file, mocker):
+    """
+    Given:
+        a search job with 5 results, downloaded in pages of 2 results
+
+    When:
+        streaming the results to a file as part of splunk-search
+
+    Then:
+        Test all the requested results are written to the file in the requested format,
+        and only the preview results and their DBot scores are returned
+    """
+    from collections import OrderedDict
+    events = [OrderedDict([('host', 'h{}'.format(i)), ('id', i)]) for i in range(5)]
+    mocker.patch('SplunkPy.results.ResultsReader',
+                 side_effect=lambda page: [json.loads(line, object_pairs_hook=OrderedDict) for line in page])
+    output_file = StringIO()
+
+    writer = splunk.SearchResultsFileWriter(output_file, file_format)
+    written_results, preview_results, preview_dbot_scores = splunk.stream_search_results(
+        FakeSearchJob(events), results_to_fetch, 2, '', writer, 2)
+    writer.close()
+
+    assert written_results == results_to_fetch
+    assert output_file.getvalue() == expected_file
+    assert preview_results == events[:2]
+    assert [score['Indicator'] for score in preview_dbot_scores] == ['h0', 'h1']
+
+
+def test_search_results_file_writer_csv_fields():
+    """
+    Given:
+        search results with different fields, and a search message
+
+    When:
+        writing the results to a CSV file
+
+    Then:
+        Test the CSV columns are all the fields of the results, in the order they were first seen
+    """
+    from collections import OrderedDict
+    output_file = StringIO()
+    writer = splunk.SearchResultsFileWriter(output_file, 'csv')
+    writer.write(OrderedDict([('host', 'h0'), ('id', 0)]))
+    writer.write('a search message')
+    writer.write(OrderedDict([('host', 'h1'), ('user', 'bob'), ('tags', ['a', 'b'])]))
+    writer.close()
+
+    assert output_file.getvalue() == 'host,id,user,tags\r\nh0,0,,\r\nh1,,bob,"[""a"", ""b""]"\r\n'
+
+
+class FakeEnrichmentJob:
+    ready_sids = set()
+    failed_sids = set()
+
+    def __init__(self, service, sid):
+        self.sid = sid
+
+    def is_ready(self):
+        if self.sid in self.failed_sids:
+            raise Exception('Search job {} failed'.format(self.sid))
+        return self.sid in self.ready_sids
+
+    def results(self):
+        return [{'result_of': self.sid}]
+
+
+def test_enrichment_scheduler_shares_identical_searches(mocker):
+    """
+    Given:
+        three fetched notables, two of them of the same user
+
+    When:
+        submitting the notables for enrichment and handling them in the following fetch
+
+    Then:
+        Test identical searches are submitted once, the jobs results are shared between the notables
+        and the cache object drops the jobs once no notable uses them
+    """
+    mocker.patch.object(splunk, 'ENABLED_ENRICHMENTS', [splunk.ASSET_ENRICHMENT, splunk.IDENTITY_ENRICHMENT])
+    mocker.patch.object(splunk.client, 'Job', FakeEnrichmentJob)
+    mocker.patch.object(FakeEnrichmentJob, 'ready_sids', {'bob', '1.1.1.0', '1.1.1.1', '1.1.1.2'})
+    mocker.patch('SplunkPy.results.ResultsReader', side_effect=lambda job_results: job_results)
+    service = mocker.Mock()
+    # the sid of each job is the first value searched by its query
+    service.jobs.create.side_effect = lambda query, **kwargs: mocker.Mock(sid=re.findall(r'="([^"]+)"', query)[0])
+    cache = splunk.Cache(not_yet_submitted_notables=[
+        splunk.Notable({splunk.EVENT_ID: 'e{}'.format(i), 'user': user, 'src': '1.1.1.{}'.format(i), '_time': 'time'})
+        for i, user in enumerate(['bob', 'bob', 'alice'])
+    ])
+    incidents = []
+
+    splunk.submit_notables(service, incidents, cache)
+
+    assert service.jobs.create.call_count == 5
+    assert [[e.id for e in notable.enrichments] for notable in cache.submitted_notables] == \
+        [['1.1.1.0', 'bob'], ['1.1.1.1', 'bob'], ['1.1.1.2', 'alice']]
+
+    splunk.handle_submitted_notables(service, incidents, cache)
+
+    assert len(incidents) == 2
+    assert json.loads(incidents[1]['rawJSON'])[splunk.IDENTITY_ENRICHMENT] == [{'result_of': 'bob'}]
+    assert [notable.id for notable in cache.submitted_notables] == ['e2']
+
+    cache.organize()
+    assert list(cache.enrichment_results.keys()) == ['1.1.1.2']
+    assert sorted(cache.shared_searches.values()) == ['1.1.1.2', 'alice']
+
+
+def test_enrichment_scheduler_resubmits_failed_searches(mocker):
+    """
+    Given:
+        a submitted notable whose enrichment job failed, and a notable of the same user which is still in progress
+
+    When:
+        handling the submitted notables and submitting a new notable of the same user
+
+    Then:
+        Test the failed job is not shared anymore and the search of the new notable is submitted again
+    """
+    mocker.patch.object(splunk, 'ENABLED_ENRICHMENTS', [splunk.IDENTITY_ENRICHMENT])
+    mocker.patch.object(splunk.client, 'Job', FakeEnrichmentJob)
+    mocker.patch.object(FakeEnrichmentJob, 'failed_sids', {'bob'})
+    service = mocker.Mock()
+    service.jobs.create.side_effect = lambda query, **kwargs: mocker.Mock(sid=re.findall(r'="([^"]+)"', query)[0])
+    cache = splunk.Cache(not_yet_submitted_notables=[
+        splunk.Notable({splunk.EVENT_ID: 'e0', 'user': 'bob', '_time': 'time'})
+    ])
+    incidents = []
+
+    splunk.submit_notables(service, incidents, cache)
+    splunk.handle_submitted_notables(service, incidents, cache)
+    cache.organize()
+
+    assert len(incidents) == 1
+    assert cache.shared_searches == {}
+
+    mocker.patch.object(FakeEnrichmentJob, 'failed_sids', set())
+    cache.not_yet_submitted_notables.append(splunk.Notable({splunk.EVENT_ID: 'e1', 'user': 'bob', '_time': 'time'}))
+    splunk.submit_notables(service, incidents, cache)
+
+    assert service.jobs.create.call_count == 2
+    assert [e.status for e in cache.submitted_notables[0].enrichments] == [splunk.Enrichment.IN_PROGRESS]
+
+
+@pytest.mark.parametrize('enrichment_priority, expected_order', [
+    (['Drilldown', 'Asset', 'Identity'], ['Drilldown', 'Asset', 'Identity']),
+    (['Identity'], ['Identity', 'Drilldown', 'Asset']),
+])
+def test_get_enrichment_priority(enrichment_priority, expected_order, mocker):
+    mocker.patch.object(splunk, 'ENRICHMENT_PRIORITY', enrichment_priority)
+    assert sorted(['Drilldown', 'Asset', 'Identity'], key=splunk.get_enrichment_priority) == expected_order
@@ -46,3 +46,60 @@ def test_main(mocker):
     assert results[0]['Type'] == entryTypes['note']
     assert results[0]['Contents'][0]['HasMatch']
     assert results[0]['Contents'][0]['Matches'][0]['RuleName'] == 'PE_file_identifier'
+
+
+def test_get_compiled_rules_cache(mocker, tmp_path):
+    """
+    Given:
+        - A rule which was already compiled once
+    When:
+        - Getting the compiled rules again
+    Then:
+        - Ensure the rules are loaded from the cache instead of being compiled
+    """
+    import yara
+    import YaraScan
+    mocker.patch.object(YaraScan, 'RULES_CACHE_DIR', str(tmp_path))
+    rule = 'rule MZ { strings: $MZ = "MZ" ascii condition: $MZ at 0 }'
+    YaraScan.get_compiled_rules(rule)
+    assert len(list(tmp_path.glob('yara_rules_*.yarc'))) == 1
+
+    compile_mock = mocker.patch.object(yara, 'compile')
+    rules = YaraScan.get_compiled_rules(rule)
+    assert not compile_mock.called
+    assert rules.match(filepath='test_data/unzip.exe')[0].rule == 'MZ'
+
+
+def test_main_multiple_files(mocker, tmp_path):
+    """
+    Given:
+        - Several files to scan, one of which does not exist, and an invalid rule
+    When:
+        - Running the script
+    Then:
+        - Ensure the results are in the order of the entry IDs, and errors are reported per file
+    """
+    import YaraScan
+    mocker.patch.object(YaraScan, 'RULES_CACHE_DIR', str(tmp_path))
+    paths = {'1': 'test_data/unzip.exe', '2': 'test_data/missing.exe', '3': 'test_data/unzip.exe'}
+
+    def executeCommand(name, args=None):
+        return [{'Type': entryTypes['note'], 'Contents': {'path': paths[args['id']], 'name': args['id'], 'ID': args['id']}}]
+
+    mocker.patch.object(demisto, 'executeCommand', side_effect=executeCommand)
+    mocker.patch.object(demisto, 'results')
+    mocker.patch.object(demisto, 'args', return_value={
+        'entryIDs': '1,2,3',
+        'yaraRule': 'rule MZ { strings: $MZ = "MZ" ascii condition: $MZ at 0 }',
+        'workers': '2'
+    })
+    main()
+    contents = demisto.results.call_args[0][0]['Contents']
+    assert [entry['entryID'] for entry in contents] == ['1', '2', '3']
+    assert [entry['HasMatch'] for entry in contents] == [True, False, True]
+    assert [entry['HasError'] for entry in contents] == [False, True, False]
+
+    mocker.patch.object(demisto, 'args', return_value={'entryIDs': '1,3', 'yaraRule': 'rule invalid {'})
+    main()
+    contents = demisto.results.call_args[0][0]['Contents']
+    assert all(entry['HasError'] and entry['Errors'] for entry in contents)
@@ -9,10 +9,15 @@ from pdf2image import convert_from_path
 import numpy as np
 from PIL import Image
 import tempfile
+from contextlib import contextmanager
 from io import BytesIO
+from multiprocessing.pool import ThreadPool
 import base64
 import time
+import shutil
+import signal
 import subprocess
+import threading
 import traceback
 import re
 import os
@@ -49,6 +54,14 @@ DEFAULT_CHROME_OPTIONS = [
 
 USER_CHROME_OPTIONS = demisto.params().get('chrome_options', "")
 
+# Browser pool: browsers which keep running between the commands executed in the same container
+USE_BROWSER_POOL = argToBoolean(demisto.params().get('use_browser_pool', False))
+BROWSER_POOL_SIZE = max(int(demisto.params().get('browser_pool_size') or 4), 1)
+BROWSER_MAX_JOBS = max(int(demisto.params().get('browser_max_jobs') or 100), 1)
+BROWSER_MAX_AGE = 60 * 60  # seconds
+BROWSER_POOL_STATE_FILE = f'{tempfile.gettempdir()}/rasterize_browser_pool.json'
+BROWSER_POOL_FIRST_PORT = 9300
+
 
 def return_err_or_warn(msg):
     return_error(msg) if WITH_ERRORS else return_warning(msg, exit=True)
@@ -87,28 +100,49 @@ def merge_options(default_options, user_options):
     return options
 
 
+class EmptyResponseError(Exception):
+    pass
+
+
+class DriverInitError(Exception):
+    pass
+
+
+class PdfGenerationError(Exception):
+    pass
+
+
 def check_response(driver):
     EMPTY_PAGE = '<html><head></head><body></body></html>'
     if driver.page_source == EMPTY_PAGE:
-        return_err_or_warn(EMPTY_RESPONSE_ERROR_MSG)
+        raise EmptyResponseError(EMPTY_RESPONSE_ERROR_MSG)
 
 
-def init_driver(offline_mode=False):
+def create_driver(offline_mode=False, debugger_address=None, extra_options=None):
     """
-    Creates headless Google Chrome Web Driver
+    Creates headless Google Chrome Web Driver. Raises DriverInitError on failure.
+    :param offline_mode: when set to True, will block any outgoing communication
+    :param debugger_address: the address of a running browser to attach to, instead of launching a new one
+    :param extra_options: chrome options to add to the default and user options
     """
     demisto.debug(f'Creating chrome driver. Mode: {"OFFLINE" if offline_mode else "ONLINE"}')
     try:
         chrome_options = webdriver.ChromeOptions()
-        for opt in merge_options(DEFAULT_CHROME_OPTIONS, USER_CHROME_OPTIONS):
-            chrome_options.add_argument(opt)
+        if debugger_address:
+            chrome_options.add_experimental_option('debuggerAddress', debugger_address)
+        else:
+            for opt in merge_options(DEFAULT_CHROME_OPTIONS, USER_CHROME_OPTIONS) + (extra_options or []):
+                chrome_options.add_argument(opt)
+            if extra_options:
+                # keep the browser running when the driver is stopped
+                chrome_options.add_experimental_option('detach', True)
         driver = webdriver.Chrome(options=chrome_options, service_args=[
             f'--log-path={DRIVER_LOG}',
         ])
         if offline_mode:
             driver.set_network_conditions(offline=True, latency=5, throughput=500 * 1024)
     except Exception as ex:
-        return_error(f'Unexpected exception: {ex}\nTrace:{traceback.format_exc()}')
+        raise DriverInitError(f'Unexpected exception: {ex}\nTrace:{traceback.format_exc()}')
 
     demisto.debug('Creating chrome driver - COMPLETED')
     return driver
@@ -153,6 +187,241 @@ def quit_driver_and_reap_children(driver):
         demisto.error(f'Failed checking for zombie processes: {e}. Trace: {traceback.format_exc()}')
 
 
+class BrowserPool:
+    """
+    A bounded pool of headless browsers that keep running between the commands executed in the same container
+    (the docker python loop), so a job attaches to a warm browser instead of launching one.
+    Each job runs in its own browser context, which is disposed with its cookies and storage when the job is done.
+    A browser is restarted after BROWSER_MAX_JOBS jobs or BROWSER_MAX_AGE seconds to cap its memory usage.
+    As each command execution starts from scratch, the browsers are tracked in a state file.
+    """
+
+    def __init__(self, size=BROWSER_POOL_SIZE, max_jobs=BROWSER_MAX_JOBS, max_age=BROWSER_MAX_AGE,
+                 state_file=BROWSER_POOL_STATE_FILE):
+        self.size = size
+        self.max_jobs = max_jobs
+        self.max_age = max_age
+        self.state_file = state_file
+        self.condition = threading.Condition()
+        self.in_use = set()  # type: set
+        self.browsers = self.load_state()
+
+    def load_state(self):
+        try:
+            with open(self.state_file) as f:
+                return json.load(f)
+        except (IOError, ValueError):
+            return []
+
+    def save_state(self):
+        with open(self.state_file, 'w') as f:
+            json.dump([browser for browser in self.browsers if browser.get('started')], f)
+
+    @staticmethod
+    def is_alive(browser):
+        try:
+            return requests.get(f'http://127.0.0.1:{browser["port"]}/json/version', timeout=2).ok
+        except requests.exceptions.RequestException:
+            return False
+
+    def is_expired(self, browser):
+        return browser['jobs'] >= self.max_jobs or time.time() - browser['started'] > self.max_age
+
+    def free_port(self):
+        ports = {browser['port'] for browser in self.browsers}
+        return next(port for port in range(BROWSER_POOL_FIRST_PORT, BROWSER_POOL_FIRST_PORT + self.size + len(ports))
+                    if port not in ports)
+
+    def acquire(self):
+        """
+        Returns a browser of the pool for the exclusive use of the caller, launching one if needed
+        """
+        stale_browsers = []
+        with self.condition:
+            while True:
+                for browser in list(self.browsers):
+                    if browser['port'] not in self.in_use and browser.get('started'):
+                        if self.is_alive(browser) and not self.is_expired(browser):
+                            self.in_use.add(browser['port'])
+                            break
+                        self.browsers.remove(browser)
+                        stale_browsers.append(browser)
+                else:
+                    if len(self.browsers) < self.size:
+                        # reserve the slot, the browser is launched without holding the lock
+                        browser = {'port': self.free_port(), 'jobs': 0, 'started': None}
+                        self.browsers.append(browser)
+                        self.in_use.add(browser['port'])
+                        break
+                    self.condition.wait()
+                    continue
+                break
+
+        for stale_browser in stale_browsers:
+            self.stop_browser(stale_browser)
+        if browser.get('started'):
+            return browser
+
+        try:
+            self.launch_browser(browser)
+        except Exception:
+            self.release(browser, failed=True)
+            raise
+        return browser
+
+    def release(self, browser, failed=False):
+        """
+        Returns a browser to the pool, restarting it if it failed or expired
+        """
+        with self.condition:
+            self.in_use.discard(browser['port'])
+            if browser.get('started'):
+                browser['jobs'] += 1
+            restart = failed or not browser.get('started') or self.is_expired(browser)
+            if restart and browser in self.browsers:
+                self.browsers.remove(browser)
+            self.save_state()
+            self.condition.notify()
+
+        if restart:
+            self.stop_browser(browser)
+
+    def launch_browser(self, browser):
+        browser['profile'] = tempfile.mkdtemp(prefix='rasterize_browser_')
+        demisto.debug(f'Launching pooled browser on port {browser["port"]}')
+        driver = create_driver(extra_options=[f'--remote-debugging-port={browser["port"]}',
+                                              f'--user-data-dir={browser["profile"]}'])
+        # the browser is a child of chromedriver, its pid is kept to stop it if it stops answering
+        browser['pid'] = self.find_browser_pid(driver.service.process.pid, browser['port'])
+        # stop only the driver, the browser keeps running detached
+        driver.service.stop()
+        browser['started'] = time.time()
+        with self.condition:
+            self.save_state()
+
+    @staticmethod
+    def is_browser_process(pid, port):
+        try:
+            with open(f'/proc/{pid}/cmdline', 'rb') as f:
+                return f'--remote-debugging-port={port}'.encode() in f.read()
+        except (IOError, ValueError):
+            return False
+
+    def find_browser_pid(self, driver_pid, port):
+        ps_out = subprocess.check_output(['ps', '-o', 'pid=', '--ppid', str(driver_pid)],
+                                         stderr=subprocess.STDOUT, universal_newlines=True)
+        return next((int(pid) for pid in ps_out.split() if self.is_browser_process(pid, port)), None)
+
+    def stop_browser(self, browser):
+        demisto.debug(f'Stopping pooled browser on port {browser["port"]}')
+        if browser.get('started'):
+            try:
+                driver = create_driver(debugger_address=f'127.0.0.1:{browser["port"]}')
+                try:
+                    driver.execute_cdp_cmd('Browser.close', {})
+                except Exception:
+                    pass  # the connection is closed together with the browser
+                quit_driver_and_reap_children(driver)
+            except Exception as ex:
+                demisto.debug(f'Failed closing pooled browser on port {browser["port"]}: {ex}')
+        # a browser which does not answer is killed by its pid, if it was not replaced by another process
+        pid = browser.get('pid')
+        if pid and self.is_browser_process(pid, browser['port']):
+            try:
+                os.kill(pid, signal.SIGKILL)
+                os.waitpid(pid, os.WNOHANG)
+            except OSError as ex:
+                demisto.debug(f'Failed killing pooled browser process {pid}: {ex}')
+        if browser.get('profile'):
+            shutil.rmtree(browser['profile'], ignore_errors=True)
+
+    @contextmanager
+    def driver(self, offline_mode=False):
+        """
+        Yields a driver attached to a pooled browser, working in a new isolated browser context
+        """
+        browser = self.acquire()
+        failed = True
+        driver = None
+        try:
+            driver = create_driver(offline_mode, debugger_address=f'127.0.0.1:{browser["port"]}')
+            context_id = driver.execute_cdp_cmd('Target.createBrowserContext', {})['browserContextId']
+            handles = set(driver.window_handles)
+            driver.execute_cdp_cmd('Target.createTarget', {'url': 'about:blank', 'browserContextId': context_id})
+            driver.switch_to.window(next(handle for handle in driver.window_handles if handle not in handles))
+            try:
+                yield driver
+            finally:
+                # a page that failed to load does not fail the browser, as long as its context is disposed
+                driver.execute_cdp_cmd('Target.disposeBrowserContext', {'browserContextId': context_id})
+                failed = False
+        finally:
+            if driver:
+                # stop only the driver, the browser stays in the pool
+                driver.service.stop()
+            self.release(browser, failed=failed)
+
+
+BROWSER_POOL = None  # type: Optional[BrowserPool]
+
+
+def get_browser_pool():
+    global BROWSER_POOL
+    if BROWSER_POOL is None:
+        BROWSER_POOL = BrowserPool()
+    return BROWSER_POOL
+
+
+@contextmanager
+def browser_driver(offline_mode=False):
+    """
+    Yields a driver of a pooled browser if the browser pool is enabled, otherwise of a new browser
+    """
+    if USE_BROWSER_POOL:
+        with get_browser_pool().driver(offline_mode) as driver:
+            yield driver
+    else:
+        driver = create_driver(offline_mode)
+        try:
+            yield driver
+        finally:
+            quit_driver_and_reap_children(driver)
+
+
+def render(driver, path: str, width: int, height: int, r_type: str = 'png', wait_time: int = 0,
+           offline_mode: bool = False, page_load_time: int = 180):
+    """
+    Loads a path (url/file) in the given driver and returns its snapshot
+    """
+    demisto.debug(f'Navigating to path: {path}. Mode: {"OFFLINE" if offline_mode else "ONLINE"}. page load: {page_load_time}')
+    driver.set_page_load_timeout(page_load_time)
+    driver.get(path)
+    driver.implicitly_wait(5)
+    if wait_time > 0 or DEFAULT_WAIT_TIME > 0:
+        time.sleep(wait_time or DEFAULT_WAIT_TIME)
+    check_response(driver)
+    demisto.debug('Navigating to path - COMPLETED')
+
+    if r_type.lower() == 'pdf':
+        return get_pdf(driver, width, height)
+    return get_image(driver, width, height)
+
+
+def get_rasterize_error(ex, page_load_time):
+    """
+    Returns the message to report for an exception raised while rasterizing
+    """
+    if isinstance(ex, (EmptyResponseError, DriverInitError, PdfGenerationError)):
+        return str(ex)
+    if isinstance(ex, (InvalidArgumentException, NoSuchElementException)):
+        if 'invalid argument' in str(ex):
+            return URL_ERROR_MSG + str(ex)
+        return f'Invalid exception: {ex}\nTrace:{traceback.format_exc()}'
+    if isinstance(ex, TimeoutException):
+        return f'Timeout exception with max load time of: {page_load_time} seconds. {ex}'
+    return f'General error: {ex}\nTrace:{traceback.format_exc()}'
+
+
 def rasterize(path: str, width: int, height: int, r_type: str = 'png', wait_time: int = 0,
               offline_mode: bool = False, max_page_load_time: int = 180):
     """
@@ -164,39 +433,42 @@ def rasterize(path: str, width: int, height: int, r_type: str = 'png', wait_time
     :param r_type: result type: .png/.pdf
     :param wait_time: time in seconds to wait before taking a screenshot
     """
-    driver = init_driver(offline_mode)
     page_load_time = max_page_load_time if max_page_load_time > 0 else DEFAULT_PAGE_LOAD_TIME
     try:
-        demisto.debug(f'Navigating to path: {path}. Mode: {"OFFLINE" if offline_mode else "ONLINE"}. page load: {page_load_time}')
-        driver.set_page_load_timeout(page_load_time)
-        driver.get(path)
-        driver.implicitly_wait(5)
-        if wait_time > 0 or DEFAULT_WAIT_TIME > 0:
-            time.sleep(wait_time or DEFAULT_WAIT_TIME)
-        check_response(driver)
-        demisto.debug('Navigating to path - COMPLETED')
-
-        if r_type.lower() == 'pdf':
-            output = get_pdf(driver, width, height)
-        else:
-            output = get_image(driver, width, height)
-
-        return output
-
-    except (InvalidArgumentException, NoSuchElementException) as ex:
-        if 'invalid argument' in str(ex):
-            err_msg = URL_ERROR_MSG + str(ex)
-            return_err_or_warn(err_msg)
-        else:
-            return_err_or_warn(f'Invalid exception: {ex}\nTrace:{traceback.format_exc()}')
-    except TimeoutException as ex:
-        return_err_or_warn(f'Timeout exception with max load time of: {page_load_time} seconds. {ex}')
+        with browser_driver(offline_mode) as driver:
+            return render(driver, path, width, height, r_type, wait_time, offline_mode, page_load_time)
+    except DriverInitError as ex:
+        return_error(str(ex))
     except Exception as ex:
-        err_str = f'General error: {ex}\nTrace:{traceback.format_exc()}'
-        demisto.error(err_str)
+        err_str = get_rasterize_error(ex, page_load_time)
+        if not isinstance(ex, (EmptyResponseError, InvalidArgumentException, NoSuchElementException,
+                               TimeoutException)):
+            demisto.error(err_str)
         return_err_or_warn(err_str)
+
+
+def rasterize_batch(paths: list, width: int, height: int, r_type: str = 'png', wait_time: int = 0,
+                    max_page_load_time: int = 180):
+    """
+    Captures snapshots of several paths in parallel, up to BROWSER_POOL_SIZE at a time
+    :return: a list with a tuple of the snapshot and the error message of each path
+    """
+    page_load_time = max_page_load_time if max_page_load_time > 0 else DEFAULT_PAGE_LOAD_TIME
+
+    def rasterize_path(path):
+        try:
+            with browser_driver() as driver:
+                return render(driver, path, width, height, r_type, wait_time, page_load_time=page_load_time), None
+        except Exception as ex:
+            return None, get_rasterize_error(ex, page_load_time)
+
+    support_multithreading()
+    pool = ThreadPool(min(BROWSER_POOL_SIZE, len(paths)))
+    try:
+        return pool.map(rasterize_path, paths, chunksize=1)
     finally:
-        quit_driver_and_reap_children(driver)
+        pool.close()
+        pool.join()
 
 
 def get_image(driver, width: int, height: int):
@@ -210,7 +482,6 @@ def get_image(driver, width: int, height: int):
     driver.set_window_size(width, height)
 
     image = driver.get_screenshot_as_png()
-    driver.quit()
 
     demisto.debug('Capturing screenshot - COMPLETED')
 
@@ -230,8 +501,7 @@ def get_pdf(driver, width: int, height: int):
     response = driver.command_executor._request('POST', resource, body)
 
     if response.get('status'):
-        demisto.results(response.get('status'))
-        return_error(response.get('value'))
+        raise PdfGenerationError(f'Failed generating PDF, status {response.get("status")}: {response.get("value")}')
 
     data = base64.b64decode(response.get('value').get('data'))
     demisto.debug('Generating PDF - COMPLETED')
@@ -286,23 +556,41 @@ def convert_pdf_to_jpeg(path: str, max_pages: int, password: str, horizontal: bo
 
 
 def rasterize_command():
-    url = demisto.getArg('url')
+    url = demisto.args().get('url')
+    urls = ([url] if url else []) + argToList(demisto.args().get('urls'))
+    if not urls:
+        return_error('Please provide a URL to rasterize in the url or urls arguments.')
     w = demisto.args().get('width', DEFAULT_W_WIDE).rstrip('px')
     h = demisto.args().get('height', DEFAULT_H).rstrip('px')
     r_type = demisto.args().get('type', 'png')
     wait_time = int(demisto.args().get('wait_time', 0))
     page_load = int(demisto.args().get('max_page_load_time', DEFAULT_PAGE_LOAD_TIME))
 
-    if not (url.startswith('http')):
-        url = f'http://{url}'
-    filename = f'url.{"pdf" if r_type == "pdf" else "png"}'  # type: ignore
-
-    output = rasterize(path=url, r_type=r_type, width=w, height=h, wait_time=wait_time, max_page_load_time=page_load)
-    res = fileResult(filename=filename, data=output)
-    if r_type == 'png':
-        res['Type'] = entryTypes['image']
+    urls = [url if url.startswith('http') else f'http://{url}' for url in urls]
+    extension = "pdf" if r_type == "pdf" else "png"
+
+    if len(urls) == 1:
+        outputs = [(rasterize(path=urls[0], r_type=r_type, width=w, height=h, wait_time=wait_time,
+                              max_page_load_time=page_load), None)]
+        filenames = [f'url.{extension}']
+    else:
+        outputs = rasterize_batch(paths=urls, r_type=r_type, width=w, height=h, wait_time=wait_time,
+                                  max_page_load_time=page_load)
+        filenames = [f'url_{index}.{extension}' for index in range(1, len(urls) + 1)]
+
+    for url, filename, (output, error) in zip(urls, filenames, outputs):
+        if error:
+            demisto.results({
+                'Type': entryTypes['error'] if WITH_ERRORS else entryTypes['warning'],
+                'ContentsFormat': formats['text'],
+                'Contents': f'Failed rasterizing {url}: {error}'
+            })
+            continue
+        res = fileResult(filename=filename, data=output)
+        if r_type == 'png':
+            res['Type'] = entryTypes['image']
 
-    demisto.results(res)
+        demisto.results(res)
 
 
 def rasterize_image_command():
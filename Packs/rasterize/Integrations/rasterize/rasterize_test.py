@@ -175,3 +175,113 @@ def test_rasterize_image_to_pdf(mocker):
     results = demisto.results.call_args[0]
     assert len(results) == 1
     assert results[0]['Type'] == entryTypes['entryInfoFile']
+
+
+def test_browser_pool_recycles_browsers(mocker, tmp_path):
+    """
+    Given:
+        - A browser pool of 2 browsers, each restarted after 2 jobs
+    When:
+        - Running jobs one after the other, and loading the pool again as a new command execution would
+    Then:
+        - Browsers are reused between jobs, restarted once they ran 2 jobs, and tracked in the state file
+    """
+    from rasterize import BrowserPool
+    mocker.patch.object(BrowserPool, 'is_alive', return_value=True)
+    launch_mock = mocker.patch.object(BrowserPool, 'launch_browser', side_effect=lambda b: b.update(started=time.time()))
+    stop_mock = mocker.patch.object(BrowserPool, 'stop_browser')
+    state_file = str(tmp_path / 'pool.json')
+    pool = BrowserPool(size=2, max_jobs=2, state_file=state_file)
+
+    first = pool.acquire()
+    second = pool.acquire()
+    assert first['port'] != second['port']
+    assert launch_mock.call_count == 2
+    pool.release(first)
+
+    assert pool.acquire() is first
+    pool.release(first)
+    assert stop_mock.call_count == 1  # the first browser ran 2 jobs
+    pool.release(second)
+
+    next_execution_pool = BrowserPool(size=2, max_jobs=2, state_file=state_file)
+    assert [browser['port'] for browser in next_execution_pool.browsers] == [second['port']]
+    assert next_execution_pool.acquire()['port'] == second['port']
+    assert launch_mock.call_count == 2
+
+
+def test_rasterize_command_batch(mocker):
+    """
+    Given:
+        - Several URLs to rasterize, one of them fails to load
+    When:
+        - Running the rasterize command
+    Then:
+        - A file entry is returned for each rendered URL, and an error entry for the failing one
+    """
+    import rasterize as rasterize_module
+    from contextlib import contextmanager
+
+    @contextmanager
+    def browser_driver_mock(offline_mode=False):
+        yield mocker.Mock()
+
+    def render_mock(driver, path, *args, **kwargs):
+        if 'bad' in path:
+            raise rasterize_module.TimeoutException('timeout')
+        return path.encode()
+
+    mocker.patch.object(rasterize_module, 'browser_driver', browser_driver_mock)
+    mocker.patch.object(rasterize_module, 'render', side_effect=render_mock)
+    mocker.patch.object(rasterize_module, 'support_multithreading')
+    mocker.patch.object(rasterize_module, 'fileResult', side_effect=lambda filename, data: {'File': filename,
+                                                                                            'Data': data})
+    mocker.patch.object(demisto, 'args', return_value={'url': 'a.com', 'urls': 'bad.com,http://c.com'})
+    mocker.patch.object(demisto, 'results')
+
+    rasterize_module.rasterize_command()
+
+    results = [call_args[0][0] for call_args in demisto.results.call_args_list]
+    assert [(res['File'], res['Data']) for res in results if 'File' in res] == [('url_1.png', b'http://a.com'),
+                                                                              ('url_3.png', b'http://c.com')]
+    assert 'Failed rasterizing http://bad.com: Timeout exception' in results[1]['Contents']
+
+
+def test_rasterize_command_url_with_comma(mocker):
+    """
+    Given:
+        - A single URL with a comma in its query string
+    When:
+        - Running the rasterize command
+    Then:
+        - The URL is rasterized as is, and not split into several URLs
+    """
+    import rasterize as rasterize_module
+    rasterize_mock = mocker.patch.object(rasterize_module, 'rasterize', return_value=b'image')
+    mocker.patch.object(rasterize_module, 'fileResult', side_effect=lambda filename, data: {'File': filename})
+    mocker.patch.object(demisto, 'args', return_value={'url': 'https://x.com/?ids=1,2'})
+    mocker.patch.object(demisto, 'results')
+
+    rasterize_module.rasterize_command()
+
+    assert rasterize_mock.call_args[1]['path'] == 'https://x.com/?ids=1,2'
+    assert demisto.results.call_args[0][0]['File'] == 'url.png'
+
+
+def test_get_pdf_error(mocker):
+    """
+    Given:
+        - A driver which fails printing the page to PDF
+    When:
+        - Generating a PDF, possibly from a worker thread of a batch
+    Then:
+        - An exception is raised instead of returning results
+    """
+    from rasterize import get_pdf, PdfGenerationError
+    driver = mocker.Mock()
+    driver.command_executor._request.return_value = {'status': 500, 'value': 'printing failed'}
+    mocker.patch.object(demisto, 'results')
+
+    with pytest.raises(PdfGenerationError, match='printing failed'):
+        get_pdf(driver, 1024, 800)
+    assert not demisto.results.called
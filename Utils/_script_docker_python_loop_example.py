@@ -10,6 +10,12 @@ For example to run a simple script which sends a log entry to the server via cal
 echo '{"script": "demisto.log(\"this is an example entry log\")", "integration": false, "native": false}' | \
 docker run --rm -i -v `pwd`:/work -w /work demisto/python3:3.8.6.12176 python Utils/_script_docker_python_loop_example.py
 
+Compiled code is cached in memory across executions. Set DEMISTO_PYTHON_CODE_CACHE_DIR to a directory to also keep
+it on disk as marshalled bytecode, so a new container can skip compiling scripts which were already executed.
+
+Set DEMISTO_PYTHON_PREWARM_CODE to the path of the code prepended to every script (CommonServerPython) to execute it
+only once per container. Scripts which start with this code run in a copy of the namespace it initialized.
+
 """
 
 import os
@@ -17,6 +23,12 @@ import threading
 import sys
 import json
 import traceback
+import hashlib
+import marshal
+import tempfile
+import copy
+import __future__
+from collections import OrderedDict
 
 if sys.version_info[0] < 3:
     import Queue as queue
@@ -65,23 +77,29 @@ def __readWhileAvailable():
 template_code = '''
 from __future__ import print_function
 import json
+import threading
 import uuid
 import sys
 
 class Demisto:
     """Wrapper class to interface with the Demisto server via stdin, stdout"""
 
+    BATCH_MAX_MESSAGES = 100
+
     def __init__(self, context):
         self.callingContext = context
+        # when the server supports it, messages which don't expect a response are sent together in one batch
+        self.__batch = [] if context.get(u'batchMessages') else None
+        # guards adding to the batch and taking it for sending, which support_multithreading doesn't lock.
+        # it is never held while sending, so it doesn't deadlock with the lock of support_multithreading
+        self.__batch_lock = threading.Lock()
         args = self.args()
         if 'demisto_machine_learning_magic_key' in  args:
             import os
             os.environ['DEMISTO_MACHINE_LEARNING_MAGIC_KEY'] = args['demisto_machine_learning_magic_key']
 
     def log(self, msg):
-        json.dump({'type': 'entryLog', 'args': {'message': msg}}, sys.stdout)
-        sys.stdout.write('\\n')
-        sys.stdout.flush()
+        self.__send({'type': 'entryLog', 'args': {'message': msg}})
 
     def investigation(self):
         return self.callingContext[u'context'][u'Inv']
@@ -135,12 +153,12 @@ class Demisto:
     def info(self, *args):
         argsObj = {}
         argsObj["args"] = list(args)
-        self.__do({'type': 'log', 'command': 'info', 'args': argsObj})
+        self.__log({'type': 'log', 'command': 'info', 'args': argsObj})
 
     def error(self, *args):
         argsObj = {}
         argsObj["args"] = list(args)
-        self.__do({'type': 'log', 'command': 'error', 'args': argsObj})
+        self.__log({'type': 'log', 'command': 'error', 'args': argsObj})
 
     def exception(self, ex):
         return self.__do({'type': 'exception', 'command': 'exception', 'args': ex})
@@ -148,7 +166,7 @@ class Demisto:
     def debug(self, *args):
         argsObj = {}
         argsObj["args"] = list(args)
-        self.__do({'type': 'log', 'command': 'debug', 'args': argsObj})
+        self.__log({'type': 'log', 'command': 'debug', 'args': argsObj})
 
     def getAllSupportedCommands(self):
         return self.__do({'type': 'getAllModulesSupportedCmds'})
@@ -162,7 +180,46 @@ class Demisto:
     def dt(self, data, q):
         return self.__do({'type': 'dt', 'name': q, 'value': data})['result']
 
+    def isBatchMode(self):
+        return self.__batch is not None
+
+    def flushBatch(self):
+        """ Send the batched messages in a single message, the server acknowledges all of them at once """
+        if self.__batch:
+            self.__do(None)
+
+    def __send(self, cmd):
+        # a message which doesn't expect a response
+        if self.__batch is None:
+            json.dump(cmd, sys.stdout)
+            sys.stdout.write('\\n')
+            sys.stdout.flush()
+        else:
+            with self.__batch_lock:
+                self.__batch.append(cmd)
+                is_full = len(self.__batch) >= self.BATCH_MAX_MESSAGES
+            if is_full:
+                self.flushBatch()
+
+    def __log(self, cmd):
+        # the server replies to log messages unless they are batched
+        if self.__batch is None:
+            self.__do(cmd)
+        else:
+            self.__send(cmd)
+
     def __do(self, cmd):
+        # keep the order of the messages, the batched ones go before this one
+        with self.__batch_lock:
+            batch = self.__batch
+            if batch:
+                self.__batch = []
+        if batch:
+            self.__request({'type': 'batch', 'commands': batch})
+        if cmd is not None:
+            return self.__request(cmd)
+
+    def __request(self, cmd):
         # Watch out there is another defintion like this
         # prepare command to send to server
         json.dump(cmd, sys.stdout)
@@ -203,9 +260,7 @@ class Demisto:
         else:
             res.append(converted)
 
-        json.dump({'type': 'result', 'results': res}, sys.stdout)
-        sys.stdout.write('\\n')
-        sys.stdout.flush()
+        self.__send({'type': 'result', 'results': res})
 
 demisto = Demisto(context)
 
@@ -234,23 +289,29 @@ print = demisto_print
 integ_template_code = '''
 from __future__ import print_function
 import json
+import threading
 import uuid
 import sys
 
 class Demisto:
     """Wrapper class to interface with the Demisto server via stdin, stdout"""
 
+    BATCH_MAX_MESSAGES = 100
+
     def __init__(self, context):
         self.callingContext = context
+        # when the server supports it, messages which don't expect a response are sent together in one batch
+        self.__batch = [] if context.get(u'batchMessages') else None
+        # guards adding to the batch and taking it for sending, which support_multithreading doesn't lock.
+        # it is never held while sending, so it doesn't deadlock with the lock of support_multithreading
+        self.__batch_lock = threading.Lock()
         args = self.args()
         if 'demisto_machine_learning_magic_key' in  args:
             import os
             os.environ['DEMISTO_MACHINE_LEARNING_MAGIC_KEY'] = args['demisto_machine_learning_magic_key']
 
     def log(self, msg):
-        json.dump({'type': 'entryLog', 'args': {'message': 'Integration log: ' + msg}}, sys.stdout)
-        sys.stdout.write('\\n')
-        sys.stdout.flush()
+        self.__send({'type': 'entryLog', 'args': {'message': 'Integration log: ' + msg}})
 
     def investigation(self):
         return self.callingContext[u'context'][u'Inv']
@@ -313,17 +374,17 @@ class Demisto:
     def info(self, *args):
         argsObj = {}
         argsObj["args"] = list(args)
-        self.__do({'type': 'log', 'command': 'info', 'args': argsObj})
+        self.__log({'type': 'log', 'command': 'info', 'args': argsObj})
 
     def error(self, *args):
         argsObj = {}
         argsObj["args"] = list(args)
-        self.__do({'type': 'log', 'command': 'error', 'args': argsObj})
+        self.__log({'type': 'log', 'command': 'error', 'args': argsObj})
 
     def debug(self, *args):
         argsObj = {}
         argsObj["args"] = list(args)
-        self.__do({'type': 'log', 'command': 'debug', 'args': argsObj})
+        self.__log({'type': 'log', 'command': 'debug', 'args': argsObj})
 
     def gets(self, obj, field):
         return str(self.get(obj, field))
@@ -337,7 +398,46 @@ class Demisto:
     def dt(self, data, q):
         return self.__do({'type': 'dt', 'name': q, 'value': data})['result']
 
+    def isBatchMode(self):
+        return self.__batch is not None
+
+    def flushBatch(self):
+        """ Send the batched messages in a single message, the server acknowledges all of them at once """
+        if self.__batch:
+            self.__do(None)
+
+    def __send(self, cmd):
+        # a message which doesn't expect a response
+        if self.__batch is None:
+            json.dump(cmd, sys.stdout)
+            sys.stdout.write('\\n')
+            sys.stdout.flush()
+        else:
+            with self.__batch_lock:
+                self.__batch.append(cmd)
+                is_full = len(self.__batch) >= self.BATCH_MAX_MESSAGES
+            if is_full:
+                self.flushBatch()
+
+    def __log(self, cmd):
+        # the server replies to log messages unless they are batched
+        if self.__batch is None:
+            self.__do(cmd)
+        else:
+            self.__send(cmd)
+
     def __do(self, cmd):
+        # keep the order of the messages, the batched ones go before this one
+        with self.__batch_lock:
+            batch = self.__batch
+            if batch:
+                self.__batch = []
+        if batch:
+            self.__request({'type': 'batch', 'commands': batch})
+        if cmd is not None:
+            return self.__request(cmd)
+
+    def __request(self, cmd):
         # Watch out there is another defintion like this
         json.dump(cmd, sys.stdout)
         sys.stdout.write('\\n')
@@ -370,9 +470,7 @@ class Demisto:
             res = converted
         else:
             res.append(converted)
-        json.dump({'type': 'result', 'results': res}, sys.stdout)
-        sys.stdout.write('\\n')
-        sys.stdout.flush()
+        self.__send({'type': 'result', 'results': res})
 
     def incidents(self, incidents):
         self.results({'Type': 1, 'Contents': json.dumps(incidents), 'ContentsFormat': 'json'})
@@ -430,6 +528,16 @@ def send_pong():
     sys.stdout.flush()
 
 
+# sends the messages which the script batched and were not sent yet
+def flush_script_batch(script_globals):
+    script_demisto = script_globals.get('demisto')
+    if hasattr(script_demisto, 'flushBatch'):
+        try:
+            script_demisto.flushBatch()
+        except Exception:
+            pass
+
+
 # receives ping and sends back pong until we get something else
 # the the function stopped and returns the received string
 def do_ping_pong():
@@ -441,6 +549,125 @@ def do_ping_pong():
             return ping
 
 
+# compiled code objects of previous executions, keyed by the hash of the complete code (template + script).
+# scripts are executed with the same code over and over, so we skip parsing and compiling them every time.
+CODE_CACHE_MAX_ENTRIES = 64
+# if set, the compiled code is also saved as marshalled bytecode so it survives a restart of the container
+CODE_CACHE_DIR = os.environ.get('DEMISTO_PYTHON_CODE_CACHE_DIR')
+__code_cache = OrderedDict()
+
+
+def get_code_hash(complete_code):
+    # the marshal format and the bytecode are specific to the python version
+    data = (sys.version + complete_code).encode('utf-8')
+    return hashlib.sha256(data).hexdigest()
+
+
+def load_code_from_disk(code_hash):
+    if not CODE_CACHE_DIR:
+        return None
+    try:
+        with open(os.path.join(CODE_CACHE_DIR, code_hash + '.bin'), 'rb') as f:
+            return marshal.loads(f.read())
+    except Exception:
+        # missing or corrupted file, will be compiled and saved again
+        return None
+
+
+def save_code_to_disk(code_hash, code):
+    if not CODE_CACHE_DIR:
+        return
+    try:
+        if not os.path.isdir(CODE_CACHE_DIR):
+            os.makedirs(CODE_CACHE_DIR)
+        fd, tmp_path = tempfile.mkstemp(dir=CODE_CACHE_DIR)
+        with os.fdopen(fd, 'wb') as f:
+            f.write(marshal.dumps(code))
+        # rename so concurrent containers sharing the directory never read a partial file
+        os.rename(tmp_path, os.path.join(CODE_CACHE_DIR, code_hash + '.bin'))
+    except Exception:
+        # the cache is only an optimization
+        pass
+
+
+def get_compiled_code(complete_code, flags=0):
+    code_hash = get_code_hash(str(flags) + complete_code)
+    code = __code_cache.pop(code_hash, None)
+    if code is None:
+        code = load_code_from_disk(code_hash)
+        if code is None:
+            code = compile(complete_code, '<string>', 'exec', flags, True)
+            save_code_to_disk(code_hash, code)
+    # re-insert to keep the most recently used entries last
+    __code_cache[code_hash] = code
+    while len(__code_cache) > CODE_CACHE_MAX_ENTRIES:
+        __code_cache.popitem(last=False)
+    return code
+
+
+# the prewarm code and the namespaces it initialized, one for scripts and one for integrations as their Demisto
+# class is different. each namespace is kept with a snapshot of its globals right after the initialization.
+PREWARM_CODE_PATH = os.environ.get('DEMISTO_PYTHON_PREWARM_CODE')
+# the script code is compiled on its own, so it needs the future import of the template, and it is padded to the
+# line it has in the complete code, so the line numbers in its tracebacks are the same
+SCRIPT_COMPILE_FLAGS = __future__.print_function.compiler_flag
+__prewarm_code = None
+__prewarm_namespaces = {}
+
+if PREWARM_CODE_PATH:
+    with open(PREWARM_CODE_PATH) as f:
+        __prewarm_code = f.read()
+
+
+def restore_namespace(namespace, snapshot):
+    namespace.clear()
+    # one memo for all the globals, so containers shared between them stay shared
+    memo = {}
+    for key, value in snapshot.items():
+        # copy the containers, nested ones included, so changes made by a script are not seen by the next one
+        if key != '__builtins__' and type(value) in (dict, list, set):
+            try:
+                value = copy.deepcopy(value, memo)
+            except Exception:
+                # e.g. a container holding a module or a lock, only its top level is reset
+                value = copy.copy(value)
+        namespace[key] = value
+
+
+def get_prewarmed_globals(is_integ_script, context):
+    template = integ_template_code if is_integ_script else template_code
+    header_code = template.replace('###CODE_HERE###', '')
+    if is_integ_script in __prewarm_namespaces:
+        namespace, snapshot = __prewarm_namespaces[is_integ_script]
+        restore_namespace(namespace, snapshot)
+        namespace['context'] = context
+        # a new demisto object for this execution, then the module globals which depend on it
+        exec(get_compiled_code(header_code), namespace, namespace)  # guardrails-disable-line
+        if 'reset_module_state' in namespace:
+            namespace['reset_module_state']()
+        return namespace
+
+    namespace = {
+        '__readWhileAvailable': __readWhileAvailable,
+        'context': context,
+        'win': win
+    }
+    # the prewarm code takes the place of the script in the template, as in the complete code
+    exec(get_compiled_code(template.replace('###CODE_HERE###', __prewarm_code)), namespace, namespace)  # guardrails-disable-line
+    snapshot = dict(namespace)
+    __prewarm_namespaces[is_integ_script] = (namespace, snapshot)
+    # the first script also runs with copies, so the snapshot is kept as initialized
+    restore_namespace(namespace, snapshot)
+    return namespace
+
+
+def get_prewarmed_script_code(is_integ_script, code_string):
+    template = integ_template_code if is_integ_script else template_code
+    line_offset = template.split('###CODE_HERE###')[0].count('\n') + __prewarm_code.count('\n')
+    script_code = code_string[len(__prewarm_code):]
+    return get_compiled_code('\n' * line_offset + script_code, SCRIPT_COMPILE_FLAGS)
+
+
 backup_env_vars = {}
 for key in os.environ.keys():
     backup_env_vars[key] = os.environ[key]
@@ -464,30 +691,39 @@ while True:
     contextJSON.pop('script', None)
 
     is_integ_script = contextJSON['integration']
-    complete_code = ''
-    if is_integ_script:
-        complete_code = integ_template_code.replace('###CODE_HERE###', code_string)
-    else:
-        complete_code = template_code.replace('###CODE_HERE###', code_string)
+    sub_globals = {}
 
     try:
-        code = compile(complete_code, '<string>', 'exec')
+        if __prewarm_code and code_string.startswith(__prewarm_code):
+            sub_globals = get_prewarmed_globals(is_integ_script, contextJSON)
+            code = get_prewarmed_script_code(is_integ_script, code_string)
+        else:
+            complete_code = ''
+            if is_integ_script:
+                complete_code = integ_template_code.replace('###CODE_HERE###', code_string)
+            else:
+                complete_code = template_code.replace('###CODE_HERE###', code_string)
 
-        sub_globals = {
-            '__readWhileAvailable': __readWhileAvailable,
-            'context': contextJSON,
-            'win': win
-        }
+            code = get_compiled_code(complete_code)
+
+            sub_globals = {
+                '__readWhileAvailable': __readWhileAvailable,
+                'context': contextJSON,
+                'win': win
+            }
 
         exec(code, sub_globals, sub_globals)  # guardrails-disable-line
 
     except Exception:
         exc_type, exc_value, exc_traceback = sys.exc_info()
+        flush_script_batch(sub_globals)
         send_script_exception(exc_type, exc_value, exc_traceback)
     except SystemExit:
         # print 'Will not stop on sys.exit(0)'
         pass
 
+    flush_script_batch(sub_globals)
+
     rollback_system()
 
     # ping back to Demisto server that script is completed